@@ -0,0 +1,284 @@
+"""
+Per-user day-presence bitmaps.
+
+user_activity holds one row per user with dreams: bit i of bits (a
+little-endian blob) is set when the user has a dream dated first_day + i,
+first_day being a date ordinal. first_day is kept a multiple of 8, so the
+map grows and shrinks by whole bytes at either end; a few years of
+journaling is a few hundred bytes. aggregates.add_dreams/remove_dreams keep
+it current inside the caller's transaction.
+
+Loaded into a Python int, streaks, day counts and gaps are shifts, masks
+and bit counts over the whole map at once instead of walks over dreams.
+"""
+
+from datetime import date, datetime, timedelta
+
+from backend.utils import json_ids, user_batches
+
+
+class Activity:
+    """One user's journaled days; bit i of bits is day first_day + i"""
+
+    def __init__(self, first_day=0, bits=0):
+        self.first_day = first_day
+        self.bits = bits
+
+    def __bool__(self):
+        return bool(self.bits)
+
+    def day_count(self):
+        """Number of journaled days"""
+        return self.bits.bit_count()
+
+    def has(self, day):
+        i = day.toordinal() - self.first_day
+        return i >= 0 and bool(self.bits >> i & 1)
+
+    def first(self):
+        """Earliest journaled day, None if there is none"""
+        if not self.bits:
+            return None
+        return date.fromordinal(self.first_day + _lowest_bit(self.bits))
+
+    def last(self):
+        """Latest journaled day, None if there is none"""
+        if not self.bits:
+            return None
+        return date.fromordinal(self.first_day + self.bits.bit_length() - 1)
+
+    def streak_ending(self, day):
+        """Length of the run of journaled days ending on day"""
+        i = day.toordinal() - self.first_day
+        if i < 0 or not self.bits >> i & 1:
+            return 0
+        # The highest unset bit at or below i is where the run starts
+        return i + 1 - (~self.bits & ((2 << i) - 1)).bit_length()
+
+    def current_streak(self, today=None):
+        """Consecutive journaled days ending today, or yesterday if today is empty"""
+        today = today or datetime.now().date()
+        return self.streak_ending(today) or self.streak_ending(
+            today - timedelta(days=1)
+        )
+
+    def longest_streak(self):
+        """Length of the longest run of journaled days"""
+        if not self.bits:
+            return 0
+        # runs[k] has bit i set when days i .. i+k-1 are all journaled;
+        # double k while some run is that long, then binary-search the rest
+        runs = {1: self.bits}
+        k = 1
+        while nxt := runs[k] & (runs[k] >> k):
+            k *= 2
+            runs[k] = nxt
+        length, starts = k, runs[k]
+        step = k // 2
+        while step:
+            longer = starts & (runs[step] >> length)
+            if longer:
+                length, starts = length + step, longer
+            step //= 2
+        return length
+
+    def days_between(self, start, end):
+        """Number of journaled days from start to end, inclusive"""
+        lo = max(start.toordinal() - self.first_day, 0)
+        hi = end.toordinal() - self.first_day
+        if hi < lo:
+            return 0
+        return (self.bits >> lo & ((1 << (hi - lo + 1)) - 1)).bit_count()
+
+    def gaps(self, min_days=1):
+        """
+        Runs of at least min_days days without a dream between the first and
+        last journaled day, as (first missing day, last missing day) pairs
+        """
+        if not self.bits:
+            return []
+        low = _lowest_bit(self.bits)
+        span = ((1 << self.bits.bit_length()) - 1) >> low << low
+        missing = ~self.bits & span
+        found = []
+        while missing:
+            i = _lowest_bit(missing)
+            run = missing >> i
+            length = (run ^ (run + 1)).bit_length() - 1
+            if length >= min_days:
+                start = self.first_day + i
+                found.append(
+                    (date.fromordinal(start), date.fromordinal(start + length - 1))
+                )
+            missing &= ~(((1 << length) - 1) << i)
+        return found
+
+
+def _lowest_bit(x):
+    return (x & -x).bit_length() - 1
+
+
+def load(conn, user_id):
+    """A user's Activity; empty if they have no dated dreams"""
+    row = conn.execute(
+        "SELECT first_day, bits FROM user_activity WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    if row is None:
+        return Activity()
+    return Activity(row[0], int.from_bytes(row[1], "little"))
+
+
+def _store(conn, user_id, activity):
+    bits, first_day = activity.bits, activity.first_day
+    if not bits:
+        conn.execute("DELETE FROM user_activity WHERE user_id = ?", (user_id,))
+        return
+    # Drop empty bytes at the low end; first_day stays a multiple of 8
+    empty = _lowest_bit(bits) // 8 * 8
+    bits >>= empty
+    first_day += empty
+    conn.execute(
+        """INSERT INTO user_activity (user_id, first_day, bits) VALUES (?, ?, ?)
+           ON CONFLICT (user_id) DO UPDATE SET
+               first_day = excluded.first_day, bits = excluded.bits""",
+        (user_id, first_day, bits.to_bytes((bits.bit_length() + 7) // 8, "little")),
+    )
+
+
+def _update(conn, user_id, days, present):
+    activity = load(conn, user_id)
+    first_day = min(days) // 8 * 8
+    if activity and activity.first_day < first_day:
+        first_day = activity.first_day
+    bits = activity.bits << (activity.first_day - first_day) if activity else 0
+    mask = 0
+    for day in days:
+        mask |= 1 << (day - first_day)
+    _store(conn, user_id, Activity(first_day, bits | mask if present else bits & ~mask))
+
+
+def _by_user(rows):
+    days = {}
+    for user_id, day in rows:
+        # date() passes through days Python has no date for, such as
+        # 2024-02-30 or year 0; they have no place on the map
+        try:
+            ordinal = date.fromisoformat(day).toordinal()
+        except ValueError:
+            continue
+        days.setdefault(user_id, set()).add(ordinal)
+    return days
+
+
+def add_dreams(conn, dream_ids):
+    """Mark the days of dreams (already inserted or updated)"""
+    rows = conn.execute(
+        """SELECT DISTINCT user_id, date(dream_date) AS day FROM dreams
+           WHERE id IN (SELECT value FROM json_each(?)) AND day IS NOT NULL""",
+        (json_ids(dream_ids),),
+    ).fetchall()
+    for user_id, days in _by_user(rows).items():
+        _update(conn, user_id, days, True)
+
+
+def remove_dreams(conn, dream_ids):
+    """
+    Unmark days left without dreams once these are gone; call before they
+    are changed or deleted
+    """
+    # Each day costs one probe of idx_dreams_user_date for another dream
+    rows = conn.execute(
+        """SELECT DISTINCT d.user_id, date(d.dream_date) AS day FROM dreams d
+           WHERE d.id IN (SELECT value FROM json_each(:ids)) AND day IS NOT NULL
+             AND NOT EXISTS (
+                 SELECT 1 FROM dreams o
+                 WHERE o.user_id = d.user_id
+                   AND o.dream_date >= day AND o.dream_date < date(day, '+1 day')
+                   AND date(o.dream_date) = day
+                   AND o.id NOT IN (SELECT value FROM json_each(:ids))
+             )""",
+        {"ids": json_ids(dream_ids)},
+    ).fetchall()
+    for user_id, days in _by_user(rows).items():
+        _update(conn, user_id, days, False)
+
+
+def remove_user(conn, user_id):
+    conn.execute("DELETE FROM user_activity WHERE user_id = ?", (user_id,))
+
+
+def _computed(conn, where="true", params=()):
+    """{user_id: Activity} recomputed from the dreams matching where"""
+    rows = conn.execute(
+        f"""SELECT DISTINCT user_id, date(dream_date) AS day FROM dreams
+            WHERE {where} AND day IS NOT NULL""",
+        params,
+    )
+    computed = {}
+    for user_id, days in _by_user(rows).items():
+        first_day = min(days) // 8 * 8
+        bits = 0
+        for day in days:
+            bits |= 1 << (day - first_day)
+        computed[user_id] = Activity(first_day, bits)
+    return computed
+
+
+def rebuild(conn, user_id=None):
+    """Recompute the bitmaps from dreams for one user, or everyone"""
+    if user_id is None:
+        conn.execute("DELETE FROM user_activity")
+        computed = _computed(conn)
+    else:
+        remove_user(conn, user_id)
+        computed = _computed(conn, "user_id = ?", (user_id,))
+    for uid, activity in computed.items():
+        _store(conn, uid, activity)
+
+
+def backfill(conn, batch_size):
+    """Migration backfill: rebuild the bitmaps batch_size users at a time"""
+    for after, last, count in user_batches(conn, batch_size):
+        conn.execute(
+            "DELETE FROM user_activity WHERE user_id > ? AND user_id <= ?",
+            (after, last),
+        )
+        computed = _computed(conn, "user_id > ? AND user_id <= ?", (after, last))
+        for uid, activity in computed.items():
+            _store(conn, uid, activity)
+        yield count
+
+
+def check(conn, user_id=None):
+    """
+    Compare stored bitmaps with ones recomputed from dreams.
+
+    Returns (user_id, stored, expected) tuples, the journaled days as lists
+    of ISO dates, for each user that differs; an empty list means consistent.
+    """
+    if user_id is None:
+        expected = _computed(conn)
+        rows = conn.execute("SELECT user_id FROM user_activity").fetchall()
+    else:
+        expected = _computed(conn, "user_id = ?", (user_id,))
+        rows = conn.execute(
+            "SELECT user_id FROM user_activity WHERE user_id = ?", (user_id,)
+        ).fetchall()
+    stored = {r[0]: load(conn, r[0]) for r in rows}
+
+    problems = []
+    for uid in sorted(set(stored) | set(expected)):
+        have, want = _days(stored.get(uid)), _days(expected.get(uid))
+        if have != want:
+            problems.append((uid, have, want))
+    return problems
+
+
+def _days(activity):
+    if not activity:
+        return []
+    return [
+        date.fromordinal(activity.first_day + i).isoformat()
+        for i in range(activity.bits.bit_length())
+        if activity.bits >> i & 1
+    ]
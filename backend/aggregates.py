@@ -0,0 +1,243 @@
+"""
+Incrementally maintained per-user stats aggregates.
+
+user_stats holds one row of totals per user and user_stat_buckets holds
+grouped counters (kind = mood, month, weekday or tag). Every dream write
+applies its delta on the caller's connection, inside the same transaction,
+so the stats endpoints read a handful of rows instead of scanning dreams.
+The per-user activity bitmaps (backend.activity) and daily rollups
+(backend.rollups) are maintained alongside.
+
+    python -m backend.aggregates rebuild [--user ID]
+    python -m backend.aggregates check [--user ID]
+"""
+
+import argparse
+import sys
+
+from backend import activity, rollups
+from backend.utils import json_ids, user_batches
+
+# Bucket key expressions over the dreams table (aliased d). A NULL key means
+# the dream does not count towards that kind; weekday keeps NULL dates under
+# '' so they still show up in the by-day breakdown.
+BUCKET_KINDS = {
+    "mood": "d.mood",
+    "month": "strftime('%Y-%m', d.dream_date)",
+    "weekday": "COALESCE(strftime('%w', d.dream_date), '')",
+}
+
+
+def _bucket_selects(where):
+    """SELECTs producing (user_id, kind, key, count, lucidity_sum, lucidity_count)"""
+    selects = [
+        f"""SELECT d.user_id AS user_id, '{kind}' AS kind, {key} AS key,
+                   COUNT(*) AS count,
+                   COALESCE(SUM(d.lucidity), 0) AS lucidity_sum,
+                   COUNT(d.lucidity) AS lucidity_count
+            FROM dreams d
+            WHERE {where} AND {key} IS NOT NULL
+            GROUP BY d.user_id, key"""
+        for kind, key in BUCKET_KINDS.items()
+    ]
+    selects.append(
+        f"""SELECT d.user_id AS user_id, 'tag' AS kind, t.name AS key,
+                   COUNT(*) AS count,
+                   COALESCE(SUM(d.lucidity), 0) AS lucidity_sum,
+                   COUNT(d.lucidity) AS lucidity_count
+            FROM dreams d
+            JOIN dream_tags dt ON dt.dream_id = d.id
+            JOIN tags t ON t.id = dt.tag_id
+            WHERE {where}
+            GROUP BY d.user_id, t.name"""
+    )
+    return selects
+
+
+def _totals_select(where):
+    """SELECT producing (user_id, total, lucidity_sum, lucidity_count)"""
+    return f"""SELECT d.user_id AS user_id, COUNT(*) AS total,
+                      COALESCE(SUM(d.lucidity), 0) AS lucidity_sum,
+                      COUNT(d.lucidity) AS lucidity_count
+               FROM dreams d
+               WHERE {where}
+               GROUP BY d.user_id"""
+
+
+def _apply(conn, where, params, sign):
+    conn.execute(
+        f"""INSERT INTO user_stats (user_id, total, lucidity_sum, lucidity_count)
+            SELECT user_id, ? * total, ? * lucidity_sum, ? * lucidity_count
+            FROM ({_totals_select(where)})
+            WHERE true
+            ON CONFLICT (user_id) DO UPDATE SET
+                total = total + excluded.total,
+                lucidity_sum = lucidity_sum + excluded.lucidity_sum,
+                lucidity_count = lucidity_count + excluded.lucidity_count""",
+        (sign, sign, sign, *params),
+    )
+    for select in _bucket_selects(where):
+        conn.execute(
+            f"""INSERT INTO user_stat_buckets
+                    (user_id, kind, key, count, lucidity_sum, lucidity_count)
+                SELECT user_id, kind, key, ? * count, ? * lucidity_sum,
+                       ? * lucidity_count
+                FROM ({select})
+                WHERE true
+                ON CONFLICT (user_id, kind, key) DO UPDATE SET
+                    count = count + excluded.count,
+                    lucidity_sum = lucidity_sum + excluded.lucidity_sum,
+                    lucidity_count = lucidity_count + excluded.lucidity_count""",
+            (sign, sign, sign, *params),
+        )
+    if sign < 0:
+        users = f"SELECT DISTINCT d.user_id FROM dreams d WHERE {where}"
+        conn.execute(
+            f"DELETE FROM user_stats WHERE user_id IN ({users}) AND total <= 0",
+            params,
+        )
+        conn.execute(
+            f"""DELETE FROM user_stat_buckets
+                WHERE user_id IN ({users}) AND count <= 0""",
+            params,
+        )
+
+
+_BY_IDS = "d.id IN (SELECT value FROM json_each(?))"
+
+
+def add_dreams(conn, dream_ids):
+    """Count dreams (already inserted, tags attached) into the aggregates"""
+    if dream_ids:
+        _apply(conn, _BY_IDS, [json_ids(dream_ids)], 1)
+        activity.add_dreams(conn, dream_ids)
+        rollups.add_dreams(conn, dream_ids)
+
+
+def remove_dreams(conn, dream_ids):
+    """Uncount dreams; call before they are changed or deleted"""
+    if dream_ids:
+        activity.remove_dreams(conn, dream_ids)
+        rollups.remove_dreams(conn, dream_ids)
+        _apply(conn, _BY_IDS, [json_ids(dream_ids)], -1)
+
+
+def remove_user(conn, user_id):
+    """Drop all aggregates of a user"""
+    conn.execute("DELETE FROM user_stats WHERE user_id = ?", (user_id,))
+    conn.execute("DELETE FROM user_stat_buckets WHERE user_id = ?", (user_id,))
+    activity.remove_user(conn, user_id)
+    rollups.remove_user(conn, user_id)
+
+
+def rebuild(conn, user_id=None):
+    """Recompute aggregates from scratch for one user, or everyone"""
+    if user_id is None:
+        conn.execute("DELETE FROM user_stats")
+        conn.execute("DELETE FROM user_stat_buckets")
+        _apply(conn, "true", [], 1)
+    else:
+        conn.execute("DELETE FROM user_stats WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM user_stat_buckets WHERE user_id = ?", (user_id,))
+        _apply(conn, "d.user_id = ?", [user_id], 1)
+
+
+def backfill(conn, batch_size):
+    """
+    Migration backfill: rebuild the stats aggregates batch_size users at a
+    time. Tag buckets come from dream_tags, so tags are linked first.
+    """
+    for after, last, count in user_batches(conn, batch_size):
+        span = (after, last)
+        for table in ("user_stats", "user_stat_buckets"):
+            conn.execute(
+                f"DELETE FROM {table} WHERE user_id > ? AND user_id <= ?", span
+            )
+        _apply(conn, "d.user_id > ? AND d.user_id <= ?", span, 1)
+        yield count
+
+
+def check(conn, user_id=None):
+    """
+    Compare stored aggregates with values recomputed from dreams.
+
+    Returns a list of (user_id, kind, key, stored, expected) tuples, where
+    kind is 'total' for the user_stats row; an empty list means consistent.
+    """
+    where, params = ("true", []) if user_id is None else ("d.user_id = ?", [user_id])
+    user_filter = "" if user_id is None else " WHERE user_id = ?"
+
+    expected = {
+        (r[0], "total", ""): tuple(r[1:])
+        for r in conn.execute(_totals_select(where), params)
+    }
+    for select in _bucket_selects(where):
+        expected.update(
+            {tuple(r[:3]): tuple(r[3:]) for r in conn.execute(select, params)}
+        )
+
+    stored = {
+        (r[0], "total", ""): tuple(r[1:])
+        for r in conn.execute(
+            "SELECT user_id, total, lucidity_sum, lucidity_count FROM user_stats"
+            + user_filter,
+            params,
+        )
+    }
+    stored.update(
+        {
+            tuple(r[:3]): tuple(r[3:])
+            for r in conn.execute(
+                """SELECT user_id, kind, key, count, lucidity_sum, lucidity_count
+                   FROM user_stat_buckets"""
+                + user_filter,
+                params,
+            )
+        }
+    )
+
+    return [
+        (key[0], key[1], key[2], stored.get(key), expected.get(key))
+        for key in sorted(set(stored) | set(expected), key=repr)
+        if stored.get(key) != expected.get(key)
+    ]
+
+
+def main(argv=None):
+    from backend.database import connect, init_db
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--user", type=int, help="limit to one user id")
+    args = parser.parse_args(argv)
+
+    init_db()
+    conn = connect()
+    try:
+        if args.command == "rebuild":
+            rebuild(conn, args.user)
+            activity.rebuild(conn, args.user)
+            rollups.rebuild(conn, args.user)
+            conn.commit()
+            print("Aggregates rebuilt")
+            return 0
+
+        problems = check(conn, args.user) + rollups.check(conn, args.user)
+        for user_id, kind, key, stored, expected in problems:
+            print(f"user {user_id} {kind} {key!r}: stored={stored} expected={expected}")
+        for user_id, stored, expected in activity.check(conn, args.user):
+            problems.append(user_id)
+            print(
+                f"user {user_id} activity: missing {sorted(set(expected) - set(stored))} "
+                f"extra {sorted(set(stored) - set(expected))}"
+            )
+        print(
+            "Aggregates consistent" if not problems else f"{len(problems)} mismatches"
+        )
+        return 1 if problems else 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
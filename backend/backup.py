@@ -0,0 +1,327 @@
+import codecs
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+from backend import aggregates
+from backend.cache import invalidate_user
+from backend.database import get_db
+from backend.tags import add_dream_tags
+from backend.utils import row_to_dict
+
+logger = logging.getLogger(__name__)
+
+BACKUP_VERSION = "1.0"
+BACKUP_CHUNK_SIZE = int(os.getenv("BACKUP_CHUNK_SIZE", "500"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+
+
+def _dumps(value):
+    # Same settings as fastapi's JSONResponse, so the output is byte-identical
+    # to the non-streaming v1.0 export
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def iter_backup(user_id, export_date, chunk_size=BACKUP_CHUNK_SIZE, progress=None):
+    """
+    Yield a user's v1.0 backup document as UTF-8 chunks.
+
+    Everything is read inside one read transaction, so the count and the
+    dreams come from the same snapshot even if the user keeps writing.
+    progress, if given, is called with (dreams written, total) after the
+    header and each chunk.
+    """
+    with get_db() as conn:
+        conn.execute("BEGIN")
+        try:
+            total = conn.execute(
+                "SELECT COUNT(*) AS c FROM dreams WHERE user_id = ?", (user_id,)
+            ).fetchone()["c"]
+            header = {
+                "export_date": export_date.isoformat(),
+                "version": BACKUP_VERSION,
+                "total_dreams": total,
+            }
+            yield (_dumps(header)[:-1] + ',"dreams":[').encode("utf-8")
+            if progress:
+                progress(0, total)
+
+            cursor = conn.execute(
+                "SELECT * FROM dreams WHERE user_id = ? ORDER BY created_at DESC",
+                (user_id,),
+            )
+            written = 0
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                chunk = ",".join(_dumps(row_to_dict(r)) for r in rows)
+                yield (chunk if not written else "," + chunk).encode("utf-8")
+                written += len(rows)
+                if progress:
+                    progress(written, total)
+
+            yield b"]}"
+        finally:
+            conn.rollback()
+
+
+class BackupFormatError(ValueError):
+    """The file is valid JSON but not a backup document"""
+
+
+class _JSONStream:
+    """Decode JSON values one at a time from a binary file"""
+
+    # A decode error this close to the end of the buffer may just be a value
+    # cut off by the read size (e.g. "tru" or half a \uXXXX escape)
+    TAIL = 16
+
+    def __init__(self, fileobj, chunk_size):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        # Sniff the encoding (UTF-8/16/32, BOM or not) from the first bytes,
+        # as json.loads does for bytes
+        self.head = b""
+        while len(self.head) < 4:
+            data = fileobj.read(chunk_size)
+            if not data:
+                break
+            self.head += data
+        encoding = json.detect_encoding(self.head)
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        if self.head:
+            data, self.head = self.head, b""
+        else:
+            data = self.fileobj.read(self.chunk_size)
+        self.eof = not data
+        if self.pos > self.chunk_size:
+            self.buf = self.buf[self.pos :]
+            self.pos = 0
+        self.buf += self.decoder.decode(data, final=self.eof)
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, or '' at end of input"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(
+                f"Expecting one of {chars!r}", self.buf, self.pos
+            )
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # Read on only if the value may be cut off at the end of the
+                # buffer; anything else is malformed, and reading the rest
+                # of the upload first would only waste memory
+                cut_off = e.pos >= len(self.buf) - self.TAIL or e.msg.startswith(
+                    "Unterminated string"
+                )
+                if cut_off and self._fill():
+                    continue
+                raise
+            # A number at the very end of the buffer may continue in the next
+            # chunk, so only accept it once more input (or EOF) follows
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+_decoder = json.JSONDecoder()
+
+
+def iter_backup_dreams(fileobj, chunk_size=64 * 1024):
+    """
+    Yield the entries of a backup file's "dreams" array as they are parsed.
+
+    Raises json.JSONDecodeError for malformed JSON and BackupFormatError if
+    the document is not an object with a "dreams" list. Both can surface
+    after some dreams have been yielded, so callers should work inside a
+    transaction they can roll back.
+    """
+    stream = _JSONStream(fileobj, chunk_size)
+    if stream.peek() != "{":
+        stream.value()
+        raise BackupFormatError("Backup must be a JSON object")
+    stream.pos += 1
+
+    found = False
+    if stream.peek() == "}":
+        stream.pos += 1
+    else:
+        while True:
+            key = stream.value()
+            if not isinstance(key, str):
+                raise json.JSONDecodeError("Expecting property name", stream.buf, 0)
+            stream.expect(":")
+            if key == "dreams" and not found:
+                found = True
+                if stream.peek() != "[":
+                    stream.value()
+                    raise BackupFormatError('"dreams" must be a list')
+                stream.pos += 1
+                if stream.peek() == "]":
+                    stream.pos += 1
+                else:
+                    while True:
+                        yield stream.value()
+                        if stream.expect(",]") == "]":
+                            break
+            else:
+                stream.value()
+            if stream.expect(",}") == "}":
+                break
+
+    if stream.peek():
+        raise json.JSONDecodeError("Extra data", stream.buf, stream.pos)
+    if not found:
+        raise BackupFormatError('Backup has no "dreams" list')
+
+
+_INSERT_DREAM = """INSERT INTO dreams (user_id, title, body, mood, lucidity, sleep_quality, tags, dream_date, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+def _dream_row(user_id, dream, now):
+    tags = dream.get("tags", [])
+    return (
+        user_id,
+        dream.get("title"),
+        dream.get("body", ""),
+        dream.get("mood"),
+        dream.get("lucidity"),
+        dream.get("sleep_quality"),
+        tags if isinstance(tags, str) else json.dumps(tags),
+        dream.get("dream_date"),
+        dream.get("created_at", now),
+        dream.get("updated_at", now),
+    )
+
+
+def _insert_batch(conn, batch):
+    """Insert a batch of rows, returning the ones that failed"""
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM dreams").fetchone()[0]
+    conn.execute("SAVEPOINT import_batch")
+    try:
+        conn.executemany(_INSERT_DREAM, batch)
+        failed = []
+    except sqlite3.Error:
+        # Redo the batch row by row so one bad dream only costs itself
+        conn.execute("ROLLBACK TO import_batch")
+        failed = []
+        for row in batch:
+            try:
+                conn.execute(_INSERT_DREAM, row)
+            except sqlite3.Error as e:
+                logger.warning("Error importing dream: %s", e)
+                failed.append(row)
+    conn.execute("RELEASE import_batch")
+
+    # The import holds the write lock, so new ids are exactly those above
+    # last_id, in insertion order
+    new_ids = [
+        r[0]
+        for r in conn.execute(
+            "SELECT id FROM dreams WHERE id > ? ORDER BY id", (last_id,)
+        ).fetchall()
+    ]
+    add_dream_tags(conn, new_ids)
+    aggregates.add_dreams(conn, new_ids)
+    return failed
+
+
+def import_backup(conn, user_id, fileobj, batch_size=None, progress=None):
+    """
+    Stream dreams from a backup file into a user's journal.
+
+    Dreams whose created_at already exists for the user (or earlier in the
+    file) are skipped. Rows are inserted with executemany in batches of
+    batch_size (default IMPORT_BATCH_SIZE), all in one transaction that is
+    rolled back if the file turns out to be invalid. progress, if given, is
+    called after each batch with the running summary.
+    """
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    summary = {"imported": 0, "skipped": 0, "errors": 0, "total": 0}
+    now = datetime.now(timezone.utc).isoformat()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        seen = {
+            r[0]
+            for r in conn.execute(
+                "SELECT created_at FROM dreams WHERE user_id = ?", (user_id,)
+            )
+        }
+
+        batch = []
+        for dream in iter_backup_dreams(fileobj):
+            summary["total"] += 1
+            try:
+                created_at = dream.get("created_at")
+                if created_at is not None and created_at in seen:
+                    summary["skipped"] += 1
+                    continue
+                row = _dream_row(user_id, dream, now)
+            except Exception as e:
+                logger.warning("Error importing dream: %s", e)
+                summary["errors"] += 1
+                continue
+            if created_at is not None:
+                seen.add(created_at)
+            batch.append(row)
+
+            if len(batch) >= batch_size:
+                _flush(conn, user_id, batch, seen, summary, progress)
+                batch = []
+        if batch:
+            _flush(conn, user_id, batch, seen, summary, progress)
+
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    invalidate_user(user_id)
+    return summary
+
+
+def _flush(conn, user_id, batch, seen, summary, progress):
+    failed = _insert_batch(conn, batch)
+    # A failed row must not shadow a later copy of itself in the file
+    seen.difference_update(row[8] for row in failed)
+    summary["imported"] += len(batch) - len(failed)
+    summary["errors"] += len(failed)
+    logger.info(
+        "Import for user %s: %d processed, %d imported, %d skipped, %d errors",
+        user_id,
+        summary["total"],
+        summary["imported"],
+        summary["skipped"],
+        summary["errors"],
+    )
+    if progress:
+        progress(dict(summary))
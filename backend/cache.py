@@ -0,0 +1,169 @@
+"""
+Per-user cache of encoded JSON responses.
+
+Entries are keyed by (user_id, route, params) and stamped with the user's
+data generation, which bump() advances after every dream or account
+write. A lookup only hits while the stamp matches, so a write is visible
+on the very next read; bump() also drops the user's entries right away
+so stale bodies do not hold memory. A hit returns the stored body and
+headers as they are, skipping SQL and JSON encoding.
+
+The cache is an LRU bounded by RESPONSE_CACHE_MAX_BYTES of accounted
+memory (body, headers and a fixed per-entry overhead); 0 disables it.
+It lives in the server process: with several worker processes a write
+is only seen by the worker that served it, so disable the cache there,
+as well as when editing the database by hand.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi.responses import JSONResponse, Response
+
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", "33554432"))
+
+# Rough cost of an entry beyond its body and headers: key tuple, entry
+# tuple, OrderedDict node and the per-user key set slot
+ENTRY_OVERHEAD = 400
+
+
+class ResponseCache:
+    """
+    LRU of response bodies validated by per-user generation counters.
+
+    Generations are drawn from one counter shared by all users, so a
+    bumped generation never equals one handed out before.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (generation, body, headers, size)
+        self._by_user = {}  # user_id -> set of keys
+        self._generations = {}
+        self._counter = 0
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = {}  # route -> count
+        self.misses = {}
+        self.evictions = 0
+        self.invalidations = 0
+
+    def generation(self, user_id):
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def bump(self, user_id):
+        """Invalidate everything cached for a user"""
+        with self._lock:
+            self._counter += 1
+            self._generations[user_id] = self._counter
+            self.invalidations += 1
+            for key in self._by_user.pop(user_id, ()):
+                self._drop(key)
+
+    def get(self, key, generation):
+        """(body, headers) if cached at this generation, else None"""
+        route = key[1]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(key)
+                self.hits[route] = self.hits.get(route, 0) + 1
+                return entry[1], entry[2]
+            self.misses[route] = self.misses.get(route, 0) + 1
+            return None
+
+    def put(self, key, generation, body, headers):
+        size = (
+            len(body)
+            + sum(len(k) + len(v) for k, v in headers.items())
+            + ENTRY_OVERHEAD
+        )
+        user_id = key[0]
+        with self._lock:
+            # A write since the caller read its generation makes this stale
+            if generation != self._generations.get(user_id, 0):
+                return
+            if size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (generation, body, headers, size)
+            self._by_user.setdefault(user_id, set()).add(key)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                keys = self._by_user.get(oldest[0])
+                if keys is not None:
+                    keys.discard(oldest)
+                    if not keys:
+                        del self._by_user[oldest[0]]
+                self.evictions += 1
+
+    def _drop(self, key):
+        self.bytes -= self._entries.pop(key)[3]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+            self._generations.clear()
+            self.bytes = 0
+            self.hits, self.misses = {}, {}
+            self.evictions = self.invalidations = 0
+
+    def stats(self):
+        with self._lock:
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": hits / (hits + misses) if hits + misses else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "routes": {
+                    route: {
+                        "hits": self.hits.get(route, 0),
+                        "misses": self.misses.get(route, 0),
+                    }
+                    for route in sorted(set(self.hits) | set(self.misses))
+                },
+            }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES)
+
+
+def cached_response(user_id, route, params, build):
+    """
+    The JSON response for build(), served from the cache while the user's
+    data is unchanged. build() returns (content, headers); params must be
+    hashable and cover everything the response depends on besides user_id.
+    """
+    if response_cache.max_bytes <= 0:
+        content, headers = build()
+        return JSONResponse(content, headers=headers)
+
+    key = (user_id, route, params)
+    # Read before building: a write landing meanwhile bumps past it, so
+    # the possibly stale result is not stored
+    generation = response_cache.generation(user_id)
+    hit = response_cache.get(key, generation)
+    if hit is not None:
+        body, headers = hit
+        return Response(body, media_type="application/json", headers=headers)
+
+    content, headers = build()
+    response = JSONResponse(content, headers=headers)
+    response_cache.put(key, generation, response.body, headers)
+    return response
+
+
+def invalidate_user(user_id):
+    """Call after committing a write to a user's dreams or account"""
+    response_cache.bump(user_id)
@@ -1,22 +1,187 @@
 import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
+from backend.instrumentation import InstrumentedConnection
+
 DB_PATH = os.getenv("DB_PATH", "/data/dreams.db")
 
+# Connection pool configuration
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_HEALTH_CHECK_AFTER = float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30"))
 
-def get_db():
-    """Get database connection with Row factory"""
-    conn = sqlite3.connect(DB_PATH)
+# Pragma profile applied to every pooled connection
+PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(128 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-16000")),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes available in time"""
+
+
+def connect(path=None, pragmas=None):
+    """Open a new connection with Row factory and the pragma profile applied"""
+    conn = sqlite3.connect(
+        path or DB_PATH, check_same_thread=False, factory=InstrumentedConnection
+    )
     conn.row_factory = sqlite3.Row
+    for name, value in (PRAGMAS if pragmas is None else pragmas).items():
+        conn.execute(f"PRAGMA {name} = {value}")
     return conn
 
 
-def init_db():
-    """Initialize database tables and indexes"""
-    Path(DB_PATH).parent.mkdir(parents=True, exist_ok=True)
-    conn = get_db()
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections.
+
+    Each thread prefers the connection it used last, so FastAPI's threadpool
+    workers keep a warm page cache and prepared schema. Idle connections are
+    health-checked before being handed out again.
+    """
+
+    def __init__(self, path, max_size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = {}  # id(conn) -> (conn, returned_at)
+        self._local = threading.local()
+        self._closed = False
+        self.created = 0
+        self.in_use = 0
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No database connection available after {self.timeout}s")
+        try:
+            conn = self._take_idle()
+            if conn is None:
+                conn = connect(self.path)
+                with self._lock:
+                    self.created += 1
+            with self._lock:
+                self.in_use += 1
+            self._local.last = id(conn)
+            return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+        else:
+            with self._lock:
+                if self._closed:
+                    conn.close()
+                else:
+                    self._idle[id(conn)] = (conn, time.monotonic())
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def close(self):
+        """Close all idle connections; in-use ones are closed on release"""
+        with self._lock:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle.values()]
+            self._idle.clear()
+        for conn in idle:
+            conn.close()
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def _take_idle(self):
+        with self._lock:
+            entry = self._idle.pop(getattr(self._local, "last", None), None)
+            if entry is None and self._idle:
+                entry = self._idle.pop(next(reversed(self._idle)))
+        if entry is None:
+            return None
+        conn, returned_at = entry
+        if time.monotonic() - returned_at > DB_POOL_HEALTH_CHECK_AFTER:
+            try:
+                conn.execute("SELECT 1").fetchone()
+            except sqlite3.Error:
+                self._discard(conn)
+                return None
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(DB_PATH)
+        return _pool
+
 
+def close_pool():
+    """Close the pool; the next get_db() call starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+@contextmanager
+def get_db():
+    """Check out a pooled connection, returning it even if the block raises"""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+def init_db(path=None):
+    """Bring the database schema up to date (see backend.migrations)"""
+    from backend.migrations import migrate
+
+    path = path or DB_PATH
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = connect(path)
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+
+
+def create_schema(conn):
+    """
+    The schema as it stood when migrations were introduced (migration 1).
+    Only DDL: filling the search index, tag links and aggregates of
+    existing dreams is left to the batched backfills of later migrations.
+    """
     # Create users table
     conn.execute(
         """
@@ -55,8 +220,118 @@ def init_db():
 
     # Create indexes
     conn.execute("CREATE INDEX IF NOT EXISTS idx_dreams_user_id ON dreams(user_id)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_dreams_user_created ON dreams(user_id, created_at, id)"
+    )
+    # Covers the per-day calendar and date-window stats queries
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_dreams_user_date ON dreams(user_id, dream_date, lucidity, sleep_quality)"
+    )
     conn.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)")
     conn.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)")
 
-    conn.commit()
-    conn.close()
+    init_search(conn)
+    init_tags(conn)
+    init_aggregates(conn)
+
+
+def init_tags(conn):
+    """Create the normalized tag tables"""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            UNIQUE (user_id, name),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS dream_tags (
+            dream_id INTEGER NOT NULL,
+            tag_id INTEGER NOT NULL,
+            PRIMARY KEY (dream_id, tag_id),
+            FOREIGN KEY (dream_id) REFERENCES dreams(id) ON DELETE CASCADE,
+            FOREIGN KEY (tag_id) REFERENCES tags(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_dream_tags_tag_id ON dream_tags(tag_id, dream_id)"
+    )
+
+
+def init_search(conn):
+    """Create the full-text index over dreams and keep it in sync via triggers"""
+    # External-content FTS5 table: the text lives only in dreams
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS dreams_fts USING fts5(
+            title,
+            body,
+            content='dreams',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """
+    )
+
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS dreams_fts_insert AFTER INSERT ON dreams BEGIN
+            INSERT INTO dreams_fts(rowid, title, body)
+            VALUES (new.id, new.title, new.body);
+        END
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS dreams_fts_delete AFTER DELETE ON dreams BEGIN
+            INSERT INTO dreams_fts(dreams_fts, rowid, title, body)
+            VALUES ('delete', old.id, old.title, old.body);
+        END
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS dreams_fts_update AFTER UPDATE OF title, body ON dreams BEGIN
+            INSERT INTO dreams_fts(dreams_fts, rowid, title, body)
+            VALUES ('delete', old.id, old.title, old.body);
+            INSERT INTO dreams_fts(rowid, title, body)
+            VALUES (new.id, new.title, new.body);
+        END
+    """
+    )
+
+
+def init_aggregates(conn):
+    """Create the per-user stats aggregate tables"""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0,
+            lucidity_sum INTEGER NOT NULL DEFAULT 0,
+            lucidity_count INTEGER NOT NULL DEFAULT 0
+        )
+    """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_stat_buckets (
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            lucidity_sum INTEGER NOT NULL DEFAULT 0,
+            lucidity_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, kind, key)
+        ) WITHOUT ROWID
+    """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_user_stat_buckets_count ON user_stat_buckets(user_id, kind, count)"
+    )
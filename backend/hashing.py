@@ -0,0 +1,259 @@
+"""
+Password hashing off the request path.
+
+bcrypt is deliberately slow and holds the GIL, so hashes and verifications
+run in a small dedicated process pool. Auth routes await them without
+occupying a threadpool worker. HASH_POOL_SIZE=0 runs them in-process on the
+default executor instead (handy for debugging).
+
+The bcrypt cost comes from BCRYPT_ROUNDS, or is calibrated against
+BCRYPT_TARGET_MS when BCRYPT_CALIBRATE is set. Logins rehash stored hashes
+whose cost differs. To see what this machine would pick:
+
+    python -m backend.hashing calibrate [--target-ms 250]
+"""
+
+import argparse
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from passlib.context import CryptContext
+
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", str(min(2, os.cpu_count() or 1))))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "64"))
+LATENCY_WINDOW = 256
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_CALIBRATE = os.getenv("BCRYPT_CALIBRATE", "").lower() in ("1", "true", "yes")
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", "10"))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", "16"))
+
+logger = logging.getLogger(__name__)
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Cost used for new hashes; workers get it with every call, so a calibrated
+# value reaches spawned processes too
+_rounds = BCRYPT_ROUNDS
+
+
+class HashPoolBusy(RuntimeError):
+    """Too many hash operations are already waiting"""
+
+
+@functools.lru_cache(maxsize=None)
+def _context(rounds):
+    return pwd_context.copy(bcrypt__rounds=rounds)
+
+
+def _hash(password, rounds):
+    return _context(rounds).hash(password)
+
+
+def _verify(password, hashed):
+    return pwd_context.verify(password, hashed)
+
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.seconds_total = 0.0
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+
+    def snapshot(self):
+        with self.lock:
+            recent = sorted(self.recent)
+            return {
+                "workers": HASH_POOL_SIZE,
+                "rounds": _rounds,
+                "queue_depth": max(self.pending - HASH_POOL_SIZE, 0),
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "seconds_total": self.seconds_total,
+                "latency_p50": _percentile(recent, 0.50),
+                "latency_p95": _percentile(recent, 0.95),
+                "latency_max": recent[-1] if recent else None,
+            }
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+_stats = _Stats()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server process has threads and open
+            # SQLite handles that a forked child must not inherit
+            _pool = ProcessPoolExecutor(
+                max_workers=HASH_POOL_SIZE,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _replace_pool(broken):
+    """Drop a pool whose worker died; the next _get_pool() starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run(fn, *args):
+    with _stats.lock:
+        if _stats.pending >= HASH_MAX_PENDING:
+            _stats.rejected += 1
+            raise HashPoolBusy(f"{_stats.pending} hash operations pending")
+        _stats.pending += 1
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    try:
+        if HASH_POOL_SIZE <= 0:
+            return await loop.run_in_executor(None, fn, *args)
+        pool = _get_pool()
+        try:
+            return await loop.run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed) and the executor refuses all
+            # further work; replace it and retry once
+            logger.warning("Hashing pool broken, starting a new one")
+            _replace_pool(pool)
+            return await loop.run_in_executor(_get_pool(), fn, *args)
+    finally:
+        elapsed = time.perf_counter() - start
+        with _stats.lock:
+            _stats.pending -= 1
+            _stats.completed += 1
+            _stats.seconds_total += elapsed
+            _stats.recent.append(elapsed)
+
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password, _rounds)
+
+
+def hash_password_sync(password: str) -> str:
+    return _hash(password, _rounds)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run(_verify, plain_password, hashed_password)
+
+
+def get_rounds() -> int:
+    return _rounds
+
+
+def set_rounds(rounds: int):
+    global _rounds
+    _rounds = rounds
+
+
+def hash_rounds(hashed: str):
+    """The cost a bcrypt hash was made with, or None if it is not bcrypt"""
+    parts = hashed.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def needs_rehash(hashed: str) -> bool:
+    return hash_rounds(hashed) != _rounds
+
+
+def calibrate(target_ms=None, min_rounds=None, max_rounds=None) -> int:
+    """
+    The highest bcrypt cost whose hash time stays within target_ms here.
+
+    Each extra round doubles the work, so one measurement at min_rounds
+    (best of three, to skip warm-up noise) predicts the rest.
+    """
+    target_ms = BCRYPT_TARGET_MS if target_ms is None else target_ms
+    min_rounds = BCRYPT_MIN_ROUNDS if min_rounds is None else min_rounds
+    max_rounds = BCRYPT_MAX_ROUNDS if max_rounds is None else max_rounds
+
+    samples = []
+    for _ in range(3):
+        start = time.perf_counter()
+        _hash("calibration", min_rounds)
+        samples.append((time.perf_counter() - start) * 1000)
+    base_ms = min(samples)
+
+    rounds = min_rounds
+    while rounds < max_rounds and base_ms * 2 ** (rounds + 1 - min_rounds) <= target_ms:
+        rounds += 1
+    logger.info(
+        "bcrypt cost %d (%.0f ms at cost %d, target %.0f ms)",
+        rounds,
+        base_ms,
+        min_rounds,
+        target_ms,
+    )
+    return rounds
+
+
+def configure():
+    """Calibrate the cost at startup if BCRYPT_CALIBRATE is set"""
+    if BCRYPT_CALIBRATE:
+        set_rounds(calibrate())
+
+
+def stats() -> dict:
+    """
+    Pool sizing metrics: queue_depth counts operations waiting for a free
+    worker, latencies are in seconds (queue wait included) over the last
+    LATENCY_WINDOW operations.
+    """
+    return _stats.snapshot()
+
+
+def shutdown_hash_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate the bcrypt cost")
+    parser.add_argument("command", choices=["calibrate"])
+    parser.add_argument("--target-ms", type=float, default=BCRYPT_TARGET_MS)
+    parser.add_argument("--min-rounds", type=int, default=BCRYPT_MIN_ROUNDS)
+    parser.add_argument("--max-rounds", type=int, default=BCRYPT_MAX_ROUNDS)
+    args = parser.parse_args(argv)
+
+    rounds = calibrate(args.target_ms, args.min_rounds, args.max_rounds)
+    start = time.perf_counter()
+    _hash("calibration", rounds)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"BCRYPT_ROUNDS={rounds}  # {elapsed:.0f} ms per hash on this machine")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Per-request SQL instrumentation.
+
+Connections from backend.database are InstrumentedConnection objects.
+While a request is being served, every statement run on them or their
+cursors is timed into that request's QueryStats (found through a context
+variable, which FastAPI copies into the threadpool). The middleware then
+adds a Server-Timing header and logs one structured line per request.
+Statements slower than SQL_SLOW_MS also get their EXPLAIN QUERY PLAN
+logged.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextvars import ContextVar
+
+logger = logging.getLogger("backend.sql")
+
+SQL_INSTRUMENTATION = os.getenv("SQL_INSTRUMENTATION", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+SQL_SLOW_MS = float(os.getenv("SQL_SLOW_MS", "100"))
+SQL_TOP_STATEMENTS = 3
+
+_current = ContextVar("query_stats", default=None)
+
+
+class QueryStats:
+    """Queries run while serving one request"""
+
+    __slots__ = ("count", "seconds", "slowest", "slow")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest = []  # [(seconds, sql)], longest first
+        self.slow = []  # [{"sql", "ms", "plan"}]
+
+    def record(self, sql, seconds):
+        self.count += 1
+        self.seconds += seconds
+        if len(self.slowest) < SQL_TOP_STATEMENTS or seconds > self.slowest[-1][0]:
+            self.slowest.append((seconds, sql))
+            self.slowest.sort(key=lambda s: -s[0])
+            del self.slowest[SQL_TOP_STATEMENTS:]
+
+    def server_timing(self):
+        return f'db;dur={self.seconds * 1000:.1f};desc="{self.count} queries"'
+
+    def to_dict(self):
+        return {
+            "queries": self.count,
+            "sql_ms": round(self.seconds * 1000, 2),
+            "slowest": [
+                {"ms": round(s * 1000, 2), "sql": _compact(sql)}
+                for s, sql in self.slowest
+            ],
+            "slow": self.slow,
+        }
+
+
+def _compact(sql):
+    return " ".join(sql.split())
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """sqlite3 cursor that reports statement timings to the current request"""
+
+    def execute(self, sql, parameters=(), /):
+        stats = _current.get()
+        if stats is None:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        _record(self.connection, stats, sql, parameters, time.perf_counter() - start)
+        return self
+
+    def executemany(self, sql, parameters, /):
+        stats = _current.get()
+        if stats is None:
+            return super().executemany(sql, parameters)
+        start = time.perf_counter()
+        super().executemany(sql, parameters)
+        _record(self.connection, stats, sql, None, time.perf_counter() - start)
+        return self
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    sqlite3 connection whose cursors are InstrumentedCursor objects, so
+    statements run through conn.execute() and conn.cursor() alike are timed
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=(), /):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters, /):
+        return self.cursor().executemany(sql, parameters)
+
+
+def _record(conn, stats, sql, parameters, seconds):
+    stats.record(sql, seconds)
+    if seconds * 1000 < SQL_SLOW_MS:
+        return
+    entry = {"sql": _compact(sql), "ms": round(seconds * 1000, 2), "plan": None}
+    if parameters is not None and sql.lstrip().upper().startswith(("SELECT", "WITH")):
+        try:
+            # Through the base class, so the plan lookup is not recorded
+            entry["plan"] = [
+                row[-1]
+                for row in sqlite3.Connection.execute(
+                    conn, "EXPLAIN QUERY PLAN " + sql, parameters
+                ).fetchall()
+            ]
+        except sqlite3.Error:
+            pass
+    stats.slow.append(entry)
+    logger.warning("Slow query: %s", json.dumps(entry))
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware collecting QueryStats for each HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SQL_INSTRUMENTATION:
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current.set(stats)
+        status = None
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Statements run while a streamed body is produced come after
+                # this point; they are still in the log line
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    json.dumps(
+                        {
+                            "method": scope["method"],
+                            "path": scope["path"],
+                            "status": status,
+                            **stats.to_dict(),
+                        }
+                    )
+                )
+
+
+def current_stats():
+    """QueryStats of the request being served, if any"""
+    return _current.get()
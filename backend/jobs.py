@@ -0,0 +1,251 @@
+"""
+Background import/export jobs.
+
+Jobs run on a small bounded thread pool so a large backup or import does
+not hold a request open. Callers poll the job for progress; finished
+exports are kept in a temporary file until JOB_RESULT_TTL expires.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from backend.backup import import_backup, iter_backup
+from backend.database import get_db
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "16"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+JOB_DIR = os.getenv("JOB_DIR")
+
+
+class JobQueueFull(RuntimeError):
+    """Too many jobs are queued or running"""
+
+
+class Job:
+    """State of one background job; mutated only under the manager lock"""
+
+    def __init__(self, user_id, kind):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.kind = kind
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.processed = 0
+        self.total = None
+        self.imported = 0
+        self.skipped = 0
+        self.errors = 0
+        self.error = None
+        self.path = None
+        self.filename = None
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed")
+
+    @property
+    def expires_at(self):
+        return self.finished_at + JOB_RESULT_TTL if self.done else None
+
+    def to_dict(self):
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        data = {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": _isoformat(self.created_at),
+            "started_at": _isoformat(self.started_at),
+            "finished_at": _isoformat(self.finished_at),
+            "expires_at": _isoformat(self.expires_at),
+            "processed": self.processed,
+            "total": self.total,
+            "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+            "rows_per_second": (
+                round(self.processed / elapsed, 1) if elapsed else None
+            ),
+            "error": self.error,
+        }
+        if self.kind == "import":
+            data.update(
+                imported=self.imported, skipped=self.skipped, errors=self.errors
+            )
+        else:
+            data["download_url"] = (
+                f"/api/jobs/{self.id}/download" if self.status == "succeeded" else None
+            )
+        return data
+
+
+class JobManager:
+    """Bounded executor plus an in-memory registry of jobs"""
+
+    def __init__(
+        self, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, directory=None
+    ):
+        self.max_pending = max_pending
+        # Always a fresh subdirectory, so shutdown can remove it wholesale
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="dreamjournal-jobs-", dir=directory)
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="job"
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def temp_path(self, suffix):
+        fd, path = tempfile.mkstemp(dir=self.directory, suffix=suffix)
+        os.close(fd)
+        return path
+
+    def submit_export(self, user_id):
+        job = self._add(user_id, "export")
+        self._executor.submit(self._run, job, self._export)
+        return job
+
+    def submit_import(self, user_id, path):
+        """Queue an import of an uploaded file; the job takes ownership of path"""
+        try:
+            job = self._add(user_id, "import")
+        except JobQueueFull:
+            _remove(path)
+            raise
+        job.path = path
+        self._executor.submit(self._run, job, self._import)
+        return job
+
+    def get(self, job_id, user_id):
+        """The user's job, or None if unknown, expired or someone else's"""
+        self.cleanup()
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job if job is not None and job.user_id == user_id else None
+
+    def cleanup(self, now=None):
+        """Forget finished jobs past their expiry and delete their files"""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values() if job.done and job.expires_at <= now
+            ]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            _remove(job.path)
+        return len(expired)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _add(self, user_id, kind):
+        self.cleanup()
+        job = Job(user_id, kind)
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if not j.done)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} jobs already pending")
+            self._jobs[job.id] = job
+        return job
+
+    def _update(self, job, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(job, name, value)
+
+    def _run(self, job, work):
+        self._update(job, status="running", started_at=time.time())
+        try:
+            work(job)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            _remove(job.path)
+            self._update(
+                job, status="failed", error=str(e), path=None, finished_at=time.time()
+            )
+        else:
+            self._update(job, status="succeeded", finished_at=time.time())
+
+    def _export(self, job):
+        export_date = datetime.now(timezone.utc)
+        path = self.temp_path(".json")
+        self._update(
+            job,
+            path=path,
+            filename=f"dream-journal-backup-{export_date.strftime('%Y%m%d')}.json",
+        )
+
+        def progress(written, total):
+            self._update(job, processed=written, total=total)
+
+        with open(path, "wb") as f:
+            for chunk in iter_backup(job.user_id, export_date, progress=progress):
+                f.write(chunk)
+
+    def _import(self, job):
+        def progress(summary):
+            self._update(
+                job,
+                processed=summary["total"],
+                imported=summary["imported"],
+                skipped=summary["skipped"],
+                errors=summary["errors"],
+            )
+
+        try:
+            with open(job.path, "rb") as f, get_db() as conn:
+                summary = import_backup(conn, job.user_id, f, progress=progress)
+            progress(summary)
+            self._update(job, total=summary["total"])
+        finally:
+            _remove(job.path)
+            self._update(job, path=None)
+
+
+def _isoformat(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _remove(path):
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(directory=JOB_DIR)
+        return _manager
+
+
+def shutdown_jobs():
+    """Stop the job executor and delete any job files"""
+    global _manager
+    with _manager_lock:
+        manager, _manager = _manager, None
+    if manager is not None:
+        manager.shutdown()
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -5,11 +6,30 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
-from backend.database import init_db
-from backend.routes import auth, dreams, stats
+from backend.database import close_pool, init_db
+from backend.hashing import configure as configure_hashing
+from backend.hashing import shutdown_hash_pool
+from backend.instrumentation import QueryStatsMiddleware
+from backend.jobs import shutdown_jobs
+from backend.metrics import MetricsMiddleware
+from backend.profiling import ProfilingMiddleware
+from backend.routes import auth, calendar, dreams, jobs, metrics, profiles, stats
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Only the schema_version lookup when the schema is current
+    init_db()
+    configure_hashing()
+    yield
+    shutdown_jobs()
+    shutdown_hash_pool()
+    # Return pooled connections so the WAL is checkpointed on shutdown
+    close_pool()
+
 
 # Initialize FastAPI app
-app = FastAPI(title="Dream Journal API")
+app = FastAPI(title="Dream Journal API", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -18,15 +38,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Has-More", "X-Total-Count", "Server-Timing"],
 )
-
-# Initialize database
-init_db()
+# Added first so it runs inside QueryStatsMiddleware and sees its counts
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(ProfilingMiddleware)
 
 # Include routers
 app.include_router(auth.router)
 app.include_router(dreams.router)
+app.include_router(calendar.router)
 app.include_router(stats.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
+app.include_router(profiles.router)
 
 # Serve React frontend
 frontend_path = Path("/app/frontend/dist")
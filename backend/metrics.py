@@ -0,0 +1,401 @@
+"""
+Prometheus metrics.
+
+HTTP metrics are recorded by MetricsMiddleware into per-thread shards, so
+the request path only touches dicts owned by its own thread and never
+takes a lock; a scrape sums the shards. Everything else (DB pool,
+threadpool, caches) is read from its owner by collectors at scrape time.
+"""
+
+import math
+import os
+import threading
+import time
+
+from backend.instrumentation import current_stats
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Shard:
+    __slots__ = ("counters", "histograms", "gauges")
+
+    def __init__(self):
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., +Inf, sum]
+        self.gauges = {}  # (name, labels) -> value, summed across shards
+
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+
+
+def _shard():
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = _Shard()
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def inc(name, labels=(), value=1):
+    counters = _shard().counters
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def gauge_add(name, labels=(), value=1):
+    gauges = _shard().gauges
+    key = (name, labels)
+    gauges[key] = gauges.get(key, 0) + value
+
+
+def observe(name, labels, value, buckets=LATENCY_BUCKETS):
+    histograms = _shard().histograms
+    key = (name, labels)
+    counts = histograms.get(key)
+    if counts is None:
+        counts = histograms[key] = [0] * (len(buckets) + 2)
+    # Non-cumulative here; cumulated when rendered
+    i = 0
+    while i < len(buckets) and value > buckets[i]:
+        i += 1
+    counts[i] += 1
+    counts[-1] += value
+
+
+# name -> (type, help, buckets)
+_FAMILIES = {
+    "http_requests_total": ("counter", "HTTP requests by route and status class"),
+    "http_request_duration_seconds": (
+        "histogram",
+        "HTTP request latency by route",
+        LATENCY_BUCKETS,
+    ),
+    "http_requests_in_flight": ("gauge", "HTTP requests being served"),
+    "http_request_sql_queries": (
+        "histogram",
+        "SQL statements per HTTP request",
+        QUERY_BUCKETS,
+    ),
+    "http_request_sql_seconds_total": ("counter", "SQL time spent per route"),
+}
+
+_collectors = []
+
+
+def register_collector(collector):
+    """
+    Add a scrape-time source of samples. collector() returns an iterable of
+    (name, type, help, [(labels, value)]) with labels a tuple of pairs.
+    """
+    _collectors.append(collector)
+    return collector
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _number(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _merged():
+    counters, gauges, histograms = {}, {}, {}
+    with _shards_lock:
+        shards = list(_shards)
+    for shard in shards:
+        # list() of a dict view is taken without releasing the GIL, so
+        # concurrent writers cannot break the iteration
+        for key, value in list(shard.counters.items()):
+            counters[key] = counters.get(key, 0) + value
+        for key, value in list(shard.gauges.items()):
+            gauges[key] = gauges.get(key, 0) + value
+        for key, counts in list(shard.histograms.items()):
+            merged = histograms.setdefault(key, [0] * len(counts))
+            for i, c in enumerate(list(counts)):
+                merged[i] += c
+    return counters, gauges, histograms
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    counters, gauges, histograms = _merged()
+    lines = []
+
+    by_family = {}
+    for (name, labels), value in [*counters.items(), *gauges.items()]:
+        by_family.setdefault(name, []).append((labels, value))
+    for (name, labels), counts in histograms.items():
+        by_family.setdefault(name, []).append((labels, counts))
+
+    for name, (kind, help_text, *rest) in _FAMILIES.items():
+        samples = by_family.get(name)
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(samples, key=lambda s: s[0]):
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                continue
+            buckets = rest[0]
+            cumulative = 0
+            for bound, count in zip((*buckets, math.inf), value[:-1]):
+                cumulative += count
+                le = "+Inf" if math.isinf(bound) else _number(bound)
+                lines.append(
+                    f"{name}_bucket{_labels((*labels, ('le', le)))} {cumulative}"
+                )
+            lines.append(f"{name}_sum{_labels(labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+    for collector in _collectors:
+        for name, kind, help_text, samples in collector():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Forget recorded HTTP metrics (collectors are kept)"""
+    with _shards_lock:
+        for shard in _shards:
+            shard.counters.clear()
+            shard.histograms.clear()
+            shard.gauges.clear()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route HTTP metrics"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+        gauge_add("http_requests_in_flight", (("method", method),))
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            gauge_add("http_requests_in_flight", (("method", method),), -1)
+            # The matched route template, not the raw path, keeps the label
+            # set bounded; FastAPI leaves it in the shared scope
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            labels = (("method", method), ("route", path))
+            inc(
+                "http_requests_total",
+                (*labels, ("status", f"{status // 100}xx")),
+            )
+            observe("http_request_duration_seconds", labels, elapsed)
+            stats = current_stats()
+            if stats is not None:
+                observe("http_request_sql_queries", labels, stats.count, QUERY_BUCKETS)
+                inc("http_request_sql_seconds_total", labels, stats.seconds)
+
+
+@register_collector
+def _db_pool():
+    from backend import database
+
+    pool = database._pool
+    if pool is None:
+        return []
+    return [
+        (
+            "db_pool_connections",
+            "gauge",
+            "Pooled SQLite connections by state",
+            [((("state", "in_use"),), pool.in_use), ((("state", "idle"),), pool.idle)],
+        ),
+        ("db_pool_max_connections", "gauge", "Pool size limit", [((), pool.max_size)]),
+        (
+            "db_pool_connections_created_total",
+            "counter",
+            "Connections opened by the pool",
+            [((), pool.created)],
+        ),
+    ]
+
+
+@register_collector
+def _threadpool():
+    # Scrapes run on the event loop, where anyio can report on the limiter
+    # that bounds FastAPI's threadpool for sync endpoints
+    try:
+        from anyio.to_thread import current_default_thread_limiter
+
+        limiter = current_default_thread_limiter()
+    except Exception:
+        return []
+    return [
+        (
+            "threadpool_threads_busy",
+            "gauge",
+            "Threadpool tokens in use by sync endpoints and run_in_threadpool",
+            [((), limiter.borrowed_tokens)],
+        ),
+        (
+            "threadpool_threads_max",
+            "gauge",
+            "Threadpool size",
+            [((), limiter.total_tokens)],
+        ),
+        (
+            "threadpool_waiting",
+            "gauge",
+            "Tasks waiting for a threadpool thread",
+            [((), limiter.statistics().tasks_waiting)],
+        ),
+    ]
+
+
+@register_collector
+def _response_cache():
+    from backend.cache import response_cache
+
+    cache = response_cache.stats()
+    return [
+        (
+            "response_cache_requests_total",
+            "counter",
+            "Response cache lookups by route",
+            [
+                ((("route", route), ("result", result)), counts[key])
+                for route, counts in cache["routes"].items()
+                for result, key in (("hit", "hits"), ("miss", "misses"))
+            ],
+        ),
+        (
+            "response_cache_hit_ratio",
+            "gauge",
+            "Share of cacheable reads served from the cache",
+            [((), cache["hit_ratio"])],
+        ),
+        (
+            "response_cache_entries",
+            "gauge",
+            "Cached responses",
+            [((), cache["entries"])],
+        ),
+        (
+            "response_cache_bytes",
+            "gauge",
+            "Memory accounted to cached responses",
+            [((), cache["bytes"])],
+        ),
+        (
+            "response_cache_max_bytes",
+            "gauge",
+            "Response cache memory limit",
+            [((), cache["max_bytes"])],
+        ),
+        (
+            "response_cache_evictions_total",
+            "counter",
+            "Responses evicted to stay under the memory limit",
+            [((), cache["evictions"])],
+        ),
+        (
+            "response_cache_invalidations_total",
+            "counter",
+            "Per-user invalidations after writes",
+            [((), cache["invalidations"])],
+        ),
+    ]
+
+
+@register_collector
+def _auth():
+    from backend import hashing, ratelimit
+    from backend.auth import token_cache
+
+    tokens = token_cache.stats()
+    hashes = hashing.stats()
+    limits = ratelimit.stats()
+    attempts = [
+        ((("scope", scope), ("result", result)), counts[result])
+        for scope, counts in sorted(limits["total"].items())
+        for result in ("admitted", "rejected")
+    ]
+    return [
+        (
+            "token_cache_requests_total",
+            "counter",
+            "Verified-token cache lookups",
+            [
+                ((("result", "hit"),), tokens["hits"]),
+                ((("result", "miss"),), tokens["misses"]),
+            ],
+        ),
+        (
+            "token_cache_hit_ratio",
+            "gauge",
+            "Share of token lookups served from the cache",
+            [((), tokens["hit_ratio"])],
+        ),
+        ("token_cache_size", "gauge", "Cached tokens", [((), tokens["size"])]),
+        (
+            "password_hash_queue_depth",
+            "gauge",
+            "Hash operations waiting for a worker",
+            [((), hashes["queue_depth"])],
+        ),
+        (
+            "password_hash_operations_total",
+            "counter",
+            "Hash operations by outcome",
+            [
+                ((("result", "completed"),), hashes["completed"]),
+                ((("result", "rejected"),), hashes["rejected"]),
+            ],
+        ),
+        (
+            "password_hash_seconds_total",
+            "counter",
+            "Time spent hashing, queue wait included",
+            [((), hashes["seconds_total"])],
+        ),
+        (
+            "auth_attempts_total",
+            "counter",
+            "Auth attempts by rate-limit decision",
+            attempts,
+        ),
+    ]
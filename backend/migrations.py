@@ -0,0 +1,272 @@
+"""
+Versioned schema migrations.
+
+schema_version records each applied migration. migrate() runs the missing
+ones in order: a migration's schema step (DDL, quick) commits on its own,
+then its backfill, if any, runs in batches of MIGRATION_BATCH_SIZE items
+(dreams or users) with a commit after each, so no batch holds the write
+lock for long. The
+version is recorded once both are done; a migration interrupted halfway
+is run again from the start, so both steps must be safe to repeat.
+
+When the database is already current, startup costs one SELECT.
+
+    python -m backend.migrations status
+    python -m backend.migrations upgrade [--dry-run]
+
+With several server processes sharing one database, run the upgrade
+before starting them rather than letting each one race to it.
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "1000"))
+
+
+class Migration:
+    """
+    One schema change.
+
+    schema(conn), if given, runs in a single transaction. backfill(conn,
+    batch_size), if given, is a generator doing one batch of work per step
+    and yielding the number of items (dreams or users) it handled; each
+    step is committed.
+    """
+
+    def __init__(self, version, name, schema=None, backfill=None):
+        self.version = version
+        self.name = name
+        self.schema = schema
+        self.backfill = backfill
+
+
+def _initial_schema(conn):
+    from backend.database import create_schema
+
+    create_schema(conn)
+
+
+def _user_activity(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_activity (
+            user_id INTEGER PRIMARY KEY,
+            first_day INTEGER NOT NULL,
+            bits BLOB NOT NULL
+        )
+    """
+    )
+
+
+def _backfill_user_activity(conn, batch_size):
+    from backend import activity
+
+    yield from activity.backfill(conn, batch_size)
+
+
+def _daily_rollups(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_daily_stats (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            lucidity_sum INTEGER NOT NULL DEFAULT 0,
+            lucidity_count INTEGER NOT NULL DEFAULT 0,
+            sleep_quality_sum INTEGER NOT NULL DEFAULT 0,
+            sleep_quality_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day)
+        ) WITHOUT ROWID
+    """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_daily_moods (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            mood TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day, mood)
+        ) WITHOUT ROWID
+    """
+    )
+
+
+def _backfill_daily_rollups(conn, batch_size):
+    from backend import rollups
+
+    yield from rollups.backfill(conn, batch_size)
+
+
+def _empty_search_index(conn):
+    # The backfill inserts every dream, so a rerun must start from nothing
+    conn.execute("INSERT INTO dreams_fts (dreams_fts) VALUES ('delete-all')")
+
+
+def _backfill_search_index(conn, batch_size):
+    from backend import search
+
+    yield from search.backfill(conn, batch_size)
+
+
+def _backfill_tags(conn, batch_size):
+    from backend import tags
+
+    yield from tags.backfill(conn, batch_size)
+
+
+def _backfill_aggregates(conn, batch_size):
+    from backend import aggregates
+
+    yield from aggregates.backfill(conn, batch_size)
+
+
+MIGRATIONS = [
+    # Everything init_db created before migrations existed; it only uses
+    # IF NOT EXISTS, so it also adopts databases from that time. Filling
+    # the search index, tag links and aggregates of existing dreams is left
+    # to migrations 4-6, which run in batches
+    Migration(1, "initial schema", _initial_schema),
+    Migration(2, "user activity bitmaps", _user_activity, _backfill_user_activity),
+    Migration(3, "daily stats rollups", _daily_rollups, _backfill_daily_rollups),
+    Migration(4, "search index", _empty_search_index, _backfill_search_index),
+    Migration(5, "tag links", backfill=_backfill_tags),
+    Migration(6, "stats aggregates", backfill=_backfill_aggregates),
+]
+
+
+def current_version(conn):
+    """Highest applied migration, 0 for a database that has none"""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def pending(conn, migrations=None):
+    """Migrations not yet applied, in order"""
+    version = current_version(conn)
+    return [m for m in migrations or MIGRATIONS if m.version > version]
+
+
+def migrate(conn, migrations=None, dry_run=False, batch_size=None):
+    """
+    Apply pending migrations; returns the ones applied (or, with dry_run,
+    the ones that would be).
+
+    A dry run executes everything inside one transaction and rolls it back,
+    logging each statement, so it checks the migrations against the real
+    data without changing it. It holds the write lock while it runs.
+    """
+    todo = pending(conn, migrations)
+    if not todo:
+        return []
+    batch_size = batch_size or MIGRATION_BATCH_SIZE
+
+    if dry_run:
+        conn.set_trace_callback(_log_statement)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for migration in todo:
+                _run(conn, migration, batch_size, commit=False)
+        finally:
+            conn.rollback()
+            conn.set_trace_callback(None)
+        return todo
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+    """
+    )
+    conn.commit()
+    for migration in todo:
+        try:
+            _run(conn, migration, batch_size, commit=True)
+        except BaseException:
+            conn.rollback()
+            logger.exception("Migration %d failed", migration.version)
+            raise
+    return todo
+
+
+def _log_statement(sql):
+    # Statements SQLite runs internally (e.g. for FTS) are traced as comments
+    if not sql.startswith("--"):
+        logger.info("dry run: %s", " ".join(sql.split()))
+
+
+def _run(conn, migration, batch_size, commit):
+    start = time.perf_counter()
+    logger.info("Migration %d (%s) starting", migration.version, migration.name)
+    if migration.schema is not None:
+        if commit:
+            conn.execute("BEGIN IMMEDIATE")
+        migration.schema(conn)
+        if commit:
+            conn.commit()
+
+    if migration.backfill is not None:
+        done = 0
+        for count in migration.backfill(conn, batch_size):
+            if commit:
+                conn.commit()
+            done += count
+            logger.info("Migration %d backfilled %d items", migration.version, done)
+
+    if commit:
+        conn.execute(
+            "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+            (migration.version, migration.name),
+        )
+        conn.commit()
+    logger.info(
+        "Migration %d done in %.1fs",
+        migration.version,
+        time.perf_counter() - start,
+    )
+
+
+def main(argv=None):
+    from backend.database import DB_PATH, connect
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=["status", "upgrade"])
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    conn = connect(DB_PATH)
+    try:
+        todo = pending(conn)
+        if args.command == "status":
+            print(f"{DB_PATH}: version {current_version(conn)}")
+            for migration in todo:
+                print(f"pending {migration.version}: {migration.name}")
+            return 0
+
+        applied = migrate(conn, dry_run=args.dry_run)
+        verb = "Would apply" if args.dry_run else "Applied"
+        for migration in applied:
+            print(f"{verb} {migration.version}: {migration.name}")
+        if not applied:
+            print("Up to date")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Opt-in cProfile of single requests.
+
+A request is profiled when it carries X-Profile-Secret matching
+PROFILE_SECRET, or when its path starts with one of the comma-separated
+PROFILE_PATHS. The endpoint runs under cProfile, and the pstats file plus
+a text summary of the top functions are written to
+PROFILE_DIR/<route>/<timestamp>.{prof,txt}. Other requests pay one
+context variable lookup.
+
+Only one request is profiled at a time: from Python 3.12 cProfile hooks
+the interpreter-wide sys.monitoring, so a second profiler cannot start
+(and a profile records every thread, not just the endpoint's). An
+opted-in request arriving while another is profiled runs unprofiled.
+
+    python -m backend.profiling list
+    python -m backend.profiling show <route>/<timestamp>
+"""
+
+import argparse
+import cProfile
+import functools
+import hmac
+import inspect
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fastapi.routing import APIRoute
+
+PROFILE_SECRET = os.getenv("PROFILE_SECRET", "")
+PROFILE_PATHS = [p for p in os.getenv("PROFILE_PATHS", "").split(",") if p]
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_TOP = 30
+PROFILE_HEADER = "x-profile-secret"
+
+# Set by ProfilingMiddleware to a dict the endpoint wrapper fills in
+_request = ContextVar("profile_request", default=None)
+
+# Held while a request is profiled; taken without blocking
+_active = threading.Lock()
+
+
+def secret_matches(value):
+    """Whether a supplied secret (str or bytes) matches PROFILE_SECRET"""
+    if not PROFILE_SECRET or value is None:
+        return False
+    if isinstance(value, str):
+        value = value.encode()
+    return hmac.compare_digest(value, PROFILE_SECRET.encode())
+
+
+def _opted_in(scope):
+    if any(scope["path"].startswith(prefix) for prefix in PROFILE_PATHS):
+        return True
+    if not PROFILE_SECRET:
+        return False
+    for name, value in scope.get("headers", []):
+        if name == PROFILE_HEADER.encode():
+            return secret_matches(value)
+    return False
+
+
+class ProfilingMiddleware:
+    """Marks opted-in requests and reports the saved profile in X-Profile-Id"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _opted_in(scope):
+            await self.app(scope, receive, send)
+            return
+
+        info = {}
+        token = _request.set(info)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start" and "id" in info:
+                headers = [
+                    *message.get("headers", []),
+                    (b"x-profile-id", info["id"].encode()),
+                ]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request.reset(token)
+
+
+def _slug(route_path):
+    return (
+        route_path.strip("/").replace("/", "_").replace("{", "").replace("}", "")
+        or "root"
+    )
+
+
+def _save(profiler, route_path, elapsed):
+    directory = Path(PROFILE_DIR) / _slug(route_path)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    profiler.dump_stats(directory / f"{name}.prof")
+
+    summary = io.StringIO()
+    summary.write(f"{route_path}  {elapsed * 1000:.1f} ms\n\n")
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+    (directory / f"{name}.txt").write_text(summary.getvalue())
+    return f"{directory.name}/{name}"
+
+
+def profiled(endpoint, route_path):
+    """Wrap an endpoint so opted-in requests run it under cProfile"""
+    if getattr(endpoint, "__profiled__", False):
+        return endpoint
+
+    if inspect.iscoroutinefunction(endpoint):
+        # Profiles the event loop while the coroutine runs, which includes
+        # anything else it interleaves with
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            info = _request.get()
+            if info is None or not _active.acquire(blocking=False):
+                return await endpoint(*args, **kwargs)
+            try:
+                profiler = cProfile.Profile()
+                start = time.perf_counter()
+                profiler.enable()
+                try:
+                    return await endpoint(*args, **kwargs)
+                finally:
+                    profiler.disable()
+                    elapsed = time.perf_counter() - start
+                    info["id"] = _save(profiler, route_path, elapsed)
+            finally:
+                _active.release()
+
+    else:
+
+        # Runs in the threadpool worker that executes the endpoint; before
+        # Python 3.12 that is the only thread cProfile sees
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            info = _request.get()
+            if info is None or not _active.acquire(blocking=False):
+                return endpoint(*args, **kwargs)
+            try:
+                profiler = cProfile.Profile()
+                start = time.perf_counter()
+                try:
+                    return profiler.runcall(endpoint, *args, **kwargs)
+                finally:
+                    elapsed = time.perf_counter() - start
+                    info["id"] = _save(profiler, route_path, elapsed)
+            finally:
+                _active.release()
+
+    wrapper.__profiled__ = True
+    return wrapper
+
+
+class ProfilingRoute(APIRoute):
+    """APIRoute whose endpoint can be profiled per request"""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, profiled(endpoint, path), **kwargs)
+
+
+def list_profiles():
+    """Saved profiles as [{"id", "route", "created_at", "bytes"}], newest first"""
+    root = Path(PROFILE_DIR)
+    if not root.is_dir():
+        return []
+    profiles = [
+        {
+            "id": f"{path.parent.name}/{path.stem}",
+            "route": path.parent.name,
+            "created_at": datetime.fromtimestamp(
+                path.stat().st_mtime, timezone.utc
+            ).isoformat(),
+            "bytes": path.stat().st_size,
+        }
+        for path in root.glob("*/*.prof")
+    ]
+    return sorted(profiles, key=lambda p: p["id"].split("/")[1], reverse=True)
+
+
+def profile_path(profile_id, suffix):
+    """Path of a saved profile file, or None if the id is unknown or unsafe"""
+    route, _, name = profile_id.partition("/")
+    if not route or not name or any(c in profile_id for c in ("..", "\\")):
+        return None
+    path = Path(PROFILE_DIR) / route / f"{name}{suffix}"
+    return path if path.is_file() else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Saved request profiles")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+    show = sub.add_parser("show")
+    show.add_argument("id")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for p in list_profiles():
+            print(f"{p['id']}  {p['created_at']}  {p['bytes']} bytes")
+        return 0
+
+    path = profile_path(args.id, ".txt")
+    if path is None:
+        print(f"No profile {args.id}", file=sys.stderr)
+        return 1
+    print(path.read_text())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+In-process admission control for the auth routes.
+
+Each attempt takes one token from a bucket per key (client IP, email or
+user id). Buckets refill at a steady rate up to a burst size, so a client
+can retry a few times quickly but not keep bcrypt busy. Attempts are
+rejected before any hashing happens.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from fastapi import HTTPException, Request
+
+
+def _env_bool(name, default):
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+
+AUTH_RATE_LIMIT_ENABLED = _env_bool("AUTH_RATE_LIMIT_ENABLED", "true")
+AUTH_RATE_MAX_KEYS = int(os.getenv("AUTH_RATE_MAX_KEYS", "10000"))
+
+# (burst, tokens per minute) per kind of key
+LIMITS = {
+    "ip": (
+        int(os.getenv("AUTH_RATE_IP_BURST", "30")),
+        float(os.getenv("AUTH_RATE_IP_PER_MINUTE", "30")),
+    ),
+    "account": (
+        int(os.getenv("AUTH_RATE_ACCOUNT_BURST", "10")),
+        float(os.getenv("AUTH_RATE_ACCOUNT_PER_MINUTE", "5")),
+    ),
+}
+WINDOW_SECONDS = 60
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets keyed by arbitrary strings.
+
+    Buckets are kept in LRU order; the least recently used are evicted once
+    there are more than max_keys, and a bucket that has been idle long
+    enough to refill completely is dropped since it equals a fresh one.
+    Admitted and rejected attempts are counted per scope, in total and over
+    a sliding WINDOW_SECONDS window.
+    """
+
+    def __init__(self, limits, max_keys, clock=time.monotonic):
+        self.limits = limits
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._window = deque()
+        self.evicted = 0
+
+    def attempt(self, scope, keys):
+        """
+        Take one token for each (kind, key) pair, or none at all.
+
+        Returns 0 when admitted, otherwise the seconds until a retry could
+        succeed.
+        """
+        now = self.clock()
+        with self._lock:
+            buckets = [(self._bucket(kind, key, now), kind) for kind, key in keys]
+            wait = 0.0
+            for bucket, kind in buckets:
+                if bucket[0] < 1:
+                    rate = self.limits[kind][1] / 60
+                    wait = max(wait, (1 - bucket[0]) / rate if rate else float("inf"))
+            if not wait:
+                for bucket, _ in buckets:
+                    bucket[0] -= 1
+            self._count(scope, not wait, now)
+            self._evict(now)
+        return wait
+
+    def stats(self):
+        now = self.clock()
+        with self._lock:
+            self._trim(now)
+            recent = {}
+            for _, per_scope in self._window:
+                for scope, (admitted, rejected) in per_scope.items():
+                    counts = recent.setdefault(scope, {"admitted": 0, "rejected": 0})
+                    counts["admitted"] += admitted
+                    counts["rejected"] += rejected
+            return {
+                "keys": len(self._buckets),
+                "evicted": self.evicted,
+                "total": {scope: dict(c) for scope, c in self._totals.items()},
+                "recent": recent,
+                "window_seconds": WINDOW_SECONDS,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self._totals.clear()
+            self._window.clear()
+            self.evicted = 0
+
+    def _bucket(self, kind, key, now):
+        burst, per_minute = self.limits[kind]
+        bucket = self._buckets.get((kind, key))
+        if bucket is None:
+            bucket = self._buckets[(kind, key)] = [float(burst), now]
+        else:
+            self._buckets.move_to_end((kind, key))
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * per_minute / 60)
+            bucket[1] = now
+        return bucket
+
+    def _evict(self, now):
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+            self.evicted += 1
+        # The oldest entries are the idle ones; drop those already full again
+        while self._buckets:
+            (kind, _), (tokens, last) = next(iter(self._buckets.items()))
+            burst, per_minute = self.limits[kind]
+            if per_minute <= 0 or tokens + (now - last) * per_minute / 60 < burst:
+                break
+            self._buckets.popitem(last=False)
+
+    def _count(self, scope, admitted, now):
+        counts = self._totals.setdefault(scope, {"admitted": 0, "rejected": 0})
+        counts["admitted" if admitted else "rejected"] += 1
+        # One slot per second keeps the window small however busy it gets
+        second = int(now)
+        if not self._window or self._window[-1][0] != second:
+            self._window.append((second, {}))
+        slot = self._window[-1][1].setdefault(scope, [0, 0])
+        slot[0 if admitted else 1] += 1
+        self._trim(now)
+
+    def _trim(self, now):
+        while self._window and self._window[0][0] <= now - WINDOW_SECONDS:
+            self._window.popleft()
+
+
+limiter = TokenBucketLimiter(LIMITS, AUTH_RATE_MAX_KEYS)
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def throttle(request: Request, scope: str, account=None):
+    """
+    Admit an auth attempt from this client (and for this account, if given)
+    or raise 429 with a Retry-After header.
+    """
+    if not AUTH_RATE_LIMIT_ENABLED:
+        return
+    keys = [("ip", client_ip(request))]
+    if account is not None:
+        keys.append(("account", str(account).strip().lower()))
+    wait = limiter.attempt(scope, keys)
+    if wait:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(max(1, math.ceil(min(wait, 3600))))},
+        )
+
+
+def stats() -> dict:
+    return limiter.stats()
@@ -0,0 +1,157 @@
+"""
+Per-user daily stats rollups.
+
+user_daily_stats holds one row per user and day with dreams: the dream
+count and the sums and counts behind the lucidity and sleep-quality
+averages. user_daily_moods holds the mood counts of the same days. Like
+the stats aggregates, aggregates.add_dreams/remove_dreams apply each
+write's delta inside the caller's transaction.
+
+Range queries (backend.stats.range_stats) merge these rows into day,
+week, month or year buckets, so their cost follows the number of days
+with dreams in the range, never the number of dreams. Dreams without a
+parseable dream_date have no day and are left out.
+"""
+
+from backend.utils import json_ids, user_batches
+
+# Rollup SELECTs over the dreams table (aliased d), grouped by user and day
+_DAY = "date(d.dream_date)"
+
+_DAILY_SELECT = f"""
+    SELECT d.user_id AS user_id, {_DAY} AS day, COUNT(*) AS count,
+           COALESCE(SUM(d.lucidity), 0) AS lucidity_sum,
+           COUNT(d.lucidity) AS lucidity_count,
+           COALESCE(SUM(d.sleep_quality), 0) AS sleep_quality_sum,
+           COUNT(d.sleep_quality) AS sleep_quality_count
+    FROM dreams d
+    WHERE {{where}} AND day IS NOT NULL
+    GROUP BY d.user_id, day"""
+
+_MOODS_SELECT = f"""
+    SELECT d.user_id AS user_id, {_DAY} AS day, d.mood AS mood, COUNT(*) AS count
+    FROM dreams d
+    WHERE {{where}} AND day IS NOT NULL AND d.mood IS NOT NULL
+    GROUP BY d.user_id, day, d.mood"""
+
+
+def _apply(conn, where, params, sign):
+    conn.execute(
+        f"""INSERT INTO user_daily_stats
+                (user_id, day, count, lucidity_sum, lucidity_count,
+                 sleep_quality_sum, sleep_quality_count)
+            SELECT user_id, day, ? * count, ? * lucidity_sum, ? * lucidity_count,
+                   ? * sleep_quality_sum, ? * sleep_quality_count
+            FROM ({_DAILY_SELECT.format(where=where)})
+            WHERE true
+            ON CONFLICT (user_id, day) DO UPDATE SET
+                count = count + excluded.count,
+                lucidity_sum = lucidity_sum + excluded.lucidity_sum,
+                lucidity_count = lucidity_count + excluded.lucidity_count,
+                sleep_quality_sum = sleep_quality_sum + excluded.sleep_quality_sum,
+                sleep_quality_count = sleep_quality_count + excluded.sleep_quality_count""",
+        (sign, sign, sign, sign, sign, *params),
+    )
+    conn.execute(
+        f"""INSERT INTO user_daily_moods (user_id, day, mood, count)
+            SELECT user_id, day, mood, ? * count
+            FROM ({_MOODS_SELECT.format(where=where)})
+            WHERE true
+            ON CONFLICT (user_id, day, mood) DO UPDATE SET
+                count = count + excluded.count""",
+        (sign, *params),
+    )
+    if sign < 0:
+        users = f"SELECT DISTINCT d.user_id FROM dreams d WHERE {where}"
+        for table in ("user_daily_stats", "user_daily_moods"):
+            conn.execute(
+                f"DELETE FROM {table} WHERE user_id IN ({users}) AND count <= 0",
+                params,
+            )
+
+
+def add_dreams(conn, dream_ids):
+    """Count dreams (already inserted or updated) into their days"""
+    _apply(conn, "d.id IN (SELECT value FROM json_each(?))", [json_ids(dream_ids)], 1)
+
+
+def remove_dreams(conn, dream_ids):
+    """Uncount dreams; call before they are changed or deleted"""
+    _apply(conn, "d.id IN (SELECT value FROM json_each(?))", [json_ids(dream_ids)], -1)
+
+
+def remove_user(conn, user_id):
+    conn.execute("DELETE FROM user_daily_stats WHERE user_id = ?", (user_id,))
+    conn.execute("DELETE FROM user_daily_moods WHERE user_id = ?", (user_id,))
+
+
+def rebuild(conn, user_id=None):
+    """Recompute the rollups from dreams for one user, or everyone"""
+    if user_id is None:
+        conn.execute("DELETE FROM user_daily_stats")
+        conn.execute("DELETE FROM user_daily_moods")
+        _apply(conn, "true", [], 1)
+    else:
+        remove_user(conn, user_id)
+        _apply(conn, "d.user_id = ?", [user_id], 1)
+
+
+def backfill(conn, batch_size):
+    """Migration backfill: rebuild the rollups batch_size users at a time"""
+    for after, last, count in user_batches(conn, batch_size):
+        span = (after, last)
+        for table in ("user_daily_stats", "user_daily_moods"):
+            conn.execute(
+                f"DELETE FROM {table} WHERE user_id > ? AND user_id <= ?", span
+            )
+        _apply(conn, "d.user_id > ? AND d.user_id <= ?", span, 1)
+        yield count
+
+
+def check(conn, user_id=None):
+    """
+    Compare stored rollups with values recomputed from dreams.
+
+    Returns (user_id, kind, key, stored, expected) tuples like
+    aggregates.check, kind being 'day' (key the date) or 'day-mood' (key
+    'date mood'); an empty list means consistent.
+    """
+    where, params = ("true", []) if user_id is None else ("d.user_id = ?", [user_id])
+    user_filter = "" if user_id is None else " WHERE user_id = ?"
+
+    expected = {
+        (r[0], "day", r[1]): tuple(r[2:])
+        for r in conn.execute(_DAILY_SELECT.format(where=where), params)
+    }
+    expected.update(
+        {
+            (r[0], "day-mood", f"{r[1]} {r[2]}"): (r[3],)
+            for r in conn.execute(_MOODS_SELECT.format(where=where), params)
+        }
+    )
+
+    stored = {
+        (r[0], "day", r[1]): tuple(r[2:])
+        for r in conn.execute(
+            """SELECT user_id, day, count, lucidity_sum, lucidity_count,
+                      sleep_quality_sum, sleep_quality_count
+               FROM user_daily_stats"""
+            + user_filter,
+            params,
+        )
+    }
+    stored.update(
+        {
+            (r[0], "day-mood", f"{r[1]} {r[2]}"): (r[3],)
+            for r in conn.execute(
+                "SELECT user_id, day, mood, count FROM user_daily_moods" + user_filter,
+                params,
+            )
+        }
+    )
+
+    return [
+        (key[0], key[1], key[2], stored.get(key), expected.get(key))
+        for key in sorted(set(stored) | set(expected), key=repr)
+        if stored.get(key) != expected.get(key)
+    ]
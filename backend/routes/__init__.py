@@ -1,4 +1,4 @@
 # Make routes available for import
-from . import auth, dreams, stats
+from . import auth, calendar, dreams, jobs, metrics, profiles, stats
 
-__all__ = ["auth", "dreams", "stats"]
+__all__ = ["auth", "calendar", "dreams", "jobs", "metrics", "profiles", "stats"]
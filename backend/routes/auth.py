@@ -1,40 +1,94 @@
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 
+from backend import aggregates, hashing
 from backend.auth import (
     create_access_token,
     get_current_user_id,
-    get_password_hash,
-    verify_password,
+    revoke_user_tokens,
 )
+from backend.cache import invalidate_user
 from backend.database import get_db
 from backend.models import PasswordChange, UserLogin, UsernameChange, UserRegister
+from backend.profiling import ProfilingRoute
+from backend.ratelimit import throttle
+from backend.tags import remove_user_tags
 
 from ..utils import row_to_dict
 
-router = APIRouter(prefix="/api/auth", tags=["auth"])
+router = APIRouter(prefix="/api/auth", tags=["auth"], route_class=ProfilingRoute)
+
+
+def _check_available(email, username):
+    with get_db() as conn:
+        # Check if email exists
+        existing = conn.execute(
+            "SELECT id FROM users WHERE email = ?", (email,)
+        ).fetchone()
+        if existing:
+            raise HTTPException(status_code=400, detail="Email already registered")
+
+        # Check if username exists
+        existing = conn.execute(
+            "SELECT id FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        if existing:
+            raise HTTPException(status_code=400, detail="Username already taken")
+
+
+def _insert_user(email, username, password_hash):
+    now = datetime.now(timezone.utc).isoformat()
+    with get_db() as conn:
+        cursor = conn.execute(
+            "INSERT INTO users (email, username, password_hash, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (email, username, password_hash, now, now),
+        )
+        conn.commit()
+        return cursor.lastrowid
+
+
+def _get_user(column, value):
+    with get_db() as conn:
+        return conn.execute(
+            f"SELECT * FROM users WHERE {column} = ?", (value,)
+        ).fetchone()
+
+
+def _set_password_hash(user_id, password_hash):
+    now = datetime.now(timezone.utc).isoformat()
+    with get_db() as conn:
+        conn.execute(
+            "UPDATE users SET password_hash = ?, updated_at = ? WHERE id = ?",
+            (password_hash, now, user_id),
+        )
+        conn.commit()
+
+
+async def _hash(password):
+    try:
+        return await hashing.hash_password(password)
+    except (hashing.HashPoolBusy, BrokenProcessPool):
+        raise HTTPException(status_code=503, detail="Server busy, try again later")
+
+
+async def _verify(password, password_hash):
+    try:
+        return await hashing.verify_password(password, password_hash)
+    except (hashing.HashPoolBusy, BrokenProcessPool):
+        raise HTTPException(status_code=503, detail="Server busy, try again later")
+
+
+# The routes that hash are async so bcrypt runs in the hashing process pool
+# without holding a threadpool worker; their DB work still goes to threads
 
 
 @router.post("/register")
-def register(user: UserRegister):
-    conn = get_db()
-
-    # Check if email exists
-    existing = conn.execute(
-        "SELECT id FROM users WHERE email = ?", (user.email,)
-    ).fetchone()
-    if existing:
-        conn.close()
-        raise HTTPException(status_code=400, detail="Email already registered")
-
-    # Check if username exists
-    existing = conn.execute(
-        "SELECT id FROM users WHERE username = ?", (user.username,)
-    ).fetchone()
-    if existing:
-        conn.close()
-        raise HTTPException(status_code=400, detail="Username already taken")
+async def register(user: UserRegister, request: Request):
+    throttle(request, "register", user.email)
+    await run_in_threadpool(_check_available, user.email, user.username)
 
     # Validate username (alphanumeric, 3-20 chars)
     if (
@@ -42,7 +96,6 @@ def register(user: UserRegister):
         or len(user.username) < 3
         or len(user.username) > 20
     ):
-        conn.close()
         raise HTTPException(
             status_code=400,
             detail="Username must be 3-20 characters, alphanumeric with _ or -",
@@ -50,22 +103,15 @@ def register(user: UserRegister):
 
     # Validate password (min 8 chars)
     if len(user.password) < 8:
-        conn.close()
         raise HTTPException(
             status_code=400, detail="Password must be at least 8 characters"
         )
 
     # Create user
-    password_hash = get_password_hash(user.password)
-    now = datetime.now(timezone.utc).isoformat()
-
-    cursor = conn.execute(
-        "INSERT INTO users (email, username, password_hash, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
-        (user.email, user.username, password_hash, now, now),
+    password_hash = await _hash(user.password)
+    user_id = await run_in_threadpool(
+        _insert_user, user.email, user.username, password_hash
     )
-    conn.commit()
-    user_id = cursor.lastrowid
-    conn.close()
 
     # Create token
     access_token = create_access_token(data={"user_id": user_id})
@@ -82,16 +128,18 @@ def register(user: UserRegister):
 
 
 @router.post("/login")
-def login(credentials: UserLogin):
-    conn = get_db()
-    user = conn.execute(
-        "SELECT * FROM users WHERE email = ?", (credentials.email,)
-    ).fetchone()
-    conn.close()
-
-    if not user or not verify_password(credentials.password, user["password_hash"]):
+async def login(credentials: UserLogin, request: Request):
+    throttle(request, "login", credentials.email)
+    user = await run_in_threadpool(_get_user, "email", credentials.email)
+
+    if not user or not await _verify(credentials.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Incorrect email or password")
 
+    # Move the stored hash to the configured cost while we have the password
+    if hashing.needs_rehash(user["password_hash"]):
+        new_hash = await _hash(credentials.password)
+        await run_in_threadpool(_set_password_hash, user["id"], new_hash)
+
     access_token = create_access_token(data={"user_id": user["id"]})
 
     return {
@@ -107,11 +155,11 @@ def login(credentials: UserLogin):
 
 @router.get("/me")
 def get_current_user(user_id: int = Depends(get_current_user_id)):
-    conn = get_db()
-    user = conn.execute(
-        "SELECT id, email, username, created_at FROM users WHERE id = ?", (user_id,)
-    ).fetchone()
-    conn.close()
+    with get_db() as conn:
+        user = conn.execute(
+            "SELECT id, email, username, created_at FROM users WHERE id = ?",
+            (user_id,),
+        ).fetchone()
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -120,84 +168,90 @@ def get_current_user(user_id: int = Depends(get_current_user_id)):
 
 
 @router.put("/change-password")
-def change_password(data: PasswordChange, user_id: int = Depends(get_current_user_id)):
-    conn = get_db()
-    user = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
-
-    if not user or not verify_password(data.current_password, user["password_hash"]):
-        conn.close()
+async def change_password(
+    data: PasswordChange,
+    request: Request,
+    user_id: int = Depends(get_current_user_id),
+):
+    throttle(request, "change_password", f"user:{user_id}")
+    user = await run_in_threadpool(_get_user, "id", user_id)
+
+    if not user or not await _verify(data.current_password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Current password is incorrect")
 
     if len(data.new_password) < 8:
-        conn.close()
         raise HTTPException(
             status_code=400, detail="New password must be at least 8 characters"
         )
 
-    new_hash = get_password_hash(data.new_password)
-    now = datetime.now(timezone.utc).isoformat()
+    new_hash = await _hash(data.new_password)
+    await run_in_threadpool(_set_password_hash, user_id, new_hash)
 
-    conn.execute(
-        "UPDATE users SET password_hash = ?, updated_at = ? WHERE id = ?",
-        (new_hash, now, user_id),
-    )
-    conn.commit()
-    conn.close()
+    # Sign out every other session; the caller continues with a fresh token
+    revoke_user_tokens(user_id)
+    access_token = create_access_token(data={"user_id": user_id})
 
-    return {"success": True, "message": "Password changed successfully"}
+    return {
+        "success": True,
+        "message": "Password changed successfully",
+        "access_token": access_token,
+        "token_type": "bearer",
+    }
 
 
 @router.put("/change-username")
 def change_username(data: UsernameChange, user_id: int = Depends(get_current_user_id)):
-    conn = get_db()
-
     # Validate username
     if (
         not data.username.replace("_", "").replace("-", "").isalnum()
         or len(data.username) < 3
         or len(data.username) > 20
     ):
-        conn.close()
         raise HTTPException(
             status_code=400,
             detail="Username must be 3-20 characters, alphanumeric with _ or - only",
         )
 
-    # Check if username is taken
-    existing = conn.execute(
-        "SELECT id FROM users WHERE username = ? AND id != ?", (data.username, user_id)
-    ).fetchone()
-    if existing:
-        conn.close()
-        raise HTTPException(status_code=400, detail="Username already taken")
-
-    now = datetime.now(timezone.utc).isoformat()
-    conn.execute(
-        "UPDATE users SET username = ?, updated_at = ? WHERE id = ?",
-        (data.username, now, user_id),
-    )
-    conn.commit()
+    with get_db() as conn:
+        # Check if username is taken
+        existing = conn.execute(
+            "SELECT id FROM users WHERE username = ? AND id != ?",
+            (data.username, user_id),
+        ).fetchone()
+        if existing:
+            raise HTTPException(status_code=400, detail="Username already taken")
+
+        now = datetime.now(timezone.utc).isoformat()
+        conn.execute(
+            "UPDATE users SET username = ?, updated_at = ? WHERE id = ?",
+            (data.username, now, user_id),
+        )
+        conn.commit()
+        invalidate_user(user_id)
 
-    # Get updated user
-    user = conn.execute(
-        "SELECT id, email, username, created_at FROM users WHERE id = ?", (user_id,)
-    ).fetchone()
-    conn.close()
+        # Get updated user
+        user = conn.execute(
+            "SELECT id, email, username, created_at FROM users WHERE id = ?",
+            (user_id,),
+        ).fetchone()
 
     return row_to_dict(user)
 
 
 @router.delete("/delete-account")
 def delete_account(user_id: int = Depends(get_current_user_id)):
-    conn = get_db()
+    with get_db() as conn:
+        remove_user_tags(conn, user_id)
+        aggregates.remove_user(conn, user_id)
 
-    # Delete all user's dreams first (cascade should handle this, but being explicit)
-    conn.execute("DELETE FROM dreams WHERE user_id = ?", (user_id,))
+        # Delete all user's dreams first (cascade should handle this, but being explicit)
+        conn.execute("DELETE FROM dreams WHERE user_id = ?", (user_id,))
 
-    # Delete user
-    conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        # Delete user
+        conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
 
-    conn.commit()
-    conn.close()
+        conn.commit()
 
+    invalidate_user(user_id)
+    revoke_user_tokens(user_id)
     return {"success": True, "message": "Account deleted successfully"}
@@ -0,0 +1,129 @@
+import calendar
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from backend import activity
+from backend.auth import get_current_user_id
+from backend.database import get_db
+from backend.profiling import ProfilingRoute
+
+router = APIRouter(
+    prefix="/api/calendar", tags=["calendar"], route_class=ProfilingRoute
+)
+
+MAX_RANGE_DAYS = 400
+
+
+def _parse_date(value: str, name: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} date")
+
+
+@router.get("")
+def get_calendar(
+    user_id: int = Depends(get_current_user_id),
+    start: Optional[str] = Query(None),
+    end: Optional[str] = Query(None),
+    year: Optional[int] = Query(None, ge=1, le=9999),
+    month: Optional[int] = Query(None, ge=1, le=12),
+):
+    """
+    Per-day dream aggregates for a calendar heatmap.
+
+    The range is either start/end (inclusive, YYYY-MM-DD) or a year,
+    optionally narrowed to one month.
+    """
+    if start and end:
+        first, last = _parse_date(start, "start"), _parse_date(end, "end")
+    elif year is not None:
+        if month is None:
+            first, last = date(year, 1, 1), date(year, 12, 31)
+        else:
+            days_in_month = calendar.monthrange(year, month)[1]
+            first, last = date(year, month, 1), date(year, month, days_in_month)
+    else:
+        raise HTTPException(
+            status_code=400, detail="Provide start and end, or year (and month)"
+        )
+
+    if last < first:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (last - first).days >= MAX_RANGE_DAYS:
+        raise HTTPException(
+            status_code=400, detail=f"Range must be under {MAX_RANGE_DAYS} days"
+        )
+
+    with get_db() as conn:
+        # Dreams without a dream_date fall on the day they were created, as
+        # elsewhere in the app. The arms of the OR are range scans on
+        # idx_dreams_user_date and idx_dreams_user_created; dates may carry a
+        # time part, so the upper bound is the day after `last`
+        days = conn.execute(
+            """
+            SELECT
+                substr(COALESCE(dream_date, created_at), 1, 10) AS day,
+                COUNT(*) AS count,
+                AVG(lucidity) AS avg_lucidity,
+                MAX(lucidity) AS max_lucidity,
+                AVG(sleep_quality) AS avg_sleep_quality
+            FROM dreams
+            WHERE user_id = :user_id AND (
+                (dream_date >= :first AND dream_date < date(:last, '+1 day'))
+                OR (dream_date IS NULL
+                    AND created_at >= :first AND created_at < date(:last, '+1 day'))
+            )
+            GROUP BY day
+            ORDER BY day
+            """,
+            {"user_id": user_id, "first": first.isoformat(), "last": last.isoformat()},
+        ).fetchall()
+        days_recorded = _days_recorded(conn, user_id)
+
+    return {
+        "start": first.isoformat(),
+        "end": last.isoformat(),
+        "days_recorded": days_recorded,
+        "days": [
+            {
+                "date": r["day"],
+                "count": r["count"],
+                "avg_lucidity": (
+                    round(r["avg_lucidity"], 1)
+                    if r["avg_lucidity"] is not None
+                    else None
+                ),
+                "max_lucidity": r["max_lucidity"],
+                "avg_sleep_quality": (
+                    round(r["avg_sleep_quality"], 1)
+                    if r["avg_sleep_quality"] is not None
+                    else None
+                ),
+            }
+            for r in days
+        ],
+    }
+
+
+def _days_recorded(conn, user_id):
+    """
+    Distinct days with a dream: the user's activity bitmap, plus the
+    creation days of undated dreams (usually imported) it does not cover
+    """
+    days = activity.load(conn, user_id)
+    extra = set()
+    for row in conn.execute(
+        """SELECT DISTINCT substr(created_at, 1, 10) AS day FROM dreams
+           WHERE user_id = ? AND dream_date IS NULL""",
+        (user_id,),
+    ):
+        try:
+            day = date.fromisoformat(row["day"])
+        except (TypeError, ValueError):
+            continue
+        if not days.has(day):
+            extra.add(day)
+    return days.day_count() + len(extra)
@@ -2,54 +2,153 @@ import json
 from datetime import datetime, timezone
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 
+from backend import aggregates
 from backend.auth import get_current_user_id
+from backend.cache import cached_response, invalidate_user
 from backend.database import get_db
 from backend.models import DreamCreate, DreamUpdate
-from backend.utils import row_to_dict
-
-router = APIRouter(prefix="/api/dreams", tags=["dreams"])
+from backend.profiling import ProfilingRoute
+from backend.search import (
+    BM25_WEIGHTS,
+    SNIPPET_ELLIPSIS,
+    SNIPPET_END,
+    SNIPPET_START,
+    SNIPPET_TOKENS,
+    build_fts_query,
+    highlight_snippet,
+)
+from backend.tags import remove_dream_tags, set_dream_tags
+from backend.utils import decode_cursor, encode_cursor, row_to_dict
+
+router = APIRouter(prefix="/api/dreams", tags=["dreams"], route_class=ProfilingRoute)
 
 
 @router.get("")
 def list_dreams(
+    response: Response,
     user_id: int = Depends(get_current_user_id),
     search: Optional[str] = Query(None),
     mood: Optional[str] = Query(None),
     tag: Optional[str] = Query(None),
-    limit: int = Query(50),
+    dream_date: Optional[str] = Query(None),
+    limit: int = Query(50, ge=0),
     offset: int = Query(0),
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(False),
 ):
-    conn = get_db()
-    query = "SELECT * FROM dreams WHERE user_id = ?"
-    params = [user_id]
+    """
+    List dreams, newest first (or best match first when searching).
+
+    Pagination info is returned in headers so the body stays a plain list:
+    X-Has-More, X-Next-Cursor (pass back as ?cursor= for the next page,
+    not available for search results) and, with include_total=true,
+    X-Total-Count.
+
+    Search results carry a snippet that is HTML: the dream text is escaped
+    and matched terms are wrapped in <mark></mark>, so it can be inserted
+    as markup without letting the text itself inject any.
+    """
+    fts_query = build_fts_query(search) if search else None
+    if fts_query == "":
+        return []
+
+    if fts_query:
+        # Full-text search: BM25-ranked matches with a highlighted snippet
+        select = """SELECT dreams.*,
+                           snippet(dreams_fts, -1, ?, ?, ?, ?) AS snippet"""
+        select_params = [
+            SNIPPET_START,
+            SNIPPET_END,
+            SNIPPET_ELLIPSIS,
+            SNIPPET_TOKENS,
+        ]
+        where = """ FROM dreams_fts
+                    JOIN dreams ON dreams.id = dreams_fts.rowid
+                    WHERE dreams_fts MATCH ? AND dreams.user_id = ?"""
+        params = [fts_query, user_id]
+    else:
+        select = "SELECT *"
+        select_params = []
+        where = " FROM dreams WHERE user_id = ?"
+        params = [user_id]
 
-    if search:
-        query += " AND (title LIKE ? OR body LIKE ?)"
-        params.extend([f"%{search}%", f"%{search}%"])
     if mood:
-        query += " AND mood = ?"
+        where += " AND mood = ?"
         params.append(mood)
+    if dream_date:
+        # Undated dreams count on the day they were created, as in the calendar
+        where += """ AND ((dream_date >= ? AND dream_date < date(?, '+1 day'))
+                         OR (dream_date IS NULL
+                             AND created_at >= ? AND created_at < date(?, '+1 day')))"""
+        params.extend([dream_date] * 4)
     if tag:
-        query += " AND tags LIKE ?"
-        params.append(f'%"{tag}"%')
-
-    query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
-
-    rows = conn.execute(query, params).fetchall()
-    conn.close()
-    return [row_to_dict(r) for r in rows]
+        where += """ AND dreams.id IN (
+                        SELECT dt.dream_id FROM dream_tags dt
+                        JOIN tags t ON t.id = dt.tag_id
+                        WHERE t.user_id = ? AND t.name = ?)"""
+        params.extend([user_id, tag])
+
+    count_query = "SELECT COUNT(*) AS c" + where
+    count_params = list(params)
+
+    page = where
+    page_params = list(params)
+    if fts_query:
+        page += " ORDER BY bm25(dreams_fts, ?, ?), created_at DESC, dreams.id DESC"
+        page_params.extend(BM25_WEIGHTS)
+    else:
+        if cursor:
+            try:
+                page_params.extend(decode_cursor(cursor))
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            page += " AND (created_at, id) < (?, ?)"
+        page += " ORDER BY created_at DESC, id DESC"
+    # Fetch one extra row to learn whether another page exists
+    page += " LIMIT ?"
+    page_params.append(limit + 1)
+    if not cursor or fts_query:
+        page += " OFFSET ?"
+        page_params.append(offset)
+
+    def build():
+        headers = {}
+        with get_db() as conn:
+            rows = conn.execute(select + page, select_params + page_params).fetchall()
+            if include_total:
+                total = conn.execute(count_query, count_params).fetchone()["c"]
+                headers["X-Total-Count"] = str(total)
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        headers["X-Has-More"] = "true" if has_more else "false"
+        # An empty page (limit=0) has no last row to continue from
+        if has_more and rows and not fts_query:
+            last = rows[-1]
+            headers["X-Next-Cursor"] = encode_cursor(last["created_at"], last["id"])
+        dreams = [row_to_dict(r) for r in rows]
+        if fts_query:
+            for dream in dreams:
+                dream["snippet"] = highlight_snippet(dream["snippet"])
+        return dreams, headers
+
+    # Only the first page is cached; it is what the journal view reloads
+    if not cursor and not offset:
+        params = (search, mood, tag, dream_date, limit, include_total)
+        return cached_response(user_id, "dreams", params, build)
+    content, headers = build()
+    response.headers.update(headers)
+    return content
 
 
 @router.get("/{dream_id}")
 def get_dream(dream_id: int, user_id: int = Depends(get_current_user_id)):
-    conn = get_db()
-    row = conn.execute(
-        "SELECT * FROM dreams WHERE id = ? AND user_id = ?", (dream_id, user_id)
-    ).fetchone()
-    conn.close()
+    with get_db() as conn:
+        row = conn.execute(
+            "SELECT * FROM dreams WHERE id = ? AND user_id = ?", (dream_id, user_id)
+        ).fetchone()
     if not row:
         raise HTTPException(status_code=404, detail="Dream not found")
     return row_to_dict(row)
@@ -57,29 +156,31 @@ def get_dream(dream_id: int, user_id: int = Depends(get_current_user_id)):
 
 @router.post("", status_code=201)
 def create_dream(dream: DreamCreate, user_id: int = Depends(get_current_user_id)):
-    conn = get_db()
     now = datetime.now(timezone.utc).isoformat()
     dream_date = dream.dream_date or datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    cursor = conn.execute(
-        """INSERT INTO dreams (user_id, title, body, mood, lucidity, sleep_quality, tags, dream_date, created_at, updated_at)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-        (
-            user_id,
-            dream.title,
-            dream.body,
-            dream.mood,
-            dream.lucidity,
-            dream.sleep_quality,
-            json.dumps(dream.tags or []),
-            dream_date,
-            now,
-            now,
-        ),
-    )
-    conn.commit()
-    new_id = cursor.lastrowid
-    row = conn.execute("SELECT * FROM dreams WHERE id = ?", (new_id,)).fetchone()
-    conn.close()
+    with get_db() as conn:
+        cursor = conn.execute(
+            """INSERT INTO dreams (user_id, title, body, mood, lucidity, sleep_quality, tags, dream_date, created_at, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                user_id,
+                dream.title,
+                dream.body,
+                dream.mood,
+                dream.lucidity,
+                dream.sleep_quality,
+                json.dumps(dream.tags or []),
+                dream_date,
+                now,
+                now,
+            ),
+        )
+        new_id = cursor.lastrowid
+        set_dream_tags(conn, new_id, replace=False)
+        aggregates.add_dreams(conn, [new_id])
+        conn.commit()
+        invalidate_user(user_id)
+        row = conn.execute("SELECT * FROM dreams WHERE id = ?", (new_id,)).fetchone()
     return row_to_dict(row)
 
 
@@ -87,49 +188,55 @@ def create_dream(dream: DreamCreate, user_id: int = Depends(get_current_user_id)
 def update_dream(
     dream_id: int, dream: DreamUpdate, user_id: int = Depends(get_current_user_id)
 ):
-    conn = get_db()
-    existing = conn.execute(
-        "SELECT * FROM dreams WHERE id = ? AND user_id = ?", (dream_id, user_id)
-    ).fetchone()
-    if not existing:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Dream not found")
-
-    fields = []
-    params = []
-    for field, value in dream.model_dump(exclude_none=True).items():
-        if field == "tags":
-            value = json.dumps(value)
-        fields.append(f"{field} = ?")
-        params.append(value)
-
-    if not fields:
-        conn.close()
-        return row_to_dict(existing)
-
-    fields.append("updated_at = ?")
-    params.append(datetime.now(timezone.utc).isoformat())
-    params.append(dream_id)
-    params.append(user_id)
-
-    conn.execute(
-        f"UPDATE dreams SET {', '.join(fields)} WHERE id = ? AND user_id = ?", params
-    )
-    conn.commit()
-    row = conn.execute("SELECT * FROM dreams WHERE id = ?", (dream_id,)).fetchone()
-    conn.close()
+    with get_db() as conn:
+        existing = conn.execute(
+            "SELECT * FROM dreams WHERE id = ? AND user_id = ?", (dream_id, user_id)
+        ).fetchone()
+        if not existing:
+            raise HTTPException(status_code=404, detail="Dream not found")
+
+        fields = []
+        params = []
+        for field, value in dream.model_dump(exclude_none=True).items():
+            if field == "tags":
+                value = json.dumps(value)
+            fields.append(f"{field} = ?")
+            params.append(value)
+
+        if not fields:
+            return row_to_dict(existing)
+
+        fields.append("updated_at = ?")
+        params.append(datetime.now(timezone.utc).isoformat())
+        params.append(dream_id)
+        params.append(user_id)
+
+        aggregates.remove_dreams(conn, [dream_id])
+        conn.execute(
+            f"UPDATE dreams SET {', '.join(fields)} WHERE id = ? AND user_id = ?",
+            params,
+        )
+        if dream.tags is not None:
+            set_dream_tags(conn, dream_id)
+        aggregates.add_dreams(conn, [dream_id])
+        conn.commit()
+        invalidate_user(user_id)
+        row = conn.execute("SELECT * FROM dreams WHERE id = ?", (dream_id,)).fetchone()
     return row_to_dict(row)
 
 
 @router.delete("/{dream_id}", status_code=204)
 def delete_dream(dream_id: int, user_id: int = Depends(get_current_user_id)):
-    conn = get_db()
-    existing = conn.execute(
-        "SELECT * FROM dreams WHERE id = ? AND user_id = ?", (dream_id, user_id)
-    ).fetchone()
-    if not existing:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Dream not found")
-    conn.execute("DELETE FROM dreams WHERE id = ? AND user_id = ?", (dream_id, user_id))
-    conn.commit()
-    conn.close()
+    with get_db() as conn:
+        existing = conn.execute(
+            "SELECT * FROM dreams WHERE id = ? AND user_id = ?", (dream_id, user_id)
+        ).fetchone()
+        if not existing:
+            raise HTTPException(status_code=404, detail="Dream not found")
+        aggregates.remove_dreams(conn, [dream_id])
+        conn.execute(
+            "DELETE FROM dreams WHERE id = ? AND user_id = ?", (dream_id, user_id)
+        )
+        remove_dream_tags(conn, dream_id)
+        conn.commit()
+    invalidate_user(user_id)
@@ -0,0 +1,63 @@
+import shutil
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi.responses import FileResponse
+
+from backend.auth import get_current_user_id
+from backend.jobs import JobQueueFull, get_manager
+from backend.profiling import ProfilingRoute
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"], route_class=ProfilingRoute)
+
+
+def _get_job(job_id: str, user_id: int):
+    job = get_manager().get(job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/export", status_code=202)
+def start_export(user_id: int = Depends(get_current_user_id)):
+    """Start a background backup; poll the job, then fetch its download_url"""
+    try:
+        job = get_manager().submit_export(user_id)
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Too many jobs, try again later")
+    return job.to_dict()
+
+
+@router.post("/import", status_code=202)
+def start_import(
+    user_id: int = Depends(get_current_user_id), file: UploadFile = File(...)
+):
+    """Start a background import of a JSON backup"""
+    manager = get_manager()
+    # The upload is gone once the request ends, so the job gets its own copy
+    path = manager.temp_path(".json")
+    with open(path, "wb") as f:
+        shutil.copyfileobj(file.file, f)
+    try:
+        job = manager.submit_import(user_id, path)
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Too many jobs, try again later")
+    return job.to_dict()
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str, user_id: int = Depends(get_current_user_id)):
+    """Job status, row counts and throughput"""
+    return _get_job(job_id, user_id).to_dict()
+
+
+@router.get("/{job_id}/download")
+def download_job(job_id: str, user_id: int = Depends(get_current_user_id)):
+    """Download a finished export"""
+    job = _get_job(job_id, user_id)
+    if job.kind != "export" or job.status != "succeeded":
+        raise HTTPException(status_code=409, detail="Job has no download")
+    return FileResponse(
+        job.path,
+        media_type="application/json",
+        filename=job.filename,
+    )
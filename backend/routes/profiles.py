@@ -0,0 +1,38 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from backend import profiling
+
+router = APIRouter(prefix="/api/profiles", tags=["profiles"])
+
+
+def _require_secret(secret):
+    # 404 rather than 401/403 so the endpoint does not advertise itself
+    if not profiling.secret_matches(secret):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@router.get("", include_in_schema=False)
+def list_profiles(x_profile_secret: Optional[str] = Header(None)):
+    """Saved request profiles, newest first"""
+    _require_secret(x_profile_secret)
+    return profiling.list_profiles()
+
+
+@router.get("/{route}/{name}", include_in_schema=False)
+def get_profile(
+    route: str,
+    name: str,
+    raw: bool = False,
+    x_profile_secret: Optional[str] = Header(None),
+):
+    """Text summary of a profile, or the pstats file with ?raw=true"""
+    _require_secret(x_profile_secret)
+    path = profiling.profile_path(f"{route}/{name}", ".prof" if raw else ".txt")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if raw:
+        return FileResponse(path, filename=path.name)
+    return PlainTextResponse(path.read_text())
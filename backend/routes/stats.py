@@ -1,33 +1,40 @@
 import json
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timezone
+from typing import Optional
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
 
 from backend.auth import get_current_user_id
+from backend.backup import BackupFormatError, import_backup, iter_backup
+from backend.cache import cached_response
 from backend.database import get_db
-from backend.utils import row_to_dict
+from backend.profiling import ProfilingRoute
+from backend.stats import GRANULARITIES, average, detailed_stats, range_stats
 
-router = APIRouter(prefix="/api", tags=["stats"])
+router = APIRouter(prefix="/api", tags=["stats"], route_class=ProfilingRoute)
 
 
 @router.get("/stats")
 def get_stats(user_id: int = Depends(get_current_user_id)):
-    conn = get_db()
-    total = conn.execute(
-        "SELECT COUNT(*) as c FROM dreams WHERE user_id = ?", (user_id,)
-    ).fetchone()["c"]
-    moods = conn.execute(
-        "SELECT mood, COUNT(*) as c FROM dreams WHERE user_id = ? AND mood IS NOT NULL GROUP BY mood",
-        (user_id,),
-    ).fetchall()
-    avg_lucidity = conn.execute(
-        "SELECT AVG(lucidity) as a FROM dreams WHERE user_id = ? AND lucidity IS NOT NULL",
-        (user_id,),
-    ).fetchone()["a"]
-    conn.close()
+    return cached_response(user_id, "stats", (), lambda: (_stats(user_id), {}))
+
+
+def _stats(user_id):
+    with get_db() as conn:
+        totals = conn.execute(
+            "SELECT total, lucidity_sum, lucidity_count FROM user_stats WHERE user_id = ?",
+            (user_id,),
+        ).fetchone()
+        moods = conn.execute(
+            "SELECT key AS mood, count AS c FROM user_stat_buckets WHERE user_id = ? AND kind = 'mood'",
+            (user_id,),
+        ).fetchall()
+    avg_lucidity = (
+        average(totals["lucidity_sum"], totals["lucidity_count"]) if totals else None
+    )
     return {
-        "total": total,
+        "total": totals["total"] if totals else 0,
         "moods": {r["mood"]: r["c"] for r in moods},
         "avg_lucidity": round(avg_lucidity, 1) if avg_lucidity else None,
     }
@@ -36,262 +43,93 @@ def get_stats(user_id: int = Depends(get_current_user_id)):
 @router.get("/stats/detailed")
 def get_detailed_stats(user_id: int = Depends(get_current_user_id)):
     """Get detailed statistics for dashboard"""
-    conn = get_db()
-
-    # Basic counts
-    total = conn.execute(
-        "SELECT COUNT(*) as c FROM dreams WHERE user_id = ?", (user_id,)
-    ).fetchone()["c"]
-
-    # Dreams by month (last 12 months)
-    dreams_by_month = conn.execute(
-        """
-        SELECT 
-            strftime('%Y-%m', dream_date) as month,
-            COUNT(*) as count,
-            AVG(lucidity) as avg_lucidity
-        FROM dreams 
-        WHERE user_id = ? 
-            AND dream_date >= date('now', '-12 months')
-        GROUP BY month
-        ORDER BY month
-        """,
-        (user_id,),
-    ).fetchall()
-
-    # Dreams by day of week
-    dreams_by_dow = conn.execute(
-        """
-        SELECT 
-            CASE CAST(strftime('%w', dream_date) AS INTEGER)
-                WHEN 0 THEN 'Sunday'
-                WHEN 1 THEN 'Monday'
-                WHEN 2 THEN 'Tuesday'
-                WHEN 3 THEN 'Wednesday'
-                WHEN 4 THEN 'Thursday'
-                WHEN 5 THEN 'Friday'
-                WHEN 6 THEN 'Saturday'
-            END as day_name,
-            COUNT(*) as count
-        FROM dreams 
-        WHERE user_id = ?
-        GROUP BY strftime('%w', dream_date)
-        ORDER BY strftime('%w', dream_date)
-        """,
-        (user_id,),
-    ).fetchall()
 
-    # Mood distribution
-    mood_dist = conn.execute(
-        """
-        SELECT mood, COUNT(*) as count
-        FROM dreams 
-        WHERE user_id = ? AND mood IS NOT NULL
-        GROUP BY mood
-        ORDER BY count DESC
-        """,
-        (user_id,),
-    ).fetchall()
+    def build():
+        with get_db() as conn:
+            return detailed_stats(conn, user_id), {}
 
-    # Top tags
-    all_tags = conn.execute(
-        "SELECT tags FROM dreams WHERE user_id = ?", (user_id,)
-    ).fetchall()
-    tag_counts = {}
-    for row in all_tags:
-        tags = json.loads(row["tags"] or "[]")
-        for tag in tags:
-            tag_counts[tag] = tag_counts.get(tag, 0) + 1
-    top_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+    return cached_response(user_id, "stats/detailed", _today(), build)
 
-    # Lucidity over time
-    lucidity_trend = conn.execute(
-        """
-        SELECT 
-            strftime('%Y-%m', dream_date) as month,
-            AVG(lucidity) as avg_lucidity
-        FROM dreams 
-        WHERE user_id = ? 
-            AND lucidity IS NOT NULL
-            AND dream_date >= date('now', '-12 months')
-        GROUP BY month
-        ORDER BY month
-        """,
-        (user_id,),
-    ).fetchall()
 
-    # Current streak
-    recent_dreams = conn.execute(
-        """
-        SELECT dream_date 
-        FROM dreams 
-        WHERE user_id = ?
-        ORDER BY dream_date DESC
-        LIMIT 100
-        """,
-        (user_id,),
-    ).fetchall()
+def _today():
+    """
+    Cache key part for responses that depend on the date: the 12-month
+    window follows SQLite's UTC 'now', the current streak the local date
+    """
+    return datetime.now().date(), datetime.now(timezone.utc).date()
 
-    streak = 0
-    if recent_dreams:
-        dates = [datetime.fromisoformat(r["dream_date"]) for r in recent_dreams]
-        dates.sort(reverse=True)
 
-        current_date = datetime.now().date()
-        for i, dream_date in enumerate(dates):
-            expected_date = current_date - timedelta(days=i)
-            if dream_date.date() == expected_date or (
-                i == 0 and dream_date.date() == current_date - timedelta(days=1)
-            ):
-                streak += 1
-            else:
-                break
-
-    conn.close()
+@router.get("/stats/range")
+def get_range_stats(
+    user_id: int = Depends(get_current_user_id),
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    granularity: str = Query("month"),
+):
+    """Dream stats between two dates (inclusive), per day, week, month or year"""
+    if granularity not in GRANULARITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"granularity must be one of {', '.join(GRANULARITIES)}",
+        )
+    bounds = {}
+    for name, value in (("from", start), ("to", end)):
+        if value is not None:
+            try:
+                bounds[name] = date.fromisoformat(value).isoformat()
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid {name} date")
+    if len(bounds) == 2 and bounds["to"] < bounds["from"]:
+        raise HTTPException(status_code=400, detail="to must not be before from")
 
-    return {
-        "total_dreams": total,
-        "dreams_by_month": [
-            {
-                "month": r["month"],
-                "count": r["count"],
-                "avg_lucidity": r["avg_lucidity"],
-            }
-            for r in dreams_by_month
-        ],
-        "dreams_by_day": [
-            {"day": r["day_name"], "count": r["count"]} for r in dreams_by_dow
-        ],
-        "mood_distribution": [
-            {"mood": r["mood"], "count": r["count"]} for r in mood_dist
-        ],
-        "top_tags": [{"tag": tag, "count": count} for tag, count in top_tags],
-        "lucidity_trend": [
-            {
-                "month": r["month"],
-                "avg_lucidity": round(r["avg_lucidity"], 1) if r["avg_lucidity"] else 0,
-            }
-            for r in lucidity_trend
-        ],
-        "current_streak": streak,
-    }
+    with get_db() as conn:
+        return range_stats(
+            conn, user_id, bounds.get("from"), bounds.get("to"), granularity
+        )
 
 
 @router.get("/backup")
 def backup_dreams(user_id: int = Depends(get_current_user_id)):
-    """Export all dreams as JSON"""
-    conn = get_db()
-    rows = conn.execute(
-        "SELECT * FROM dreams WHERE user_id = ? ORDER BY created_at DESC", (user_id,)
-    ).fetchall()
-    conn.close()
-    dreams = [row_to_dict(r) for r in rows]
-
-    backup = {
-        "export_date": datetime.now(timezone.utc).isoformat(),
-        "version": "1.0",
-        "total_dreams": len(dreams),
-        "dreams": dreams,
-    }
-
-    return JSONResponse(
-        content=backup,
+    """Export all dreams as JSON, streamed in chunks"""
+    export_date = datetime.now(timezone.utc)
+    return StreamingResponse(
+        iter_backup(user_id, export_date),
+        media_type="application/json",
         headers={
-            "Content-Disposition": f"attachment; filename=dream-journal-backup-{datetime.now(timezone.utc).strftime('%Y%m%d')}.json"
+            "Content-Disposition": f"attachment; filename=dream-journal-backup-{export_date.strftime('%Y%m%d')}.json"
         },
     )
 
 
 @router.post("/import")
-async def import_dreams(
+def import_dreams(
     user_id: int = Depends(get_current_user_id), file: UploadFile = File(...)
 ):
     """Import dreams from JSON backup"""
+    # Parsed incrementally from the spooled upload and inserted in batches,
+    # so memory stays flat however large the backup is
     try:
-        # Read and parse JSON
-        content = await file.read()
-        data = json.loads(content)
-    except json.JSONDecodeError:
+        with get_db() as conn:
+            summary = import_backup(conn, user_id, file.file)
+    except (json.JSONDecodeError, UnicodeDecodeError):
         raise HTTPException(status_code=400, detail="Invalid JSON file")
-
-    # Validate backup format (outside the try block so HTTPException isn't caught)
-    if not isinstance(data, dict) or "dreams" not in data:
+    except BackupFormatError:
         raise HTTPException(status_code=400, detail="Invalid backup file format")
-
-    dreams_data = data["dreams"]
-    if not isinstance(dreams_data, list):
-        raise HTTPException(status_code=400, detail="Invalid backup file format")
-
-    try:
-        conn = get_db()
-        imported = 0
-        skipped = 0
-        errors = 0
-
-        for dream in dreams_data:
-            try:
-                # Check if dream already exists (by created_at timestamp)
-                existing = conn.execute(
-                    "SELECT id FROM dreams WHERE user_id = ? AND created_at = ?",
-                    (user_id, dream.get("created_at")),
-                ).fetchone()
-
-                if existing:
-                    skipped += 1
-                    continue
-
-                # Import the dream
-                conn.execute(
-                    """INSERT INTO dreams (user_id, title, body, mood, lucidity, sleep_quality, tags, dream_date, created_at, updated_at)
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                    (
-                        user_id,
-                        dream.get("title"),
-                        dream.get("body", ""),
-                        dream.get("mood"),
-                        dream.get("lucidity"),
-                        dream.get("sleep_quality"),
-                        (
-                            dream.get("tags")
-                            if isinstance(dream.get("tags"), str)
-                            else json.dumps(dream.get("tags", []))
-                        ),
-                        dream.get("dream_date"),
-                        dream.get("created_at", datetime.now(timezone.utc).isoformat()),
-                        dream.get("updated_at", datetime.now(timezone.utc).isoformat()),
-                    ),
-                )
-                imported += 1
-            except Exception as e:
-                print(f"Error importing dream: {e}")
-                errors += 1
-                continue
-
-        conn.commit()
-        conn.close()
-
-        return {
-            "success": True,
-            "imported": imported,
-            "skipped": skipped,
-            "errors": errors,
-            "total": len(dreams_data),
-        }
-
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
 
+    return {"success": True, **summary}
+
 
 @router.get("/tags")
 def list_tags(user_id: int = Depends(get_current_user_id)):
     """Get all unique tags - kept at /api/tags for backward compatibility"""
-    conn = get_db()
-    rows = conn.execute(
-        "SELECT tags FROM dreams WHERE user_id = ?", (user_id,)
-    ).fetchall()
-    conn.close()
-    all_tags = set()
-    for row in rows:
-        tags = json.loads(row["tags"] or "[]")
-        all_tags.update(tags)
-    return sorted(list(all_tags))
+
+    def build():
+        with get_db() as conn:
+            rows = conn.execute(
+                "SELECT name FROM tags WHERE user_id = ? ORDER BY name", (user_id,)
+            ).fetchall()
+        return [r["name"] for r in rows], {}
+
+    return cached_response(user_id, "tags", (), build)
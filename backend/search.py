@@ -0,0 +1,84 @@
+import html
+import re
+
+# Markers wrapped around matched terms in search snippets
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+# What snippet() wraps matches in: private-use characters that escaping
+# leaves alone, swapped for the HTML markers afterwards
+SNIPPET_START = "\ue000"
+SNIPPET_END = "\ue001"
+SNIPPET_ELLIPSIS = "…"
+SNIPPET_TOKENS = 16
+
+# bm25() column weights for (title, body); title hits rank higher
+BM25_WEIGHTS = (5.0, 1.0)
+
+_TOKEN_RE = re.compile(r'"([^"]*)"(\*?)|(\S+)')
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def build_fts_query(search: str) -> str:
+    """
+    Translate user search input into an FTS5 MATCH expression.
+
+    - "quoted text" is matched as a phrase ("quoted text"* as a phrase prefix)
+    - bare words are prefix matches, so "fly" finds "flying"
+    - every term must match (implicit AND)
+
+    Terms are always quoted, so FTS5 operators typed by the user are treated
+    as plain text. Returns an empty string if nothing searchable remains.
+    """
+    terms = []
+    for match in _TOKEN_RE.finditer(search):
+        phrase, phrase_prefix, word = match.groups()
+        if phrase is not None:
+            if not any(c.isalnum() for c in phrase):
+                continue
+            terms.append(_quote(phrase) + phrase_prefix)
+        else:
+            word = word.rstrip("*")
+            if not any(c.isalnum() for c in word):
+                continue
+            terms.append(_quote(word) + "*")
+    return " ".join(terms)
+
+
+def highlight_snippet(snippet):
+    """
+    HTML-escape a snippet() result and wrap its matches in HIGHLIGHT_START
+    and HIGHLIGHT_END, so the markers are the only markup in it.
+    """
+    if snippet is None:
+        return None
+    escaped = html.escape(snippet, quote=False)
+    return escaped.replace(SNIPPET_START, HIGHLIGHT_START).replace(
+        SNIPPET_END, HIGHLIGHT_END
+    )
+
+
+def backfill(conn, batch_size):
+    """
+    Migration backfill: index existing dreams batch_size at a time. The
+    index must start empty, as each dream is inserted without checking.
+    """
+    last = 0
+    while True:
+        count, high = conn.execute(
+            """SELECT COUNT(*), MAX(id) FROM (
+                   SELECT id FROM dreams WHERE id > ? ORDER BY id LIMIT ?
+               )""",
+            (last, batch_size),
+        ).fetchone()
+        if not count:
+            return
+        conn.execute(
+            """INSERT INTO dreams_fts (rowid, title, body)
+               SELECT id, title, body FROM dreams WHERE id > ? AND id <= ?""",
+            (last, high),
+        )
+        last = high
+        yield count
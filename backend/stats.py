@@ -0,0 +1,182 @@
+"""
+The /api/stats/detailed dashboard and /api/stats/range queries.
+
+Every dashboard section except the streaks comes from one statement over
+the stats aggregates, each part an index range scan: the user's mood and
+weekday buckets, the month buckets inside the 12-month window, the ten
+largest tag buckets (via the count index), and the month the window
+starts in. That month is only partly inside the window, so it is summed
+from the daily rollups (backend.rollups) of the days inside it. The rows
+are dispatched by kind into small lists that are sorted in Python; the
+total is the sum of the weekday buckets, since every dream has one. The
+streaks come from the user's activity bitmap (backend.activity).
+
+Range queries merge the daily rollups of the range into day, week
+(starting Monday), month or year buckets with GROUP BY, one statement
+for the counts and averages and one for the moods.
+"""
+
+from backend import activity
+
+DAY_NAMES = [
+    "Sunday",
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+]
+TOP_TAGS = 10
+
+# Bucket start for each range granularity, from a rollup's day
+GRANULARITIES = {
+    "day": "day",
+    "week": "date(day, '-6 days', 'weekday 1')",
+    "month": "substr(day, 1, 7) || '-01'",
+    "year": "substr(day, 1, 4) || '-01-01'",
+}
+
+_DETAILED_SQL = f"""
+    WITH w AS (
+        SELECT date('now', '-12 months') AS start,
+               strftime('%Y-%m', 'now', '-12 months') AS first_month,
+               date('now', '-12 months', 'start of month', '+1 month') AS next_month
+    )
+    SELECT 'month', w.first_month, COALESCE(SUM(r.count), 0),
+           COALESCE(SUM(r.lucidity_sum), 0), COALESCE(SUM(r.lucidity_count), 0)
+    FROM w
+    LEFT JOIN user_daily_stats r
+        ON r.user_id = :user_id
+        AND r.day >= w.start AND r.day < w.next_month
+    UNION ALL
+    SELECT kind, key, count, lucidity_sum, lucidity_count
+    FROM user_stat_buckets
+    WHERE user_id = :user_id AND kind IN ('mood', 'weekday')
+    UNION ALL
+    SELECT kind, key, count, lucidity_sum, lucidity_count
+    FROM user_stat_buckets
+    WHERE user_id = :user_id AND kind = 'month'
+        AND key > (SELECT first_month FROM w)
+    UNION ALL
+    SELECT * FROM (
+        SELECT kind, key, count, lucidity_sum, lucidity_count
+        FROM user_stat_buckets
+        WHERE user_id = :user_id AND kind = 'tag'
+        ORDER BY count DESC, key
+        LIMIT {TOP_TAGS}
+    )
+"""
+
+
+def average(total, count):
+    return total / count if count else None
+
+
+def _by_count(rows):
+    return sorted(rows, key=lambda r: (-r[2], r[1]))
+
+
+def detailed_stats(conn, user_id):
+    """The detailed stats response for one user"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = {"month": [], "weekday": [], "mood": [], "tag": []}
+    for row in cursor.execute(_DETAILED_SQL, {"user_id": user_id}):
+        rows[row[0]].append(row)
+
+    # Row order across and within the parts is not guaranteed; sort here
+    months = sorted(r[1:] for r in rows["month"] if r[2])
+    weekdays = sorted(rows["weekday"], key=lambda r: r[1])
+    days = activity.load(conn, user_id)
+    return {
+        "total_dreams": sum(r[2] for r in weekdays),
+        "dreams_by_month": [
+            {"month": month, "count": count, "avg_lucidity": average(lsum, lcount)}
+            for month, count, lsum, lcount in months
+        ],
+        "dreams_by_day": [
+            {"day": DAY_NAMES[int(key)] if key else None, "count": count}
+            for _, key, count, _, _ in weekdays
+        ],
+        "mood_distribution": [
+            {"mood": key, "count": count}
+            for _, key, count, _, _ in _by_count(rows["mood"])
+        ],
+        "top_tags": [
+            {"tag": key, "count": count}
+            for _, key, count, _, _ in _by_count(rows["tag"])
+        ],
+        "lucidity_trend": [
+            {"month": month, "avg_lucidity": round(lsum / lcount, 1) or 0}
+            for month, _, lsum, lcount in months
+            if lcount
+        ],
+        "current_streak": days.current_streak(),
+        "longest_streak": days.longest_streak(),
+    }
+
+
+def _rounded(total, count):
+    value = average(total, count)
+    return round(value, 1) if value is not None else None
+
+
+def range_stats(conn, user_id, start, end, granularity):
+    """
+    Dated dreams from start to end (ISO dates, inclusive; None for open
+    ended) in granularity buckets, plus totals over the whole range.
+
+    Only buckets with dreams are listed; each is labelled with its first
+    day, which for the outer buckets may lie outside the range.
+    """
+    bucket = GRANULARITIES[granularity]
+    params = (user_id, start or "", end or "9999-12-31")
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(
+        f"""SELECT {bucket} AS bucket, SUM(count), SUM(lucidity_sum),
+                   SUM(lucidity_count), SUM(sleep_quality_sum),
+                   SUM(sleep_quality_count)
+            FROM user_daily_stats
+            WHERE user_id = ? AND day >= ? AND day <= ?
+            GROUP BY bucket
+            ORDER BY bucket""",
+        params,
+    ).fetchall()
+    moods = {}
+    for key, mood, count in cursor.execute(
+        f"""SELECT {bucket} AS bucket, mood, SUM(count)
+            FROM user_daily_moods
+            WHERE user_id = ? AND day >= ? AND day <= ?
+            GROUP BY bucket, mood""",
+        params,
+    ):
+        moods.setdefault(key, {})[mood] = count
+
+    sums = [sum(r[i] for r in rows) for i in range(1, 6)]
+    total_moods = {}
+    for counts in moods.values():
+        for mood, count in counts.items():
+            total_moods[mood] = total_moods.get(mood, 0) + count
+    return {
+        "from": start,
+        "to": end,
+        "granularity": granularity,
+        "total": {
+            "count": sums[0],
+            "avg_lucidity": _rounded(sums[1], sums[2]),
+            "avg_sleep_quality": _rounded(sums[3], sums[4]),
+            "moods": total_moods,
+        },
+        "buckets": [
+            {
+                "start": key,
+                "count": count,
+                "avg_lucidity": _rounded(lsum, lcount),
+                "avg_sleep_quality": _rounded(ssum, scount),
+                "moods": moods.get(key, {}),
+            }
+            for key, count, lsum, lcount, ssum, scount in rows
+        ],
+    }
@@ -0,0 +1,115 @@
+"""
+Normalized tags: tags holds each user's distinct names, dream_tags links
+dreams to them. The JSON tags column of dreams stays the source of truth;
+links are derived from it with json_each, so splitting, filtering and
+de-duplicating tag names happens inside SQLite rather than in Python.
+"""
+
+import json
+
+from backend.utils import json_ids
+
+# dreams.tags as a JSON array, or NULL when it is malformed
+_TAGS_ARRAY_SQL = """CASE WHEN json_valid(d.tags) THEN
+    CASE json_type(d.tags) WHEN 'array' THEN d.tags END
+END"""
+
+_BY_IDS = "d.id IN (SELECT value FROM json_each(?))"
+
+
+def set_dream_tags(conn, dream_id, replace=True):
+    """
+    Point a dream at exactly the tags in its (already written) tags column.
+
+    Runs on the caller's connection without committing, so it shares the
+    transaction of the dream write it belongs to.
+    """
+    old_tag_ids = []
+    if replace:
+        old_tag_ids = [
+            r[0]
+            for r in conn.execute(
+                "DELETE FROM dream_tags WHERE dream_id = ? RETURNING tag_id",
+                (dream_id,),
+            ).fetchall()
+        ]
+    add_dream_tags(conn, [dream_id])
+    prune_tags(conn, old_tag_ids)
+
+
+def add_dream_tags(conn, dream_ids):
+    """Link new dreams to the tags in their tags column, in bulk"""
+    if dream_ids:
+        _link(conn, _BY_IDS, [json_ids(dream_ids)])
+
+
+def remove_dream_tags(conn, dream_id):
+    """Detach a dream from its tags, dropping tags no longer in use"""
+    tag_ids = [
+        r[0]
+        for r in conn.execute(
+            "DELETE FROM dream_tags WHERE dream_id = ? RETURNING tag_id", (dream_id,)
+        ).fetchall()
+    ]
+    prune_tags(conn, tag_ids)
+
+
+def remove_user_tags(conn, user_id):
+    """Delete every tag and tag link belonging to a user"""
+    conn.execute(
+        """DELETE FROM dream_tags
+           WHERE tag_id IN (SELECT id FROM tags WHERE user_id = ?)""",
+        (user_id,),
+    )
+    conn.execute("DELETE FROM tags WHERE user_id = ?", (user_id,))
+
+
+def prune_tags(conn, tag_ids):
+    """Delete the given tags if no dream references them any more"""
+    if tag_ids:
+        conn.execute(
+            """DELETE FROM tags WHERE id IN (SELECT value FROM json_each(?))
+               AND NOT EXISTS (SELECT 1 FROM dream_tags WHERE tag_id = tags.id)""",
+            (json.dumps(tag_ids),),
+        )
+
+
+def _link(conn, where, params):
+    """Create the tags and links of the dreams (aliased d) matching where"""
+    conn.execute(
+        f"""INSERT OR IGNORE INTO tags (user_id, name)
+            SELECT DISTINCT d.user_id, j.value
+            FROM dreams d, json_each({_TAGS_ARRAY_SQL}) j
+            WHERE {where} AND j.type = 'text'""",
+        params,
+    )
+    conn.execute(
+        f"""INSERT OR IGNORE INTO dream_tags (dream_id, tag_id)
+            SELECT d.id, t.id
+            FROM dreams d, json_each({_TAGS_ARRAY_SQL}) j
+            JOIN tags t ON t.user_id = d.user_id AND t.name = j.value
+            WHERE {where} AND j.type = 'text'""",
+        params,
+    )
+
+
+def backfill_tags(conn):
+    """Populate tags/dream_tags from the JSON tags column of existing dreams"""
+    _link(conn, "true", [])
+
+
+def backfill(conn, batch_size):
+    """Migration backfill: link existing dreams batch_size at a time"""
+    last = 0
+    while True:
+        count, high = conn.execute(
+            """SELECT COUNT(*), MAX(id) FROM (
+                   SELECT id FROM dreams WHERE id > ? ORDER BY id LIMIT ?
+               )""",
+            (last, batch_size),
+        ).fetchone()
+        if not count:
+            return
+        _link(conn, "d.id > ? AND d.id <= ?", [last, high])
+        last = high
+        yield count
@@ -1,4 +1,5 @@
 import os
+import re
 import tempfile
 
 import pytest
@@ -37,8 +38,11 @@ def client():
             assert response.status_code == 200
     """
     # Import here to ensure env vars are set first
+    from backend.auth import token_cache
+    from backend.cache import response_cache
     from backend.database import init_db
     from backend.main import app
+    from backend.ratelimit import limiter
 
     # Get the database path from environment
     db_path = os.environ.get("DB_PATH")
@@ -49,6 +53,9 @@ def client():
 
     # Initialize fresh database
     init_db()
+    limiter.reset()
+    token_cache.clear()
+    response_cache.clear()
 
     # Create test client
     with TestClient(app) as test_client:
@@ -163,6 +170,28 @@ def second_user(client):
     }
 
 
+@pytest.fixture
+def query_budget():
+    """
+    Check how many SQL statements a request ran, from its Server-Timing header.
+
+    Usage:
+        def test_list(client, auth_headers, query_budget):
+            response = client.get("/api/dreams", headers=auth_headers)
+            query_budget(response, 2)
+    """
+
+    def check(response, max_queries):
+        timing = response.headers["server-timing"]
+        count = int(re.search(r'desc="(\d+) queries"', timing).group(1))
+        assert (
+            count <= max_queries
+        ), f"{response.request.url.path} ran {count} queries, budget {max_queries}"
+        return count
+
+    return check
+
+
 # Configure pytest
 def pytest_configure(config):
     """Configure pytest with custom markers"""
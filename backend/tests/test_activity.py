@@ -0,0 +1,231 @@
+import random
+from datetime import date, datetime, timedelta
+
+
+def _activity(days):
+    from backend.activity import Activity
+
+    ordinals = [d.toordinal() for d in days]
+    first_day = min(ordinals) // 8 * 8
+    return Activity(first_day, sum(1 << (o - first_day) for o in set(ordinals)))
+
+
+def _runs(days):
+    """(start, length) of each run of consecutive days, the slow way"""
+    runs = []
+    for day in sorted(set(days)):
+        if runs and runs[-1][0] + timedelta(days=runs[-1][1]) == day:
+            runs[-1][1] += 1
+        else:
+            runs.append([day, 1])
+    return runs
+
+
+def _check():
+    from backend import activity
+    from backend.database import get_db
+
+    with get_db() as conn:
+        return activity.check(conn)
+
+
+class TestActivityBitmap:
+    """Test the day-presence bitmap operations"""
+
+    def test_operations_match_brute_force(self):
+        """Test streaks, day counts and gaps against a walk over the days"""
+        rng = random.Random(7)
+        start = date(2023, 1, 1)
+        for _ in range(30):
+            days = [
+                start + timedelta(days=i)
+                for i in range(rng.randint(1, 700))
+                if rng.random() < 0.8
+            ] or [start]
+            bitmap = _activity(days)
+            runs = _runs(days)
+            day_set = set(days)
+
+            assert bitmap.longest_streak() == max(n for _, n in runs)
+            assert bitmap.first() == min(days) and bitmap.last() == max(days)
+            for day, length in runs:
+                end = day + timedelta(days=length - 1)
+                assert bitmap.streak_ending(end) == length
+                assert bitmap.streak_ending(end + timedelta(days=1)) == 0
+            lo, hi = start + timedelta(days=20), start + timedelta(days=400)
+            assert bitmap.days_between(lo, hi) == sum(lo <= d <= hi for d in day_set)
+            assert bitmap.gaps() == [
+                (a[0] + timedelta(days=a[1]), b[0] - timedelta(days=1))
+                for a, b in zip(runs, runs[1:])
+            ]
+
+    def test_current_streak_allows_empty_today(self):
+        """Test the current streak may end yesterday but not before"""
+        today = date(2024, 3, 10)
+        days = [today - timedelta(days=i) for i in range(1, 151)]
+
+        assert _activity(days).current_streak(today) == 150
+        assert _activity(days + [today]).current_streak(today) == 151
+        assert _activity(days[1:]).current_streak(today) == 0
+
+    def test_gaps_min_days(self):
+        """Test only gaps of at least min_days are reported"""
+        bitmap = _activity(
+            [date(2024, 1, 1), date(2024, 1, 3), date(2024, 1, 10), date(2024, 1, 11)]
+        )
+
+        assert bitmap.gaps(min_days=3) == [(date(2024, 1, 4), date(2024, 1, 9))]
+        assert bitmap.days_between(date(2024, 1, 2), date(2024, 1, 10)) == 2
+
+
+class TestActivityMaintenance:
+    """Test the bitmaps follow dream writes"""
+
+    def test_streaks_in_detailed_stats(self, client, auth_headers):
+        """Test streaks count days, not dreams, and are not capped"""
+        today = datetime.now().date()
+        for i in range(120):
+            client.post(
+                "/api/dreams",
+                headers=auth_headers,
+                json={"body": f"D{i}", "dream_date": str(today - timedelta(days=i))},
+            )
+        for i in range(3):
+            client.post(
+                "/api/dreams",
+                headers=auth_headers,
+                json={"body": f"Again {i}", "dream_date": str(today)},
+            )
+
+        data = client.get("/api/stats/detailed", headers=auth_headers).json()
+
+        assert data["current_streak"] == 120
+        assert data["longest_streak"] == 120
+
+    def test_day_cleared_with_its_last_dream(self, client, auth_headers):
+        """Test a day stays marked until no dream is left on it"""
+        from backend import activity
+        from backend.database import get_db
+
+        first, second = (
+            client.post(
+                "/api/dreams",
+                headers=auth_headers,
+                json={"body": "D", "dream_date": "2024-05-01"},
+            ).json()["id"]
+            for _ in range(2)
+        )
+        user_id = client.get("/api/auth/me", headers=auth_headers).json()["id"]
+
+        def days():
+            with get_db() as conn:
+                bitmap = activity.load(conn, user_id)
+            return bitmap.days_between(date(2024, 1, 1), date(2024, 12, 31))
+
+        client.delete(f"/api/dreams/{first}", headers=auth_headers)
+        assert days() == 1
+        client.put(
+            f"/api/dreams/{second}",
+            headers=auth_headers,
+            json={"dream_date": "2024-05-03T07:30:00"},
+        )
+        with get_db() as conn:
+            assert activity.load(conn, user_id).has(date(2024, 5, 3))
+            assert not activity.load(conn, user_id).has(date(2024, 5, 1))
+        client.delete(f"/api/dreams/{second}", headers=auth_headers)
+        assert days() == 0
+        assert _check() == []
+
+    def test_removed_with_account(self, client, auth_headers):
+        """Test deleting an account drops its bitmap"""
+        from backend.database import get_db
+
+        client.post("/api/dreams", headers=auth_headers, json={"body": "D"})
+        client.delete("/api/auth/delete-account", headers=auth_headers)
+
+        with get_db() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM user_activity").fetchone()[0] == 0
+
+    def test_migration_backfills_existing_dreams(self, client, auth_headers):
+        """Test the migration builds bitmaps for dreams written before it"""
+        from backend.database import get_db
+        from backend.migrations import migrate
+
+        for day in ["2024-01-01", "2024-01-02", "2024-02-01"]:
+            client.post(
+                "/api/dreams",
+                headers=auth_headers,
+                json={"body": "D", "dream_date": day},
+            )
+        with get_db() as conn:
+            conn.execute("DELETE FROM user_activity")
+            conn.execute("DELETE FROM schema_version WHERE version >= 2")
+            conn.commit()
+            assert _check() != []
+
+            migrate(conn, batch_size=1)
+
+        assert _check() == []
+
+    def test_days_python_cannot_parse_are_skipped(self, client, auth_headers):
+        """Test dates SQLite accepts but Python cannot still save and import"""
+        import io
+        import json
+
+        for day in ["2024-02-30", "0000-01-01"]:
+            response = client.post(
+                "/api/dreams",
+                headers=auth_headers,
+                json={"body": "Odd", "dream_date": day},
+            )
+            assert response.status_code == 201
+        files = {
+            "file": (
+                "backup.json",
+                io.BytesIO(
+                    json.dumps(
+                        {
+                            "dreams": [
+                                {"body": "I", "dream_date": "2023-04-31"},
+                                {"body": "J", "dream_date": "2023-04-01"},
+                            ]
+                        }
+                    ).encode()
+                ),
+                "application/json",
+            )
+        }
+        response = client.post("/api/import", headers=auth_headers, files=files)
+
+        assert response.status_code == 200
+        assert client.get("/api/stats", headers=auth_headers).json()["total"] == 4
+        assert _check() == []
+
+    def test_migration_skips_days_python_cannot_parse(self, client, auth_headers):
+        """Test the backfill does not fail on a day Python cannot parse"""
+        from backend import activity
+        from backend.database import get_db
+        from backend.migrations import migrate
+
+        for day in ["2024-02-30", "2024-03-01"]:
+            client.post(
+                "/api/dreams",
+                headers=auth_headers,
+                json={"body": "D", "dream_date": day},
+            )
+        with get_db() as conn:
+            conn.execute("DELETE FROM user_activity")
+            conn.execute("DELETE FROM schema_version WHERE version >= 2")
+            conn.commit()
+
+            migrate(conn)
+
+        assert _check() == []
+        user_id = client.get("/api/auth/me", headers=auth_headers).json()["id"]
+        with get_db() as conn:
+            assert (
+                activity.load(conn, user_id).days_between(
+                    date(2024, 1, 1), date(2024, 12, 31)
+                )
+                == 1
+            )
@@ -0,0 +1,97 @@
+import io
+import json
+
+
+def _check():
+    from backend import aggregates, rollups
+    from backend.database import get_db
+
+    with get_db() as conn:
+        return aggregates.check(conn) + rollups.check(conn)
+
+
+class TestAggregates:
+    """Test incrementally maintained stats aggregates"""
+
+    def test_consistent_after_writes(self, client, auth_headers):
+        """Test aggregates match the dreams after create, update and delete"""
+        ids = [
+            client.post(
+                "/api/dreams",
+                headers=auth_headers,
+                json={
+                    "body": f"Dream {i}",
+                    "mood": "joyful" if i % 2 else "fearful",
+                    "lucidity": i,
+                    "tags": ["a", "b"] if i % 2 else ["c"],
+                    "dream_date": f"2024-0{i + 1}-10",
+                },
+            ).json()["id"]
+            for i in range(5)
+        ]
+        client.put(
+            f"/api/dreams/{ids[0]}",
+            headers=auth_headers,
+            json={"mood": "peaceful", "tags": ["d"], "dream_date": "2023-12-31"},
+        )
+        client.delete(f"/api/dreams/{ids[1]}", headers=auth_headers)
+
+        assert _check() == []
+        stats = client.get("/api/stats", headers=auth_headers).json()
+        assert stats["total"] == 4
+        assert stats["moods"] == {"peaceful": 1, "fearful": 2, "joyful": 1}
+
+    def test_consistent_after_import(self, client, auth_headers):
+        """Test imported dreams are counted"""
+        backup_data = {
+            "dreams": [
+                {"body": "One", "mood": "calm", "tags": ["x"], "created_at": "1"},
+                {"body": "Two", "lucidity": 4, "created_at": "2"},
+            ]
+        }
+        files = {
+            "file": (
+                "backup.json",
+                io.BytesIO(json.dumps(backup_data).encode()),
+                "application/json",
+            )
+        }
+        client.post("/api/import", headers=auth_headers, files=files)
+
+        assert _check() == []
+        stats = client.get("/api/stats", headers=auth_headers).json()
+        assert stats == {"total": 2, "moods": {"calm": 1}, "avg_lucidity": 4.0}
+
+    def test_removed_with_account(self, client, test_user, auth_headers):
+        """Test deleting an account drops its aggregates"""
+        from backend.database import get_db
+
+        client.post(
+            "/api/dreams", headers=auth_headers, json={"body": "D", "mood": "calm"}
+        )
+        client.delete("/api/auth/delete-account", headers=auth_headers)
+
+        with get_db() as conn:
+            rows = conn.execute(
+                "SELECT COUNT(*) FROM user_stat_buckets WHERE user_id = ?",
+                (test_user["id"],),
+            ).fetchone()[0]
+        assert rows == 0
+        assert _check() == []
+
+    def test_check_and_rebuild(self, client, auth_headers):
+        """Test the checker reports drift and rebuild repairs it"""
+        from backend import aggregates
+        from backend.database import get_db
+
+        client.post(
+            "/api/dreams", headers=auth_headers, json={"body": "D", "mood": "calm"}
+        )
+        with get_db() as conn:
+            conn.execute("UPDATE user_stats SET total = 99")
+            conn.commit()
+
+        assert aggregates.main(["check"]) == 1
+        assert aggregates.main(["rebuild"]) == 0
+        assert aggregates.main(["check"]) == 0
+        assert client.get("/api/stats", headers=auth_headers).json()["total"] == 1
@@ -167,6 +167,77 @@ class TestLogin:
 
         assert response.status_code == 401
 
+    def test_login_hash_stats(self, client, test_user):
+        """Test logins are counted in the hashing pool stats"""
+        from backend import hashing
+
+        before = hashing.stats()["completed"]
+        client.post(
+            "/api/auth/login",
+            json={"email": test_user["email"], "password": test_user["password"]},
+        )
+
+        stats = hashing.stats()
+        assert stats["completed"] == before + 1
+        assert stats["pending"] == 0
+        assert stats["latency_max"] > 0
+
+    def test_login_hash_pool_busy(self, client, test_user, monkeypatch):
+        """Test logins fail fast when the hashing queue is full"""
+        from backend import hashing
+
+        monkeypatch.setattr(hashing, "HASH_MAX_PENDING", 0)
+        response = client.post(
+            "/api/auth/login",
+            json={"email": test_user["email"], "password": test_user["password"]},
+        )
+
+        assert response.status_code == 503
+
+    def test_login_survives_killed_hash_worker(self, client, test_user):
+        """Test a dead hashing worker is replaced instead of failing every login"""
+        import os
+        import signal
+        import time
+
+        from backend import hashing
+
+        login = {"email": test_user["email"], "password": test_user["password"]}
+        assert client.post("/api/auth/login", json=login).status_code == 200
+        pool = hashing._get_pool()
+        for pid in list(pool._processes):
+            os.kill(pid, signal.SIGKILL)
+        deadline = time.monotonic() + 10
+        while not pool._broken and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        for _ in range(2):
+            assert client.post("/api/auth/login", json=login).status_code == 200
+        assert hashing._get_pool() is not pool
+
+    def test_login_rehashes_on_cost_change(self, client, test_user, monkeypatch):
+        """Test a hash made with another bcrypt cost is upgraded on login"""
+        from backend import hashing
+        from backend.database import get_db
+
+        monkeypatch.setattr(hashing, "_rounds", 4)
+        credentials = {"email": test_user["email"], "password": test_user["password"]}
+
+        assert client.post("/api/auth/login", json=credentials).status_code == 200
+        with get_db() as conn:
+            stored = conn.execute(
+                "SELECT password_hash FROM users WHERE id = ?", (test_user["id"],)
+            ).fetchone()[0]
+        assert hashing.hash_rounds(stored) == 4
+        assert client.post("/api/auth/login", json=credentials).status_code == 200
+
+    def test_bcrypt_calibration_bounds(self):
+        """Test calibration stays within the configured cost range"""
+        from backend import hashing
+
+        assert hashing.calibrate(target_ms=0, min_rounds=4, max_rounds=6) == 4
+        assert hashing.calibrate(target_ms=1e9, min_rounds=4, max_rounds=6) == 6
+
 
 class TestCurrentUser:
     """Test getting current user information"""
@@ -197,6 +268,42 @@ class TestCurrentUser:
         assert response.status_code == 401
 
 
+class TestTokenCache:
+    """Test the verified-token cache"""
+
+    def test_repeated_token_hits_cache(self, client, auth_headers):
+        """Test a replayed token is served from the cache"""
+        from backend.auth import token_cache
+
+        for _ in range(3):
+            client.get("/api/auth/me", headers=auth_headers)
+
+        stats = token_cache.stats()
+        assert stats["hits"] >= 2
+        assert stats["hit_ratio"] > 0.5
+
+    def test_cache_honours_expiry(self):
+        """Test an entry is not served past the token's exp"""
+        from backend.auth import TokenCache
+
+        cache = TokenCache(max_size=10, ttl=300)
+        cache.put("t", {"user_id": 1, "exp": 1005}, now=1000, decode_seconds=0.001)
+
+        assert cache.get("t", now=1004) == {"user_id": 1, "exp": 1005}
+        assert cache.get("t", now=1005) is None
+
+    def test_cache_is_bounded(self):
+        """Test least recently used tokens are evicted"""
+        from backend.auth import TokenCache
+
+        cache = TokenCache(max_size=2, ttl=300)
+        for token in ("a", "b", "c"):
+            cache.put(token, {"user_id": 1}, now=0, decode_seconds=0)
+
+        assert cache.get("a", now=1) is None
+        assert cache.stats()["size"] == 2
+
+
 class TestPasswordChange:
     """Test password change functionality"""
 
@@ -228,6 +335,23 @@ class TestPasswordChange:
         )
         assert old_login.status_code == 401
 
+    def test_change_password_revokes_tokens(self, client, test_user, auth_headers):
+        """Test old tokens stop working and the returned one works"""
+        assert client.get("/api/auth/me", headers=auth_headers).status_code == 200
+
+        response = client.put(
+            "/api/auth/change-password",
+            headers=auth_headers,
+            json={
+                "current_password": test_user["password"],
+                "new_password": "newpassword123",
+            },
+        )
+
+        assert client.get("/api/auth/me", headers=auth_headers).status_code == 401
+        new_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        assert client.get("/api/auth/me", headers=new_headers).status_code == 200
+
     def test_change_password_wrong_current(self, client, auth_headers):
         """Test changing password with wrong current password fails"""
         response = client.put(
@@ -350,14 +474,21 @@ class TestAccountDeletion:
         client.delete("/api/auth/delete-account", headers=auth_headers)
 
         # Verify dreams are deleted
-        conn = get_db()
-        dreams = conn.execute(
-            "SELECT * FROM dreams WHERE user_id = ?", (test_user["id"],)
-        ).fetchall()
-        conn.close()
+        with get_db() as conn:
+            dreams = conn.execute(
+                "SELECT * FROM dreams WHERE user_id = ?", (test_user["id"],)
+            ).fetchall()
 
         assert len(dreams) == 0
 
+    def test_delete_account_revokes_token(self, client, auth_headers):
+        """Test the deleted account's token is rejected afterwards"""
+        client.delete("/api/auth/delete-account", headers=auth_headers)
+
+        response = client.get("/api/dreams", headers=auth_headers)
+
+        assert response.status_code == 401
+
     def test_delete_account_unauthorized(self, client):
         """Test deleting account without auth fails"""
         response = client.delete("/api/auth/delete-account")
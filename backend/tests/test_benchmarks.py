@@ -0,0 +1,186 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+
+class TestDatasets:
+    """Test the synthetic benchmark datasets"""
+
+    def test_deterministic(self):
+        """Test the same seed yields the same dreams"""
+        from benchmarks import datasets
+
+        first = list(datasets.iter_dreams(random.Random(7), 50))
+        again = list(datasets.iter_dreams(random.Random(7), 50))
+        other = list(datasets.iter_dreams(random.Random(8), 50))
+
+        assert first == again
+        assert first != other
+        assert [d["created_at"] for d in first] == sorted(
+            d["created_at"] for d in first
+        )
+        assert len({d["created_at"] for d in first}) == 50
+
+
+class TestSeed:
+    """Test the bulk seed-data loader"""
+
+    def test_populate_matches_init_db(self, tmp_path):
+        """Test a seeded database has the full schema and consistent derived data"""
+        from backend import activity, aggregates, database, rollups
+        from benchmarks.seed import populate
+
+        path, fresh = tmp_path / "seeded.db", tmp_path / "fresh.db"
+        users = populate(path, 2, 30, seed=1, password_hash="!")
+        database.init_db(str(fresh))
+
+        schema = "SELECT type, name FROM sqlite_master ORDER BY type, name"
+        conn = database.connect(str(path))
+        try:
+            assert users == [(1, "bench0@example.com"), (2, "bench1@example.com")]
+            with database.connect(str(fresh)) as other:
+                assert (
+                    conn.execute(schema).fetchall() == other.execute(schema).fetchall()
+                )
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("SELECT COUNT(*) FROM dreams").fetchone()[0] == 60
+            assert aggregates.check(conn) == []
+            assert activity.check(conn) == []
+            assert rollups.check(conn) == []
+            untagged = conn.execute(
+                "SELECT COUNT(*) FROM dreams d WHERE NOT EXISTS "
+                "(SELECT 1 FROM dream_tags t WHERE t.dream_id = d.id)"
+            ).fetchone()[0]
+            assert (
+                untagged
+                == conn.execute(
+                    "SELECT COUNT(*) FROM dreams WHERE tags = '[]'"
+                ).fetchone()[0]
+            )
+            assert (
+                conn.execute(
+                    "SELECT COUNT(*) FROM dreams_fts WHERE dreams_fts MATCH 'dream'"
+                ).fetchone()[0]
+                == conn.execute(
+                    "SELECT COUNT(*) FROM dreams WHERE title IS NOT NULL"
+                ).fetchone()[0]
+            )
+        finally:
+            conn.close()
+
+        with pytest.raises(ValueError):
+            populate(path, 1, 1, password_hash="!")
+
+    def test_backup_files_import(self, client, auth_headers, tmp_path):
+        """Test the emitted backup files import cleanly"""
+        from benchmarks.seed import write_backups
+
+        (path,) = write_backups(tmp_path, 1, 25, seed=3)
+        with open(path, "rb") as f:
+            response = client.post(
+                "/api/import",
+                headers=auth_headers,
+                files={"file": ("backup.json", f, "application/json")},
+            )
+
+        assert response.status_code == 200
+        assert response.json()["imported"] == 25
+        assert client.get("/api/stats", headers=auth_headers).json()["total"] == 25
+
+
+class TestCompare:
+    """Test benchmark result helpers"""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        from benchmarks.runner import percentile
+
+        values = list(range(1, 101))
+        assert percentile(values, 0.5) == 50
+        assert percentile(values, 0.95) == 95
+        assert percentile(values, 1.0) == 100
+        assert percentile([], 0.5) is None
+
+    def test_flags_regressions_over_threshold(self):
+        """Test only slowdowns beyond the threshold are reported"""
+        from benchmarks.runner import compare
+
+        baseline = {"results": {"100": {"a": {"p50_ms": 10, "p95_ms": 20}}}}
+        current = {
+            "results": {
+                "100": {
+                    "a": {"p50_ms": 11, "p95_ms": 30},
+                    "new": {"p50_ms": 5, "p95_ms": 5},
+                }
+            }
+        }
+
+        assert compare(current, baseline, 0.2) == [("100", "a", "p95_ms", 20, 30)]
+        assert compare(current, baseline, 0.6) == []
+
+
+class TestLegacyStats:
+    """Test the stats benchmark's reference implementation"""
+
+    def test_detailed_stats_match_previous_queries(self, client, auth_headers):
+        """Test the single-statement engine returns what the per-section queries did"""
+        from backend.database import get_db
+        from backend.stats import detailed_stats
+        from benchmarks.stats import legacy_detailed_stats
+
+        today = date.today()
+        for i in range(40):
+            client.post(
+                "/api/dreams",
+                headers=auth_headers,
+                json={
+                    "body": f"Dream {i}",
+                    "mood": ["joyful", "eerie", "vivid"][i % 3] if i % 4 else None,
+                    "lucidity": i % 6 if i % 5 else None,
+                    "tags": [f"tag{i % 13}", f"tag{i % 7}"],
+                    "dream_date": (
+                        (today - timedelta(days=i * 11)).isoformat() if i % 9 else None
+                    ),
+                },
+            )
+        user_id = client.get("/api/auth/me", headers=auth_headers).json()["id"]
+
+        # The streaks were capped at 100 dreams before; only those may differ
+        with get_db() as conn:
+            actual = detailed_stats(conn, user_id)
+            expected = legacy_detailed_stats(conn, user_id)
+        assert actual.pop("longest_streak") == 1
+        assert actual == expected
+
+
+class TestLoadReport:
+    """Test the load generator's reporting"""
+
+    def test_timeline_and_errors(self):
+        """Test samples are split per operation and per interval"""
+        from benchmarks.load import Recorder, report
+
+        recorder = Recorder()
+        recorder.samples = [
+            (0.5, "list", 0.010, None),
+            (0.7, "list", 0.030, "500"),
+            (1.5, "stats", 0.020, None),
+            (3.2, "list", 0.040, "ReadTimeout"),
+        ]
+        result = report(recorder, 1.0)
+
+        assert result["operations"]["list"]["n"] == 3
+        assert result["operations"]["list"]["errors"] == 2
+        assert result["operations"]["all"]["n"] == 4
+        assert result["errors"] == {"list 500": 1, "list ReadTimeout": 1}
+        assert [row["requests"] for row in result["timeline"]] == [2, 1, 0, 1]
+        assert result["timeline"][0]["throughput_rps"] == 2.0
+
+    def test_parse_mix(self):
+        """Test scenario weights are parsed and unknown names rejected"""
+        from benchmarks.load import parse_mix
+
+        assert parse_mix("browse=3,backup") == {"browse": 3.0, "backup": 1.0}
+        with pytest.raises(ValueError):
+            parse_mix("browse=1,nap=2")
@@ -0,0 +1,165 @@
+import io
+import json
+
+import pytest
+
+
+def _stats():
+    from backend.cache import response_cache
+
+    return response_cache.stats()
+
+
+class TestResponseCache:
+    """Test the per-user response cache"""
+
+    @pytest.mark.parametrize(
+        "path", ["/api/stats", "/api/stats/detailed", "/api/tags", "/api/dreams"]
+    )
+    def test_repeated_read_skips_sql(
+        self, client, auth_headers, sample_dream, query_budget, path
+    ):
+        """Test a repeated read is served without running a query"""
+        client.post("/api/dreams", headers=auth_headers, json=sample_dream)
+
+        first = client.get(path, headers=auth_headers)
+        again = client.get(path, headers=auth_headers)
+
+        assert again.status_code == 200
+        assert again.content == first.content
+        assert again.headers["content-type"] == "application/json"
+        assert query_budget(again, 0) == 0
+
+    def test_writes_invalidate(self, client, auth_headers):
+        """Test creating, updating, deleting and importing are seen at once"""
+
+        def total():
+            return client.get("/api/stats", headers=auth_headers).json()["total"]
+
+        assert total() == 0
+        dream = client.post(
+            "/api/dreams", headers=auth_headers, json={"body": "D", "tags": ["a"]}
+        ).json()
+        assert total() == 1
+        client.put(
+            f"/api/dreams/{dream['id']}", headers=auth_headers, json={"tags": ["b"]}
+        )
+        assert client.get("/api/tags", headers=auth_headers).json() == ["b"]
+        files = {
+            "file": (
+                "backup.json",
+                io.BytesIO(json.dumps({"dreams": [{"body": "I"}]}).encode()),
+                "application/json",
+            )
+        }
+        client.post("/api/import", headers=auth_headers, files=files)
+        assert total() == 2
+        client.delete(f"/api/dreams/{dream['id']}", headers=auth_headers)
+        assert total() == 1
+        assert _stats()["invalidations"] == 4
+
+    def test_users_are_isolated(self, client, auth_headers, second_user):
+        """Test one user's writes and entries do not touch another's"""
+        client.post("/api/dreams", headers=auth_headers, json={"body": "Mine"})
+        client.get("/api/dreams", headers=second_user["headers"])
+        client.post("/api/dreams", headers=auth_headers, json={"body": "Again"})
+
+        theirs = client.get("/api/dreams", headers=second_user["headers"])
+        mine = client.get("/api/dreams", headers=auth_headers)
+
+        assert theirs.json() == []
+        assert len(mine.json()) == 2
+        assert _stats()["routes"]["dreams"] == {"hits": 1, "misses": 2}
+
+    def test_dreams_first_page_keeps_headers(self, client, auth_headers):
+        """Test pagination headers are cached and later pages bypass the cache"""
+        for i in range(3):
+            client.post("/api/dreams", headers=auth_headers, json={"body": f"D{i}"})
+
+        first = client.get(
+            "/api/dreams?limit=2&include_total=true", headers=auth_headers
+        )
+        again = client.get(
+            "/api/dreams?limit=2&include_total=true", headers=auth_headers
+        )
+        other = client.get("/api/dreams?limit=1", headers=auth_headers)
+        cursor = again.headers["x-next-cursor"]
+        for _ in range(2):
+            client.get(f"/api/dreams?limit=2&cursor={cursor}", headers=auth_headers)
+
+        assert again.headers["x-total-count"] == "3"
+        assert again.headers["x-has-more"] == "true"
+        assert cursor == first.headers["x-next-cursor"]
+        assert len(other.json()) == 1
+        assert _stats()["routes"]["dreams"] == {"hits": 1, "misses": 2}
+
+    def test_lru_bounded_by_bytes(self):
+        """Test least recently used entries are evicted to fit the memory limit"""
+        from backend.cache import ENTRY_OVERHEAD, ResponseCache
+
+        cache = ResponseCache(max_bytes=3 * (ENTRY_OVERHEAD + 100))
+        for route in ("a", "b", "c"):
+            cache.put((1, route, ()), 0, b"x" * 100, {})
+        cache.get((1, "a", ()), 0)
+        cache.put((2, "d", ()), 0, b"x" * 100, {})
+
+        assert cache.get((1, "b", ()), 0) is None
+        assert cache.get((1, "a", ()), 0) == (b"x" * 100, {})
+        stats = cache.stats()
+        assert stats["entries"] == 3
+        assert stats["bytes"] == 3 * (ENTRY_OVERHEAD + 100)
+        assert stats["evictions"] == 1
+
+        cache.put((1, "huge", ()), 0, b"x" * stats["max_bytes"], {})
+        assert cache.get((1, "huge", ()), 0) is None
+
+    def test_stale_result_not_stored(self):
+        """Test a result built before a write is dropped, not cached"""
+        from backend.cache import ResponseCache
+
+        cache = ResponseCache(max_bytes=10_000)
+        generation = cache.generation(1)
+        cache.bump(1)
+        cache.put((1, "stats", ()), generation, b"{}", {})
+
+        assert cache.stats()["entries"] == 0
+        assert cache.get((1, "stats", ()), cache.generation(1)) is None
+
+    def test_disabled(self, client, auth_headers, monkeypatch):
+        """Test a zero memory limit turns the cache off"""
+        from backend.cache import response_cache
+
+        monkeypatch.setattr(response_cache, "max_bytes", 0)
+        for _ in range(2):
+            assert client.get("/api/stats", headers=auth_headers).status_code == 200
+
+        assert _stats()["entries"] == 0
+        assert _stats()["hits"] == 0
+
+    def test_metrics(self, client, auth_headers):
+        """Test hit and miss counts are exported per route"""
+        for _ in range(2):
+            client.get("/api/tags", headers=auth_headers)
+
+        text = client.get("/metrics").text
+
+        assert 'response_cache_requests_total{route="tags",result="hit"} 1' in text
+        assert 'response_cache_requests_total{route="tags",result="miss"} 1' in text
+        assert "response_cache_bytes " in text
+
+    def test_detailed_stats_follow_the_date(
+        self, client, auth_headers, sample_dream, monkeypatch
+    ):
+        """Test the date-dependent dashboard is rebuilt once the day changes"""
+        from datetime import date
+
+        from backend.routes import stats
+
+        client.post("/api/dreams", headers=auth_headers, json=sample_dream)
+        client.get("/api/stats/detailed", headers=auth_headers)
+        monkeypatch.setattr(
+            stats, "_today", lambda: (date(2099, 1, 1), date(2099, 1, 1))
+        )
+        client.get("/api/stats/detailed", headers=auth_headers)
+
+        assert _stats()["routes"]["stats/detailed"] == {"hits": 0, "misses": 2}
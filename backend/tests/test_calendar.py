@@ -0,0 +1,110 @@
+import io
+import json
+
+
+def _import(client, auth_headers, dreams):
+    files = {
+        "file": (
+            "backup.json",
+            io.BytesIO(json.dumps({"dreams": dreams}).encode()),
+            "application/json",
+        )
+    }
+    client.post("/api/import", headers=auth_headers, files=files)
+
+
+class TestCalendar:
+    """Test calendar heatmap endpoint"""
+
+    def _create(self, client, auth_headers, dream_date, **fields):
+        client.post(
+            "/api/dreams",
+            headers=auth_headers,
+            json={"body": "Dream", "dream_date": dream_date, **fields},
+        )
+
+    def test_calendar_month(self, client, auth_headers):
+        """Test per-day aggregates for a month"""
+        self._create(client, auth_headers, "2024-03-05", lucidity=2, sleep_quality=6)
+        self._create(client, auth_headers, "2024-03-05", lucidity=4)
+        self._create(client, auth_headers, "2024-03-20")
+        self._create(client, auth_headers, "2024-04-01", lucidity=5)
+
+        response = client.get("/api/calendar?year=2024&month=3", headers=auth_headers)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["start"] == "2024-03-01"
+        assert data["end"] == "2024-03-31"
+        assert data["days_recorded"] == 3
+        assert data["days"] == [
+            {
+                "date": "2024-03-05",
+                "count": 2,
+                "avg_lucidity": 3.0,
+                "max_lucidity": 4,
+                "avg_sleep_quality": 6.0,
+            },
+            {
+                "date": "2024-03-20",
+                "count": 1,
+                "avg_lucidity": None,
+                "max_lucidity": None,
+                "avg_sleep_quality": None,
+            },
+        ]
+
+    def test_calendar_explicit_range_inclusive(self, client, auth_headers):
+        """Test start/end bounds are inclusive"""
+        for day in ("2024-01-31", "2024-02-01", "2024-02-10", "2024-02-11"):
+            self._create(client, auth_headers, day)
+
+        response = client.get(
+            "/api/calendar?start=2024-01-31&end=2024-02-10", headers=auth_headers
+        )
+
+        days = [d["date"] for d in response.json()["days"]]
+        assert days == ["2024-01-31", "2024-02-01", "2024-02-10"]
+
+    def test_calendar_undated_dreams_use_created_at(self, client, auth_headers):
+        """Test dreams without a dream_date fall on the day they were created"""
+        self._create(client, auth_headers, "2024-03-05")
+        _import(
+            client,
+            auth_headers,
+            [
+                {"body": "Same day", "created_at": "2024-03-05T23:00:00+00:00"},
+                {"body": "Own day", "created_at": "2024-03-07T08:00:00+00:00"},
+                {"body": "Outside", "created_at": "2024-04-02T08:00:00+00:00"},
+            ],
+        )
+
+        data = client.get("/api/calendar?year=2024&month=3", headers=auth_headers)
+        listed = client.get("/api/dreams?dream_date=2024-03-07", headers=auth_headers)
+
+        assert [(d["date"], d["count"]) for d in data.json()["days"]] == [
+            ("2024-03-05", 2),
+            ("2024-03-07", 1),
+        ]
+        assert data.json()["days_recorded"] == 3
+        assert [d["body"] for d in listed.json()] == ["Own day"]
+
+    def test_calendar_user_isolation(self, client, auth_headers, second_user):
+        """Test other users' dreams are not counted"""
+        self._create(client, second_user["headers"], "2024-03-05")
+
+        response = client.get("/api/calendar?year=2024", headers=auth_headers)
+
+        assert response.json()["days"] == []
+
+    def test_calendar_invalid_range(self, client, auth_headers):
+        """Test missing or malformed ranges are rejected"""
+        for query in ("", "?start=2024-02-01&end=2024-01-01", "?start=x&end=y"):
+            response = client.get(f"/api/calendar{query}", headers=auth_headers)
+            assert response.status_code == 400
+
+    def test_calendar_unauthorized(self, client):
+        """Test calendar without auth fails"""
+        response = client.get("/api/calendar?year=2024")
+
+        assert response.status_code == 403
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+
+class TestConnectionPool:
+    """Test pooled database connections"""
+
+    def test_connection_reused_by_same_thread(self, client):
+        """Test a thread gets its previous connection back"""
+        from backend.database import get_db
+
+        with get_db() as first:
+            pass
+        with get_db() as second:
+            pass
+
+        assert first is second
+
+    def test_pragmas_applied(self, client):
+        """Test the pragma profile is applied to pooled connections"""
+        from backend.database import get_db
+
+        with get_db() as conn:
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+            temp_store = conn.execute("PRAGMA temp_store").fetchone()[0]
+
+        assert journal_mode == "wal"
+        assert synchronous == 1  # NORMAL
+        assert temp_store == 2  # MEMORY
+
+    def test_connection_returned_on_error(self, client):
+        """Test connections go back to the pool when the block raises"""
+        from backend.database import get_db, get_pool
+
+        with pytest.raises(ValueError):
+            with get_db():
+                raise ValueError("boom")
+
+        assert get_pool().in_use == 0
+
+    def test_open_transaction_rolled_back_on_release(self, client):
+        """Test uncommitted writes are not leaked to the next checkout"""
+        from backend.database import get_db
+
+        with get_db() as conn:
+            conn.execute(
+                "INSERT INTO users (email, username, password_hash) VALUES (?, ?, ?)",
+                ("leak@example.com", "leak", "x"),
+            )
+
+        with get_db() as conn:
+            row = conn.execute(
+                "SELECT id FROM users WHERE email = ?", ("leak@example.com",)
+            ).fetchone()
+
+        assert row is None
+
+    def test_pool_is_bounded(self, client):
+        """Test checkout times out once every connection is in use"""
+        from backend.database import ConnectionPool, PoolTimeout
+
+        pool = ConnectionPool(os.environ["DB_PATH"], max_size=1, timeout=0.05)
+        conn = pool.acquire()
+        try:
+            with pytest.raises(PoolTimeout):
+                pool.acquire()
+        finally:
+            pool.release(conn)
+            pool.close()
+
+    def test_broken_connection_discarded(self, client, monkeypatch):
+        """Test idle connections failing the health check are replaced"""
+        from backend import database
+
+        monkeypatch.setattr(database, "DB_POOL_HEALTH_CHECK_AFTER", -1)
+        pool = database.ConnectionPool(os.environ["DB_PATH"], max_size=1)
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.close()
+
+        fresh = pool.acquire()
+        try:
+            assert fresh is not conn
+            assert fresh.execute("SELECT 1").fetchone()[0] == 1
+        finally:
+            pool.release(fresh)
+            pool.close()
@@ -229,6 +229,29 @@ class TestListDreams:
         for dream in dreams:
             assert "flying" in dream["tags"]
 
+    def test_list_dreams_filter_tag_exact(self, client, auth_headers):
+        """Test tag filtering matches whole tags, including quotes"""
+        client.post(
+            "/api/dreams",
+            headers=auth_headers,
+            json={"body": "Dream 1", "tags": ['say "hi"']},
+        )
+        client.post(
+            "/api/dreams",
+            headers=auth_headers,
+            json={"body": "Dream 2", "tags": ["hi"]},
+        )
+
+        response = client.get(
+            "/api/dreams", headers=auth_headers, params={"tag": 'say "hi"'}
+        )
+        dreams = response.json()
+        assert [d["body"] for d in dreams] == ["Dream 1"]
+
+        response = client.get("/api/dreams?tag=hi", headers=auth_headers)
+        dreams = response.json()
+        assert [d["body"] for d in dreams] == ["Dream 2"]
+
     def test_list_dreams_pagination(self, client, auth_headers):
         """Test dream pagination"""
         # Create 10 dreams
@@ -249,6 +272,79 @@ class TestListDreams:
         response = client.get("/api/dreams?limit=5&offset=20", headers=auth_headers)
         assert len(response.json()) == 0
 
+    def test_list_dreams_filter_date(self, client, auth_headers):
+        """Test filtering dreams by dream date"""
+        for day in ("2024-01-01", "2024-01-02", "2024-01-02"):
+            client.post(
+                "/api/dreams",
+                headers=auth_headers,
+                json={"body": day, "dream_date": day},
+            )
+
+        response = client.get("/api/dreams?dream_date=2024-01-02", headers=auth_headers)
+
+        dreams = response.json()
+        assert len(dreams) == 2
+        assert all(d["dream_date"] == "2024-01-02" for d in dreams)
+
+    def test_list_dreams_cursor_pagination(self, client, auth_headers):
+        """Test walking every page with the next cursor"""
+        for i in range(7):
+            client.post("/api/dreams", headers=auth_headers, json={"body": f"D{i}"})
+
+        seen = []
+        response = client.get("/api/dreams?limit=3", headers=auth_headers)
+        while True:
+            seen.extend(d["id"] for d in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            assert response.headers["X-Has-More"] == "true"
+            response = client.get(
+                "/api/dreams",
+                headers=auth_headers,
+                params={"limit": 3, "cursor": cursor},
+            )
+
+        assert response.headers["X-Has-More"] == "false"
+        assert len(seen) == 7
+        assert seen == sorted(set(seen), reverse=True)
+
+    def test_list_dreams_total_count(self, client, auth_headers):
+        """Test the total count header is returned on request"""
+        for i in range(4):
+            client.post(
+                "/api/dreams",
+                headers=auth_headers,
+                json={"body": f"D{i}", "mood": "joyful" if i % 2 else None},
+            )
+
+        response = client.get(
+            "/api/dreams?limit=1&mood=joyful&include_total=true", headers=auth_headers
+        )
+        assert response.headers["X-Total-Count"] == "2"
+
+        response = client.get("/api/dreams?limit=1", headers=auth_headers)
+        assert "X-Total-Count" not in response.headers
+
+    def test_list_dreams_limit_bounds(self, client, auth_headers):
+        """Test limit=0 returns an empty page and a negative limit is rejected"""
+        client.post("/api/dreams", headers=auth_headers, json={"body": "D"})
+
+        response = client.get("/api/dreams?limit=0", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json() == []
+        assert "X-Next-Cursor" not in response.headers
+
+        response = client.get("/api/dreams?limit=-1", headers=auth_headers)
+        assert response.status_code == 422
+
+    def test_list_dreams_invalid_cursor(self, client, auth_headers):
+        """Test a malformed cursor is rejected"""
+        response = client.get("/api/dreams?cursor=not-a-cursor", headers=auth_headers)
+
+        assert response.status_code == 400
+
     def test_list_dreams_combined_filters(self, client, auth_headers):
         """Test using multiple filters together"""
         client.post(
@@ -300,6 +396,135 @@ class TestListDreams:
         assert user2_dreams[0]["body"] == "User 2 dream"
 
 
+class TestSearchDreams:
+    """Test full-text dream search"""
+
+    def test_search_prefix(self, client, auth_headers):
+        """Test partial words match by prefix"""
+        client.post(
+            "/api/dreams", headers=auth_headers, json={"body": "I was flying high"}
+        )
+        client.post("/api/dreams", headers=auth_headers, json={"body": "Swimming"})
+
+        response = client.get("/api/dreams?search=fly", headers=auth_headers)
+
+        dreams = response.json()
+        assert len(dreams) == 1
+        assert dreams[0]["body"] == "I was flying high"
+
+    def test_search_phrase(self, client, auth_headers):
+        """Test quoted input matches an exact phrase"""
+        client.post(
+            "/api/dreams", headers=auth_headers, json={"body": "a red door opened"}
+        )
+        client.post(
+            "/api/dreams", headers=auth_headers, json={"body": "a door painted red"}
+        )
+
+        response = client.get('/api/dreams?search="red door"', headers=auth_headers)
+
+        dreams = response.json()
+        assert len(dreams) == 1
+        assert dreams[0]["body"] == "a red door opened"
+
+    def test_search_snippet_highlighted(self, client, auth_headers):
+        """Test search results include a highlighted snippet"""
+        client.post(
+            "/api/dreams",
+            headers=auth_headers,
+            json={"body": "The lighthouse was glowing in the fog"},
+        )
+
+        response = client.get("/api/dreams?search=lighthouse", headers=auth_headers)
+
+        dreams = response.json()
+        assert "<mark>lighthouse</mark>" in dreams[0]["snippet"]
+
+    def test_search_snippet_escapes_text(self, client, auth_headers):
+        """Test the dream text around the highlight markers is HTML-escaped"""
+        client.post(
+            "/api/dreams",
+            headers=auth_headers,
+            json={"body": "<script>alert(1)</script> & a lighthouse <mark>"},
+        )
+
+        response = client.get("/api/dreams?search=lighthouse", headers=auth_headers)
+
+        snippet = response.json()[0]["snippet"]
+        assert snippet == (
+            "&lt;script&gt;alert(1)&lt;/script&gt; &amp; a "
+            "<mark>lighthouse</mark> &lt;mark&gt;"
+        )
+
+    def test_search_ranks_title_matches_first(self, client, auth_headers):
+        """Test matches in the title outrank matches in the body"""
+        client.post(
+            "/api/dreams",
+            headers=auth_headers,
+            json={"title": "Forest walk", "body": "I met a wolf"},
+        )
+        client.post(
+            "/api/dreams",
+            headers=auth_headers,
+            json={"title": "Wolf", "body": "A wolf was howling"},
+        )
+
+        response = client.get("/api/dreams?search=wolf", headers=auth_headers)
+
+        dreams = response.json()
+        assert [d["title"] for d in dreams] == ["Wolf", "Forest walk"]
+
+    def test_search_follows_updates_and_deletes(self, client, auth_headers):
+        """Test the search index stays in sync with edits"""
+        dream_id = client.post(
+            "/api/dreams", headers=auth_headers, json={"body": "castle"}
+        ).json()["id"]
+
+        client.put(
+            f"/api/dreams/{dream_id}", headers=auth_headers, json={"body": "bridge"}
+        )
+        assert (
+            client.get("/api/dreams?search=castle", headers=auth_headers).json() == []
+        )
+        assert (
+            len(client.get("/api/dreams?search=bridge", headers=auth_headers).json())
+            == 1
+        )
+
+        client.delete(f"/api/dreams/{dream_id}", headers=auth_headers)
+        assert (
+            client.get("/api/dreams?search=bridge", headers=auth_headers).json() == []
+        )
+
+    def test_search_operators_treated_as_text(self, client, auth_headers):
+        """Test FTS syntax in user input does not cause errors"""
+        client.post("/api/dreams", headers=auth_headers, json={"body": "NOT a dream"})
+
+        for term in ["NOT", '"unbalanced', "a AND (", "*", "body:x", "-"]:
+            response = client.get(
+                "/api/dreams", headers=auth_headers, params={"search": term}
+            )
+            assert response.status_code == 200
+
+    def test_search_backfills_existing_dreams(self, client, auth_headers):
+        """Test existing dreams are indexed when the search table is created"""
+        from backend.database import get_db, init_db
+
+        client.post("/api/dreams", headers=auth_headers, json={"body": "volcano"})
+        with get_db() as conn:
+            for trigger in ("insert", "delete", "update"):
+                conn.execute(f"DROP TRIGGER dreams_fts_{trigger}")
+            conn.execute("DROP TABLE dreams_fts")
+            # As in a database from before migrations existed
+            conn.execute("DROP TABLE schema_version")
+            conn.commit()
+
+        init_db()
+
+        response = client.get("/api/dreams?search=volcano", headers=auth_headers)
+        assert len(response.json()) == 1
+
+
 class TestUpdateDream:
     """Test updating dreams"""
 
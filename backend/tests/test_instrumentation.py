@@ -0,0 +1,74 @@
+import json
+import logging
+
+
+class TestQueryInstrumentation:
+    """Test per-request SQL instrumentation"""
+
+    def test_server_timing_header(self, client, auth_headers):
+        """Test responses report their SQL time and query count"""
+        response = client.get("/api/dreams", headers=auth_headers)
+
+        assert response.headers["server-timing"].startswith("db;dur=")
+        assert 'desc="1 queries"' in response.headers["server-timing"]
+
+    def test_route_query_budgets(
+        self, client, auth_headers, sample_dream, query_budget
+    ):
+        """Test the main read routes stay within their query budgets"""
+        client.post("/api/dreams", headers=auth_headers, json=sample_dream)
+
+        query_budget(client.get("/api/dreams", headers=auth_headers), 1)
+        query_budget(client.get("/api/dreams?search=fly", headers=auth_headers), 1)
+        query_budget(client.get("/api/stats", headers=auth_headers), 2)
+        # Every section in one statement, plus the activity bitmap for streaks
+        detailed = client.get("/api/stats/detailed", headers=auth_headers)
+        assert query_budget(detailed, 2) == 2
+        # One statement for the counts and averages, one for the moods
+        ranged = client.get("/api/stats/range?granularity=week", headers=auth_headers)
+        assert query_budget(ranged, 2) == 2
+        query_budget(client.get("/api/calendar?year=2024", headers=auth_headers), 3)
+        query_budget(client.get("/api/tags", headers=auth_headers), 1)
+
+    def test_structured_log_and_slow_plan(
+        self, client, auth_headers, caplog, monkeypatch
+    ):
+        """Test the per-request log line and EXPLAIN QUERY PLAN for slow queries"""
+        from backend import instrumentation
+
+        monkeypatch.setattr(instrumentation, "SQL_SLOW_MS", 0)
+        with caplog.at_level(logging.INFO, logger="backend.sql"):
+            client.get("/api/dreams", headers=auth_headers)
+
+        line = json.loads(caplog.records[-1].getMessage())
+        assert (line["method"], line["path"], line["status"]) == (
+            "GET",
+            "/api/dreams",
+            200,
+        )
+        assert line["queries"] == 1
+        assert line["slow"][0]["plan"]
+        assert any(
+            "idx_dreams_user_created" in step for step in line["slow"][0]["plan"]
+        )
+
+    def test_cursor_statements_counted(self, client):
+        """Test statements run on a cursor are recorded once each"""
+        from backend import instrumentation
+        from backend.database import get_db
+
+        stats = instrumentation.QueryStats()
+        token = instrumentation._current.set(stats)
+        try:
+            with get_db() as conn:
+                before = stats.count
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1").fetchall()
+                cursor.executemany("UPDATE users SET id = id WHERE id = ?", [(0,)])
+                conn.execute("SELECT 2").fetchall()
+                conn.rollback()
+        finally:
+            instrumentation._current.reset(token)
+
+        assert stats.count - before == 3
+        assert isinstance(cursor, instrumentation.InstrumentedCursor)
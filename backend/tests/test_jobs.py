@@ -0,0 +1,115 @@
+import io
+import json
+import time
+
+
+def _wait(client, headers, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while True:
+        job = client.get(f"/api/jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("succeeded", "failed") or time.time() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+class TestJobs:
+    """Test background import/export jobs"""
+
+    def test_export_job(self, client, auth_headers, sample_dream):
+        """Test an export job produces the same dreams as /api/backup"""
+        client.post("/api/dreams", headers=auth_headers, json=sample_dream)
+
+        response = client.post("/api/jobs/export", headers=auth_headers)
+
+        assert response.status_code == 202
+        job = _wait(client, auth_headers, response.json()["id"])
+        assert job["status"] == "succeeded"
+        assert (job["processed"], job["total"]) == (1, 1)
+        assert job["expires_at"] is not None
+
+        download = client.get(job["download_url"], headers=auth_headers)
+        assert download.status_code == 200
+        assert "attachment" in download.headers["content-disposition"]
+        backup = client.get("/api/backup", headers=auth_headers).json()
+        assert download.json()["dreams"] == backup["dreams"]
+
+    def test_import_job(self, client, auth_headers):
+        """Test an import job reports its counts"""
+        backup_data = {
+            "dreams": [{"body": f"Dream {i}", "created_at": str(i)} for i in range(3)]
+            + [{"body": "Again", "created_at": "0"}]
+        }
+        files = {
+            "file": (
+                "backup.json",
+                io.BytesIO(json.dumps(backup_data).encode()),
+                "application/json",
+            )
+        }
+
+        response = client.post("/api/jobs/import", headers=auth_headers, files=files)
+
+        assert response.status_code == 202
+        job = _wait(client, auth_headers, response.json()["id"])
+        assert job["status"] == "succeeded"
+        assert (job["imported"], job["skipped"], job["errors"]) == (3, 1, 0)
+        assert job["processed"] == job["total"] == 4
+        assert len(client.get("/api/dreams", headers=auth_headers).json()) == 3
+
+    def test_import_job_invalid_file(self, client, auth_headers):
+        """Test a bad upload fails the job without importing anything"""
+        files = {"file": ("backup.json", io.BytesIO(b"{"), "application/json")}
+
+        response = client.post("/api/jobs/import", headers=auth_headers, files=files)
+
+        job = _wait(client, auth_headers, response.json()["id"])
+        assert job["status"] == "failed"
+        assert job["error"]
+
+    def test_job_isolation(self, client, auth_headers, second_user):
+        """Test users cannot see or download each other's jobs"""
+        job_id = client.post("/api/jobs/export", headers=auth_headers).json()["id"]
+        _wait(client, auth_headers, job_id)
+
+        assert (
+            client.get(
+                f"/api/jobs/{job_id}", headers=second_user["headers"]
+            ).status_code
+            == 404
+        )
+        download = client.get(
+            f"/api/jobs/{job_id}/download", headers=second_user["headers"]
+        )
+        assert download.status_code == 404
+
+    def test_expired_jobs_cleaned_up(self, client, test_user, auth_headers):
+        """Test expired exports are forgotten and their files deleted"""
+        import os
+
+        from backend.jobs import JOB_RESULT_TTL, get_manager
+
+        job_id = client.post("/api/jobs/export", headers=auth_headers).json()["id"]
+        _wait(client, auth_headers, job_id)
+        manager = get_manager()
+        path = manager.get(job_id, test_user["id"]).path
+        assert os.path.exists(path)
+
+        assert manager.cleanup(now=time.time() + JOB_RESULT_TTL + 1) == 1
+        assert not os.path.exists(path)
+        assert (
+            client.get(f"/api/jobs/{job_id}", headers=auth_headers).status_code == 404
+        )
+
+    def test_queue_full(self, client, auth_headers, monkeypatch):
+        """Test submissions are refused once too many jobs are pending"""
+        from backend.jobs import get_manager
+
+        monkeypatch.setattr(get_manager(), "max_pending", 0)
+
+        response = client.post("/api/jobs/export", headers=auth_headers)
+
+        assert response.status_code == 503
+
+    def test_jobs_unauthorized(self, client):
+        """Test jobs require auth"""
+        assert client.post("/api/jobs/export").status_code == 403
@@ -0,0 +1,66 @@
+def _sample(text, prefix):
+    """Value of the first exposition line starting with prefix"""
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+class TestMetrics:
+    """Test the Prometheus /metrics endpoint"""
+
+    def test_metrics_format(self, client, auth_headers):
+        """Test per-route counters and histograms are exposed"""
+        from backend import metrics
+
+        metrics.reset()
+        client.get("/api/dreams", headers=auth_headers)
+        client.get("/api/dreams", headers=auth_headers)
+        client.get("/api/dreams/999", headers=auth_headers)
+
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        assert "# TYPE http_request_duration_seconds histogram" in text
+        route = 'method="GET",route="/api/dreams"'
+        assert _sample(text, f'http_requests_total{{{route},status="2xx"}}') == 2
+        assert (
+            _sample(
+                text,
+                'http_requests_total{method="GET",route="/api/dreams/{dream_id}",status="4xx"}',
+            )
+            == 1
+        )
+        assert _sample(text, f"http_request_duration_seconds_count{{{route}}}") == 2
+        assert (
+            _sample(text, f'http_request_duration_seconds_bucket{{{route},le="+Inf"}}')
+            == 2
+        )
+        assert _sample(text, f"http_request_sql_queries_count{{{route}}}") == 2
+
+    def test_in_flight_and_collectors(self, client, auth_headers):
+        """Test the in-flight gauge and scrape-time collectors"""
+        client.get("/api/dreams", headers=auth_headers)
+
+        text = client.get("/metrics").text
+
+        # Only the scrape itself is in flight
+        assert _sample(text, 'http_requests_in_flight{method="GET"}') == 1
+        assert _sample(text, 'db_pool_connections{state="in_use"}') == 0
+        assert _sample(text, "threadpool_threads_max") > 0
+        assert _sample(text, 'token_cache_requests_total{result="hit"}') is not None
+        assert 'auth_attempts_total{scope="register",result="admitted"}' in text
+
+    def test_unmatched_paths_share_a_label(self, client):
+        """Test unknown paths do not create a label per path"""
+        from backend import metrics
+
+        metrics.reset()
+        client.get("/api/nope-1")
+        client.get("/api/nope-2")
+
+        text = client.get("/metrics").text
+
+        assert 'route="unmatched",status="4xx"} 2' in text
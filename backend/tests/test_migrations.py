@@ -0,0 +1,203 @@
+import sqlite3
+
+import pytest
+
+
+def _connect(path):
+    from backend.database import connect
+
+    return connect(str(path))
+
+
+def _counter_migrations(log):
+    """Latest real schema plus a migration backfilling a counters table"""
+    from backend.migrations import MIGRATIONS, Migration
+
+    def schema(conn):
+        conn.execute("CREATE TABLE IF NOT EXISTS counters (n INTEGER PRIMARY KEY)")
+
+    def backfill(conn, batch_size):
+        done = 0
+        while done < 10:
+            count = min(batch_size, 10 - done)
+            conn.executemany(
+                "INSERT OR IGNORE INTO counters (n) VALUES (?)",
+                [(done + i,) for i in range(count)],
+            )
+            log.append(conn.in_transaction)
+            done += count
+            yield count
+
+    version = MIGRATIONS[-1].version + 1
+    return [*MIGRATIONS, Migration(version, "counters", schema, backfill)]
+
+
+def _old_database(path):
+    """A database as init_db created it before migrations, with one dream"""
+    conn = _connect(path)
+    conn.execute(
+        """CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT,
+           email TEXT UNIQUE NOT NULL, username TEXT UNIQUE NOT NULL,
+           password_hash TEXT NOT NULL, created_at TEXT, updated_at TEXT)"""
+    )
+    conn.execute(
+        """CREATE TABLE dreams (id INTEGER PRIMARY KEY AUTOINCREMENT,
+           user_id INTEGER NOT NULL, title TEXT, body TEXT NOT NULL,
+           mood TEXT, lucidity INTEGER, sleep_quality INTEGER,
+           tags TEXT DEFAULT '[]', dream_date TEXT, is_public INTEGER DEFAULT 0,
+           share_token TEXT, created_at TEXT, updated_at TEXT)"""
+    )
+    conn.execute("INSERT INTO users VALUES (1, 'a@b.c', 'a', 'x', '', '')")
+    conn.execute(
+        """INSERT INTO dreams (user_id, body, tags, created_at)
+           VALUES (1, 'an old volcano dream', '["old"]', '2024-01-01')"""
+    )
+    conn.commit()
+    return conn
+
+
+class TestMigrations:
+    """Test the versioned schema migrations"""
+
+    def test_new_database_is_current(self, tmp_path):
+        """Test init_db records every migration"""
+        from backend.database import init_db
+        from backend.migrations import MIGRATIONS, current_version, pending
+
+        init_db(str(tmp_path / "new.db"))
+
+        conn = _connect(tmp_path / "new.db")
+        assert current_version(conn) == MIGRATIONS[-1].version
+        assert pending(conn) == []
+        conn.close()
+
+    def test_current_database_skips_ddl(self, tmp_path):
+        """Test a migrated database only pays for the version lookup"""
+        from backend.database import init_db
+        from backend.migrations import migrate
+
+        init_db(str(tmp_path / "db.db"))
+        conn = _connect(tmp_path / "db.db")
+        statements = []
+        conn.set_trace_callback(statements.append)
+
+        assert migrate(conn) == []
+        assert statements == ["SELECT MAX(version) FROM schema_version"]
+        conn.close()
+
+    def test_adopts_database_from_before_migrations(self, tmp_path):
+        """Test an unversioned database keeps its data and gets versioned"""
+        from backend.migrations import MIGRATIONS, current_version, migrate
+
+        conn = _old_database(tmp_path / "old.db")
+
+        assert migrate(conn) == MIGRATIONS
+
+        assert current_version(conn) == MIGRATIONS[-1].version
+        assert (
+            conn.execute(
+                "SELECT rowid FROM dreams_fts WHERE dreams_fts MATCH 'volcano'"
+            ).fetchone()[0]
+            == 1
+        )
+        assert conn.execute("SELECT name FROM tags").fetchone()[0] == "old"
+        assert conn.execute("SELECT total FROM user_stats").fetchone()[0] == 1
+        conn.close()
+
+    def test_initial_schema_only_runs_ddl(self, tmp_path):
+        """Test existing dreams are indexed, linked and counted in later batches"""
+        from backend import aggregates
+        from backend.migrations import MIGRATIONS, migrate
+
+        conn = _old_database(tmp_path / "old.db")
+        conn.executemany(
+            """INSERT INTO dreams (user_id, body, tags, created_at)
+               VALUES (1, ?, '["more"]', '2024-01-02')""",
+            [(f"dream {i}",) for i in range(4)],
+        )
+        conn.commit()
+
+        migrate(conn, MIGRATIONS[:1])
+        # dreams_fts_docsize has a row per indexed dream
+        for table in ("dreams_fts_docsize", "dream_tags", "user_stats"):
+            assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0
+
+        log = []
+        conn.set_trace_callback(log.append)
+        migrate(conn, batch_size=2)
+        conn.set_trace_callback(None)
+
+        assert log.count("COMMIT") >= 3 * 3
+        assert (
+            conn.execute("SELECT COUNT(*) FROM dreams_fts_docsize").fetchone()[0] == 5
+        )
+        assert conn.execute("SELECT COUNT(*) FROM dream_tags").fetchone()[0] == 5
+        assert aggregates.check(conn) == []
+
+        # A rerun starts the index over instead of indexing dreams twice
+        conn.execute("DELETE FROM schema_version WHERE version >= 4")
+        conn.commit()
+        migrate(conn, batch_size=2)
+        conn.execute(
+            "INSERT INTO dreams_fts (dreams_fts, rank) VALUES ('integrity-check', 1)"
+        )
+        assert aggregates.check(conn) == []
+        conn.close()
+
+    def test_backfill_commits_each_batch(self, tmp_path):
+        """Test a backfill runs in batches, each committed before the next"""
+        from backend.database import init_db
+        from backend.migrations import current_version, migrate
+
+        init_db(str(tmp_path / "db.db"))
+        conn = _connect(tmp_path / "db.db")
+        log = []
+        migrations = _counter_migrations(log)
+
+        applied = migrate(conn, migrations, batch_size=3)
+
+        assert [m.name for m in applied] == ["counters"]
+        assert len(log) == 4
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM counters").fetchone()[0] == 10
+        assert current_version(conn) == migrations[-1].version
+        conn.close()
+
+    def test_dry_run_changes_nothing(self, tmp_path):
+        """Test a dry run executes the migrations but rolls them back"""
+        from backend.database import init_db
+        from backend.migrations import current_version, migrate
+
+        init_db(str(tmp_path / "db.db"))
+        conn = _connect(tmp_path / "db.db")
+        migrations = _counter_migrations([])
+        before = current_version(conn)
+
+        applied = migrate(conn, migrations, dry_run=True)
+
+        assert [m.name for m in applied] == ["counters"]
+        assert current_version(conn) == before
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("SELECT 1 FROM counters")
+        conn.close()
+
+    def test_failed_migration_is_not_recorded(self, tmp_path):
+        """Test a failing migration leaves the version where it was"""
+        from backend.database import init_db
+        from backend.migrations import MIGRATIONS, Migration, current_version, migrate
+
+        def broken(conn):
+            conn.execute("CREATE TABLE half (id INTEGER)")
+            conn.execute("SELECT * FROM missing_table")
+
+        init_db(str(tmp_path / "db.db"))
+        conn = _connect(tmp_path / "db.db")
+        migrations = [*MIGRATIONS, Migration(MIGRATIONS[-1].version + 1, "x", broken)]
+
+        with pytest.raises(sqlite3.OperationalError):
+            migrate(conn, migrations)
+
+        assert current_version(conn) == MIGRATIONS[-1].version
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("SELECT 1 FROM half")
+        conn.close()
@@ -0,0 +1,106 @@
+import pytest
+
+
+@pytest.fixture
+def profiling_on(tmp_path, monkeypatch):
+    from backend import profiling
+
+    monkeypatch.setattr(profiling, "PROFILE_SECRET", "s3cret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    return tmp_path
+
+
+class TestProfiling:
+    """Test opt-in per-request profiling"""
+
+    def test_profile_with_secret_header(self, client, auth_headers, profiling_on):
+        """Test a request with the secret is profiled and can be listed"""
+        response = client.get(
+            "/api/stats/detailed",
+            headers={**auth_headers, "X-Profile-Secret": "s3cret"},
+        )
+
+        assert response.status_code == 200
+        profile_id = response.headers["x-profile-id"]
+        assert profile_id.startswith("api_stats_detailed/")
+        assert (profiling_on / f"{profile_id}.prof").is_file()
+
+        listing = client.get("/api/profiles", headers={"X-Profile-Secret": "s3cret"})
+        assert [p["id"] for p in listing.json()] == [profile_id]
+        summary = client.get(
+            f"/api/profiles/{profile_id}", headers={"X-Profile-Secret": "s3cret"}
+        )
+        assert "get_detailed_stats" in summary.text
+
+    def test_not_profiled_without_opt_in(self, client, auth_headers, profiling_on):
+        """Test requests without (or with a wrong) secret are untouched"""
+        for headers in (auth_headers, {**auth_headers, "X-Profile-Secret": "nope"}):
+            response = client.get("/api/dreams", headers=headers)
+            assert "x-profile-id" not in response.headers
+        assert list(profiling_on.iterdir()) == []
+
+    def test_profile_paths_and_async_routes(
+        self, client, test_user, profiling_on, monkeypatch
+    ):
+        """Test PROFILE_PATHS profiles matching requests, async endpoints included"""
+        from backend import profiling
+
+        monkeypatch.setattr(profiling, "PROFILE_PATHS", ["/api/auth/login"])
+        response = client.post(
+            "/api/auth/login",
+            json={"email": test_user["email"], "password": test_user["password"]},
+        )
+
+        assert response.headers["x-profile-id"].startswith("api_auth_login/")
+        assert profiling.main(["show", response.headers["x-profile-id"]]) == 0
+
+    def test_listing_requires_secret(self, client, profiling_on):
+        """Test the listing endpoint hides itself without the secret"""
+        assert client.get("/api/profiles").status_code == 404
+        response = client.get(
+            "/api/profiles/x/../y", headers={"X-Profile-Secret": "s3cret"}
+        )
+        assert response.status_code == 404
+
+    def test_concurrent_requests_profiled_one_at_a_time(self, profiling_on):
+        """Test a request opting in while another is profiled runs unprofiled"""
+        import threading
+
+        from backend import profiling
+
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return "slow"
+
+        slow_wrapped = profiling.profiled(slow, "/slow")
+        fast_wrapped = profiling.profiled(lambda: "fast", "/fast")
+        first, second = {}, {}
+
+        def run_first():
+            profiling._request.set(first)
+            slow_wrapped()
+
+        thread = threading.Thread(target=run_first)
+        thread.start()
+        try:
+            assert started.wait(5)
+            token = profiling._request.set(second)
+            try:
+                assert fast_wrapped() == "fast"
+            finally:
+                profiling._request.reset(token)
+        finally:
+            release.set()
+            thread.join(5)
+
+        assert "id" not in second
+        assert first["id"].startswith("slow/")
+        token = profiling._request.set(second)
+        try:
+            fast_wrapped()
+        finally:
+            profiling._request.reset(token)
+        assert second["id"].startswith("fast/")
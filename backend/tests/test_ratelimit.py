@@ -0,0 +1,97 @@
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _limiter(clock, max_keys=100):
+    from backend.ratelimit import TokenBucketLimiter
+
+    return TokenBucketLimiter(
+        {"ip": (3, 60.0), "account": (2, 6.0)}, max_keys, clock=clock
+    )
+
+
+class TestTokenBucketLimiter:
+    """Test the auth admission limiter"""
+
+    def test_burst_then_refill(self):
+        """Test a key is admitted up to its burst and refills over time"""
+        clock = FakeClock()
+        limiter = _limiter(clock)
+
+        assert [limiter.attempt("login", [("ip", "a")]) for _ in range(3)] == [0, 0, 0]
+        assert limiter.attempt("login", [("ip", "a")]) == 1.0
+        clock.now += 1
+        assert limiter.attempt("login", [("ip", "a")]) == 0
+
+    def test_all_keys_must_admit(self):
+        """Test a rejection on one key takes no token from the others"""
+        clock = FakeClock()
+        limiter = _limiter(clock)
+        keys = [("ip", "a"), ("account", "x@example.com")]
+
+        assert limiter.attempt("login", keys) == 0
+        assert limiter.attempt("login", keys) == 0
+        assert limiter.attempt("login", keys) == 10.0
+        # The IP still has its last token
+        assert limiter.attempt("login", [("ip", "a")]) == 0
+
+        stats = limiter.stats()
+        assert stats["total"]["login"] == {"admitted": 3, "rejected": 1}
+        assert stats["recent"]["login"] == {"admitted": 3, "rejected": 1}
+
+    def test_eviction(self):
+        """Test old keys are evicted by count and refilled keys are dropped"""
+        clock = FakeClock()
+        limiter = _limiter(clock, max_keys=2)
+
+        for ip in ("a", "b", "c"):
+            limiter.attempt("login", [("ip", ip)])
+        assert limiter.stats()["keys"] == 2
+        assert limiter.stats()["evicted"] == 1
+
+        clock.now += 120
+        limiter.attempt("login", [("ip", "d")])
+        assert limiter.stats()["keys"] == 1
+        assert limiter.stats()["recent"]["login"]["admitted"] == 1
+
+
+class TestAuthThrottling:
+    """Test auth routes reject attempts over the limit"""
+
+    def test_login_throttled_per_account(self, client, test_user):
+        """Test repeated logins for one email get a 429 before hashing"""
+        from backend import hashing
+        from backend.ratelimit import LIMITS
+
+        burst = LIMITS["account"][0]
+        for _ in range(burst - 1):
+            client.post(
+                "/api/auth/login",
+                json={"email": test_user["email"], "password": "wrongpass"},
+            )
+        hashed = hashing.stats()["completed"]
+
+        response = client.post(
+            "/api/auth/login",
+            json={"email": test_user["email"].upper(), "password": "wrongpass"},
+        )
+
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 1
+        assert hashing.stats()["completed"] == hashed
+
+    def test_throttling_disabled(self, client, test_user, monkeypatch):
+        """Test the limiter can be switched off"""
+        from backend import ratelimit
+
+        monkeypatch.setattr(ratelimit, "AUTH_RATE_LIMIT_ENABLED", False)
+        for _ in range(ratelimit.LIMITS["account"][0] + 1):
+            response = client.post(
+                "/api/auth/login",
+                json={"email": "nobody@example.com", "password": "wrongpass"},
+            )
+            assert response.status_code == 401
@@ -1,3 +1,4 @@
+import codecs
 import io
 import json
 from datetime import datetime, timezone
@@ -103,6 +104,7 @@ class TestDetailedStats:
         assert "top_tags" in data
         assert "lucidity_trend" in data
         assert "current_streak" in data
+        assert "longest_streak" in data
 
     def test_detailed_stats_with_data(self, client, auth_headers):
         """Test detailed stats with dream data"""
@@ -126,6 +128,21 @@ class TestDetailedStats:
         assert len(data["mood_distribution"]) == 2
         assert len(data["top_tags"]) > 0
 
+    def test_detailed_stats_top_tags(self, client, auth_headers):
+        """Test top tags are counted per dream and ordered by frequency"""
+        for tags in (["a", "b"], ["b", "c"], ["b"], ["c"]):
+            client.post(
+                "/api/dreams", headers=auth_headers, json={"body": "D", "tags": tags}
+            )
+
+        response = client.get("/api/stats/detailed", headers=auth_headers)
+
+        assert response.json()["top_tags"] == [
+            {"tag": "b", "count": 3},
+            {"tag": "c", "count": 2},
+            {"tag": "a", "count": 1},
+        ]
+
     def test_detailed_stats_streak_calculation(self, client, auth_headers):
         """Test current streak calculation"""
         from datetime import timedelta
@@ -144,8 +161,8 @@ class TestDetailedStats:
         response = client.get("/api/stats/detailed", headers=auth_headers)
         data = response.json()
 
-        # Should have a streak of at least 3
-        assert data["current_streak"] >= 3
+        assert data["current_streak"] == 3
+        assert data["longest_streak"] == 3
 
     def test_detailed_stats_unauthorized(self, client):
         """Test detailed stats without auth fails"""
@@ -154,6 +171,162 @@ class TestDetailedStats:
         assert response.status_code == 403
 
 
+class TestRangeStats:
+    """Test the date-range stats endpoint"""
+
+    def _post(self, client, auth_headers, dreams):
+        return [
+            client.post("/api/dreams", headers=auth_headers, json=d).json()["id"]
+            for d in dreams
+        ]
+
+    def test_range_stats_buckets(self, client, auth_headers):
+        """Test dreams are merged into the requested buckets"""
+        self._post(
+            client,
+            auth_headers,
+            [
+                {
+                    "body": "A",
+                    "dream_date": "2024-01-01",
+                    "lucidity": 2,
+                    "mood": "calm",
+                },
+                {
+                    "body": "B",
+                    "dream_date": "2024-01-07",
+                    "lucidity": 4,
+                    "mood": "calm",
+                },
+                {"body": "C", "dream_date": "2024-01-08", "sleep_quality": 3},
+                {"body": "D", "dream_date": "2024-03-15T06:00:00", "mood": "eerie"},
+                {"body": "E", "dream_date": "2025-02-01", "lucidity": 9},
+                {"body": "Today"},
+            ],
+        )
+
+        def buckets(query):
+            response = client.get(f"/api/stats/range?{query}", headers=auth_headers)
+            assert response.status_code == 200
+            return response.json()
+
+        weeks = buckets("from=2024-01-01&to=2024-12-31&granularity=week")
+        assert [(b["start"], b["count"]) for b in weeks["buckets"]] == [
+            ("2024-01-01", 2),
+            ("2024-01-08", 1),
+            ("2024-03-11", 1),
+        ]
+        assert weeks["buckets"][0]["avg_lucidity"] == 3.0
+        assert weeks["buckets"][0]["moods"] == {"calm": 2}
+        assert weeks["total"] == {
+            "count": 4,
+            "avg_lucidity": 3.0,
+            "avg_sleep_quality": 3.0,
+            "moods": {"calm": 2, "eerie": 1},
+        }
+
+        months = buckets("granularity=month&to=2025-12-31")
+        assert [(b["start"], b["count"]) for b in months["buckets"]] == [
+            ("2024-01-01", 3),
+            ("2024-03-01", 1),
+            ("2025-02-01", 1),
+        ]
+        years = buckets("granularity=year&from=2024-01-02&to=2025-12-31")
+        assert [(b["start"], b["count"]) for b in years["buckets"]] == [
+            ("2024-01-01", 3),
+            ("2025-01-01", 1),
+        ]
+        days = buckets("granularity=day&from=2024-01-07&to=2024-01-07")
+        assert days["buckets"] == [
+            {
+                "start": "2024-01-07",
+                "count": 1,
+                "avg_lucidity": 4.0,
+                "avg_sleep_quality": None,
+                "moods": {"calm": 1},
+            }
+        ]
+
+    def test_range_stats_follow_writes(self, client, auth_headers):
+        """Test edits and deletes move dreams between buckets"""
+        first, second = self._post(
+            client,
+            auth_headers,
+            [
+                {"body": "A", "dream_date": "2024-05-01", "mood": "calm"},
+                {"body": "B", "dream_date": "2024-05-01", "mood": "calm"},
+            ],
+        )
+        client.put(
+            f"/api/dreams/{first}",
+            headers=auth_headers,
+            json={"dream_date": "2024-06-02", "mood": "eerie"},
+        )
+        client.delete(f"/api/dreams/{second}", headers=auth_headers)
+
+        data = client.get("/api/stats/range", headers=auth_headers).json()
+
+        assert [(b["start"], b["count"], b["moods"]) for b in data["buckets"]] == [
+            ("2024-06-01", 1, {"eerie": 1})
+        ]
+
+    def test_rollups_backfilled_by_migration(self, client, auth_headers):
+        """Test the migration builds rollups for dreams written before it"""
+        from backend import rollups
+        from backend.database import get_db
+        from backend.migrations import migrate
+
+        self._post(
+            client,
+            auth_headers,
+            [{"body": "A", "dream_date": "2024-01-01", "mood": "calm"}] * 2,
+        )
+        with get_db() as conn:
+            conn.execute("DELETE FROM user_daily_stats")
+            conn.execute("DELETE FROM user_daily_moods")
+            conn.execute("DELETE FROM schema_version WHERE version >= 3")
+            conn.commit()
+
+            migrate(conn, batch_size=1)
+
+            assert rollups.check(conn) == []
+        data = client.get("/api/stats/range", headers=auth_headers).json()
+        assert data["total"]["count"] == 2
+
+    def test_range_stats_empty(self, client, auth_headers):
+        """Test a range without dreams has zero totals"""
+        data = client.get("/api/stats/range", headers=auth_headers).json()
+
+        assert data["buckets"] == []
+        assert data["total"] == {
+            "count": 0,
+            "avg_lucidity": None,
+            "avg_sleep_quality": None,
+            "moods": {},
+        }
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "granularity=fortnight",
+            "from=2024-13-01",
+            "to=yesterday",
+            "from=2024-02-01&to=2024-01-01",
+        ],
+    )
+    def test_range_stats_invalid(self, client, auth_headers, query):
+        """Test bad granularities and dates are rejected"""
+        response = client.get(f"/api/stats/range?{query}", headers=auth_headers)
+
+        assert response.status_code == 400
+
+    def test_range_stats_unauthorized(self, client):
+        """Test range stats without auth fails"""
+        response = client.get("/api/stats/range")
+
+        assert response.status_code == 403
+
+
 class TestTags:
     """Test tags listing endpoint"""
 
@@ -224,6 +397,95 @@ class TestTags:
 
         assert len(tags) == 2
 
+    def test_list_tags_drops_unused_tags(self, client, auth_headers):
+        """Test tags disappear once no dream uses them"""
+        dream_id = client.post(
+            "/api/dreams",
+            headers=auth_headers,
+            json={"body": "Dream 1", "tags": ["flying", "ocean"]},
+        ).json()["id"]
+        other_id = client.post(
+            "/api/dreams",
+            headers=auth_headers,
+            json={"body": "Dream 2", "tags": ["forest"]},
+        ).json()["id"]
+
+        client.put(
+            f"/api/dreams/{dream_id}", headers=auth_headers, json={"tags": ["flying"]}
+        )
+        client.delete(f"/api/dreams/{other_id}", headers=auth_headers)
+
+        response = client.get("/api/tags", headers=auth_headers)
+        assert response.json() == ["flying"]
+
+    def test_list_tags_includes_imported(self, client, auth_headers):
+        """Test tags of imported dreams are listed"""
+        backup_data = {
+            "dreams": [
+                {"body": "Imported", "tags": '["night", "moon"]'},
+            ]
+        }
+        files = {
+            "file": (
+                "backup.json",
+                io.BytesIO(json.dumps(backup_data).encode()),
+                "application/json",
+            )
+        }
+        client.post("/api/import", headers=auth_headers, files=files)
+
+        response = client.get("/api/tags", headers=auth_headers)
+        assert response.json() == ["moon", "night"]
+
+    def test_list_tags_skips_malformed_imported_tags(self, client, auth_headers):
+        """Test only distinct string elements of JSON tag arrays become tags"""
+        backup_data = {
+            "dreams": [
+                {
+                    "body": "One",
+                    "tags": ["sea", "sea", 3, None, "sky"],
+                    "created_at": "1",
+                },
+                {"body": "Two", "tags": '"sea"', "created_at": "2"},
+                {"body": "Three", "tags": {"sun": 1}, "created_at": "3"},
+                {"body": "Four", "tags": '["sky", true]', "created_at": "4"},
+            ]
+        }
+        files = {
+            "file": (
+                "backup.json",
+                io.BytesIO(json.dumps(backup_data).encode()),
+                "application/json",
+            )
+        }
+        client.post("/api/import", headers=auth_headers, files=files)
+
+        response = client.get("/api/tags", headers=auth_headers)
+        assert response.json() == ["sea", "sky"]
+        sky = client.get("/api/dreams?tag=sky", headers=auth_headers).json()
+        assert sorted(d["body"] for d in sky) == ["Four", "One"]
+
+    def test_tags_backfilled_from_existing_dreams(self, client, auth_headers):
+        """Test the tag tables are populated from JSON tags on first creation"""
+        from backend.database import get_db, init_db
+
+        client.post(
+            "/api/dreams",
+            headers=auth_headers,
+            json={"body": "Dream", "tags": ["old", "tags"]},
+        )
+        with get_db() as conn:
+            conn.execute("DROP TABLE dream_tags")
+            conn.execute("DROP TABLE tags")
+            # As in a database from before migrations existed
+            conn.execute("DROP TABLE schema_version")
+            conn.commit()
+
+        init_db()
+
+        response = client.get("/api/tags", headers=auth_headers)
+        assert response.json() == ["old", "tags"]
+
     def test_list_tags_unauthorized(self, client):
         """Test listing tags without auth fails"""
         response = client.get("/api/tags")
@@ -278,6 +540,40 @@ class TestBackup:
         assert "attachment" in response.headers["Content-Disposition"]
         assert ".json" in response.headers["Content-Disposition"]
 
+    def test_backup_matches_v1_layout(self, client, auth_headers):
+        """Test the streamed export is byte-identical to a JSONResponse render"""
+        from fastapi.responses import JSONResponse
+
+        for i in range(7):
+            client.post(
+                "/api/dreams",
+                headers=auth_headers,
+                json={"title": f"Rêve {i}", "body": '🌙 "quoted"', "tags": ["ü"]},
+            )
+
+        response = client.get("/api/backup", headers=auth_headers)
+
+        data = response.json()
+        assert data["total_dreams"] == 7
+        assert list(data) == ["export_date", "version", "total_dreams", "dreams"]
+        assert response.content == JSONResponse(content=data).body
+
+    def test_backup_chunked_iteration(self, client, test_user, auth_headers):
+        """Test small chunk sizes produce the same document"""
+        from datetime import datetime, timezone
+
+        from backend.backup import iter_backup
+
+        for i in range(5):
+            client.post("/api/dreams", headers=auth_headers, json={"body": f"D{i}"})
+
+        export_date = datetime.now(timezone.utc)
+        whole = b"".join(iter_backup(test_user["id"], export_date, chunk_size=100))
+        chunked = b"".join(iter_backup(test_user["id"], export_date, chunk_size=2))
+
+        assert whole == chunked
+        assert len(json.loads(chunked)["dreams"]) == 5
+
     def test_backup_unauthorized(self, client):
         """Test backup without auth fails"""
         response = client.get("/api/backup")
@@ -409,3 +705,116 @@ class TestImport:
         response = client.post("/api/import", files=files)
 
         assert response.status_code == 403
+
+    def _import(self, client, auth_headers, content):
+        files = {"file": ("backup.json", io.BytesIO(content), "application/json")}
+        return client.post("/api/import", headers=auth_headers, files=files)
+
+    def test_import_in_batches(self, client, auth_headers, monkeypatch):
+        """Test a backup spanning several batches is fully imported"""
+        from backend import backup
+
+        monkeypatch.setattr(backup, "IMPORT_BATCH_SIZE", 3)
+        dreams = [
+            {"body": f"Dream {i}", "tags": [f"t{i % 2}"], "created_at": f"2024-{i:02d}"}
+            for i in range(10)
+        ]
+        # Duplicate within the file is skipped like an existing dream
+        dreams.append(dict(dreams[0]))
+
+        data = self._import(
+            client, auth_headers, json.dumps({"dreams": dreams}).encode()
+        ).json()
+
+        assert data == {
+            "success": True,
+            "imported": 10,
+            "skipped": 1,
+            "errors": 0,
+            "total": 11,
+        }
+        assert client.get("/api/tags", headers=auth_headers).json() == ["t0", "t1"]
+        stats = client.get("/api/stats", headers=auth_headers).json()
+        assert stats["total"] == 10
+
+    def test_import_bad_rows_counted(self, client, auth_headers):
+        """Test rows that cannot be imported are counted as errors"""
+        content = json.dumps(
+            {
+                "dreams": [
+                    {"body": "Good", "created_at": "1"},
+                    "not a dream",
+                    {"body": None},
+                ]
+            }
+        ).encode()
+
+        data = self._import(client, auth_headers, content).json()
+
+        assert (data["imported"], data["errors"], data["total"]) == (1, 2, 3)
+
+    def test_import_keys_in_any_order(self, client, auth_headers):
+        """Test dreams may come before the other backup fields"""
+        content = b'{"dreams": [{"body": "D\\u00e9j\\u00e0 vu"}], "version": "1.0"}'
+
+        data = self._import(client, auth_headers, content).json()
+
+        assert data["imported"] == 1
+        dreams = client.get("/api/dreams", headers=auth_headers).json()
+        assert dreams[0]["body"] == "Déjà vu"
+
+    def test_import_truncated_file_rolls_back(self, client, auth_headers):
+        """Test a file that breaks off mid-way imports nothing"""
+        content = json.dumps(
+            {"dreams": [{"body": f"Dream {i}"} for i in range(5)]}
+        ).encode()[:-10]
+
+        response = self._import(client, auth_headers, content)
+
+        assert response.status_code == 400
+        assert client.get("/api/dreams", headers=auth_headers).json() == []
+
+    def test_import_detects_encoding(self, client, auth_headers):
+        """Test UTF-8 with a BOM and UTF-16 backups import like json.loads reads them"""
+
+        def backup(n):
+            return json.dumps({"dreams": [{"body": "Déjà vu", "created_at": n}]})
+
+        for content in (
+            codecs.BOM_UTF8 + backup("1").encode(),
+            backup("2").encode("utf-16"),
+            backup("3").encode("utf-16-le"),
+        ):
+            response = self._import(client, auth_headers, content)
+            assert response.status_code == 200, response.text
+            assert response.json()["imported"] == 1
+
+        dreams = client.get("/api/dreams", headers=auth_headers).json()
+        assert [d["body"] for d in dreams] == ["Déjà vu"] * 3
+
+    def test_import_parser_stops_at_malformed_value(self):
+        """Test malformed input fails without reading the rest of the file"""
+        from backend.backup import iter_backup_dreams
+
+        content = b'{"dreams": [{"body": oops}, ' + b'{"body": "x"}, ' * 100_000
+        fileobj = io.BytesIO(content)
+
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_backup_dreams(fileobj, chunk_size=1024))
+        assert fileobj.tell() <= 4096
+
+    def test_import_parser_small_reads(self):
+        """Test the streaming parser copes with values split across reads"""
+        from backend.backup import iter_backup_dreams
+
+        backup_data = {
+            "version": "1.0",
+            "meta": {"nested": [1, 2.5, None, True]},
+            "dreams": [{"body": "Ünïcode ☾", "lucidity": 12345}, {"body": "x"}],
+            "total_dreams": 2,
+        }
+        content = json.dumps(backup_data, ensure_ascii=False, indent=2).encode()
+
+        dreams = list(iter_backup_dreams(io.BytesIO(content), chunk_size=1))
+
+        assert dreams == backup_data["dreams"]
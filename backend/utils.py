@@ -1,3 +1,4 @@
+import base64
 import json
 
 
@@ -7,3 +8,46 @@ def row_to_dict(row):
     if "tags" in d:
         d["tags"] = json.loads(d.get("tags") or "[]")
     return d
+
+
+def encode_cursor(created_at, dream_id):
+    """Encode a (created_at, id) position as an opaque pagination cursor"""
+    raw = json.dumps([created_at, dream_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Decode a pagination cursor, raising ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, dream_id = json.loads(raw)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(created_at, str) or not isinstance(dream_id, int):
+        raise ValueError("Invalid cursor")
+    return created_at, dream_id
+
+
+def json_ids(ids):
+    """Encode ids as a JSON array, for binding to json_each(?)"""
+    return json.dumps([int(i) for i in ids])
+
+
+def user_batches(conn, batch_size):
+    """
+    Yield (after, last, count) spans covering all users batch_size at a
+    time, for backfills that rebuild per-user rows WHERE user_id > after
+    AND user_id <= last; count is the number of users in the span.
+    """
+    after = 0
+    while True:
+        row = conn.execute(
+            """SELECT COUNT(*), MAX(id) FROM (
+                   SELECT id FROM users WHERE id > ? ORDER BY id LIMIT ?
+               )""",
+            (after, batch_size),
+        ).fetchone()
+        if not row[0]:
+            return
+        yield after, row[1], row[0]
+        after = row[1]
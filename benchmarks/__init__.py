@@ -0,0 +1 @@
+"""Performance benchmarks; see benchmarks/__main__.py"""
@@ -0,0 +1,105 @@
+"""
+Time the API endpoints against synthetic journals of several sizes.
+
+    python -m benchmarks --sizes 100,1000,10000 --output bench.json
+    python -m benchmarks --baseline bench.json --threshold 0.2
+
+Datasets are cached in --data-dir. With --baseline, cases whose p50 or p95
+regressed by more than --threshold are listed and the exit status is 1.
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", default="100,1000,10000", help="dreams per user, comma-separated"
+    )
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--cases", default="*", help="glob(s) over case names, comma-separated"
+    )
+    parser.add_argument("--data-dir", default=".bench-data")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    # Before the app is imported: cheap bcrypt so auth cases measure the
+    # app rather than the hash, no throttling of the benchmark's own logins,
+    # and no response cache, which would serve every repeat of a read
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    os.environ.setdefault("AUTH_RATE_LIMIT_ENABLED", "false")
+    os.environ.setdefault("RESPONSE_CACHE_MAX_BYTES", "0")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "startup.db")
+
+    from benchmarks import runner
+
+    patterns = args.cases.split(",")
+    cases = [c for c in runner.CASES if any(fnmatch.fnmatch(c, p) for p in patterns)]
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    report = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "users": args.users,
+            "iterations": args.iterations,
+            "seed": args.seed,
+            "bcrypt_rounds": int(os.environ["BCRYPT_ROUNDS"]),
+        },
+        "results": {},
+    }
+    for size in sizes:
+        print(f"== {args.users} users x {size} dreams", file=sys.stderr)
+        path = runner.build_dataset(args.data_dir, args.users, size, args.seed)
+        results = runner.run_dataset(
+            path, cases, args.iterations, args.warmup, args.seed
+        )
+        report["results"][str(size)] = results
+        _print_table(results)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = runner.compare(report, baseline, args.threshold)
+        for size, case, metric, old, new in regressions:
+            print(
+                f"REGRESSION {size} {case} {metric}: {old:.2f} -> {new:.2f} ms "
+                f"(+{(new / old - 1) * 100:.0f}%)"
+            )
+        if regressions:
+            return 1
+        print(f"No regressions over {args.threshold:.0%}")
+    return 0
+
+
+def _print_table(results):
+    print(
+        f"{'case':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'err':>6}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:<24}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+            f"{r['throughput_rps']:>10.1f}{r['errors']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
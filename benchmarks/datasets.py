@@ -0,0 +1,91 @@
+"""
+Reproducible synthetic journals.
+
+The same (users, dreams_per_user, seed) always produces the same database,
+so timings from different runs and machines compare like for like.
+"""
+
+import math
+import random
+from datetime import date, datetime, timedelta, timezone
+
+MOODS = ["peaceful", "joyful", "anxious", "eerie", "vivid", "neutral"]
+# Roughly how often each mood is picked; a few dreams have none
+MOOD_WEIGHTS = [25, 20, 18, 10, 15, 12]
+NO_MOOD_RATE = 0.1
+
+TAGS = [
+    "flying", "falling", "water", "ocean", "family", "school", "work", "chase",
+    "lucid", "nightmare", "recurring", "house", "city", "forest", "animals",
+    "friends", "travel", "teeth", "exam", "lost", "car", "train", "childhood",
+    "stranger", "music", "fire", "snow", "mountain", "space", "mirror",
+]  # fmt: skip
+
+WORDS = (
+    "i was walking through a long corridor that kept changing shape and the "
+    "light came from somewhere below my feet while someone i knew called my "
+    "name from far away then the room filled with water and i could breathe "
+    "it felt calm and strange at the same time suddenly the door opened onto "
+    "a street from my childhood where everything was slightly too large and "
+    "the sky had the color of old paper i tried to run but my legs moved "
+    "slowly and the ground turned into sand that whispered as i stepped on "
+    "it there was a train waiting with no driver and a cat sat on the seat "
+    "watching me as if it expected an answer i remembered the exam i had "
+    "forgotten and looked for a pencil in every pocket the ocean was "
+    "suddenly right there glowing under the moon and i started flying over it"
+).split()
+
+# Bodies are windows onto one long shuffled-looking word stream
+MAX_WORDS = 1500
+_STREAM = [WORDS[i * 7 % len(WORDS)] for i in range(len(WORDS) + MAX_WORDS)]
+
+START_DATE = date(2022, 1, 1)
+DAYS = 3 * 365
+
+
+def _body(rng):
+    # Log-normal lengths: most entries are a short paragraph, a few are long
+    length = max(5, min(MAX_WORDS, int(rng.lognormvariate(math.log(60), 0.8))))
+    start = rng.randrange(len(WORDS))
+    return " ".join(_STREAM[start : start + length]).capitalize() + "."
+
+
+def _tags(rng):
+    # Zipf-like popularity: the first tags in TAGS are the common ones
+    count = rng.choices([0, 1, 2, 3, 4], weights=[20, 35, 25, 15, 5])[0]
+    picked = set()
+    while len(picked) < count:
+        rank = min(int(rng.paretovariate(1.2)) - 1, len(TAGS) - 1)
+        picked.add(TAGS[rank])
+    return sorted(picked)
+
+
+def iter_dreams(rng, count):
+    """Yield count dream dicts in backup format, oldest first"""
+    offsets = sorted(rng.randrange(DAYS) for _ in range(count))
+    for i, offset in enumerate(offsets):
+        day = START_DATE + timedelta(days=offset)
+        created = datetime(
+            day.year, day.month, day.day, 6, 0, tzinfo=timezone.utc
+        ) + timedelta(seconds=rng.randrange(4 * 3600) + i)
+        lucid = rng.random() < 0.7
+        yield {
+            "title": f"Dream {i + 1}" if rng.random() < 0.8 else None,
+            "body": _body(rng),
+            "mood": (
+                None
+                if rng.random() < NO_MOOD_RATE
+                else rng.choices(MOODS, weights=MOOD_WEIGHTS)[0]
+            ),
+            "lucidity": rng.randint(0, 5) if lucid else None,
+            "sleep_quality": rng.randint(1, 5) if rng.random() < 0.8 else None,
+            "tags": _tags(rng),
+            "dream_date": day.isoformat(),
+            "created_at": created.isoformat(),
+            "updated_at": created.isoformat(),
+        }
+
+
+def user_dreams(seed, user, count):
+    """A user's dreams; each user has its own stream, so any one can be redone"""
+    return iter_dreams(random.Random(f"{seed}/{user}"), count)
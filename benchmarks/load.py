@@ -0,0 +1,396 @@
+"""
+Concurrent load against a real uvicorn server.
+
+Starts backend.main:app on a free local port against a fresh copy of a
+seeded dataset, then runs --vus virtual users for --duration seconds. Each
+user logs in once and loops over scenarios picked by --mix weights, with
+exponential think time between them. Reports latency percentiles and
+errors per operation, and throughput and latency over time.
+
+    python -m benchmarks.load --vus 50 --duration 60
+    python -m benchmarks.load --mix browse=1,capture=1 --output load.json
+    python -m benchmarks.load --url http://localhost:8000   # existing server
+
+Against --url the accounts bench<n>@example.com with the benchmark
+password must already exist (i.e. the server runs on a benchmark dataset).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks import datasets
+
+DEFAULT_MIX = "browse=50,capture=10,search=20,stats=15,backup=5"
+
+
+class Recorder:
+    """Every request's (finished_at, operation, seconds, error or None)"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.samples = []
+
+    def add(self, operation, seconds, error):
+        self.samples.append(
+            (time.perf_counter() - self.start, operation, seconds, error)
+        )
+
+
+class VirtualUser:
+    def __init__(self, client, recorder, email, password, rng):
+        self.client = client
+        self.recorder = recorder
+        self.email = email
+        self.password = password
+        self.rng = rng
+        self.headers = {}
+        self.dream_ids = []
+
+    async def request(self, operation, method, url, **kwargs):
+        error = None
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(
+                method, url, headers=self.headers, **kwargs
+            )
+            if response.status_code >= 400:
+                error = str(response.status_code)
+        except httpx.HTTPError as exc:
+            response = None
+            error = type(exc).__name__
+        self.recorder.add(operation, time.perf_counter() - start, error)
+        return response if error is None else None
+
+    async def login(self):
+        response = await self.request(
+            "login",
+            "POST",
+            "/api/auth/login",
+            json={"email": self.email, "password": self.password},
+        )
+        if response is None:
+            return False
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return True
+
+
+async def browse(vu):
+    """The journal view: a page or three of the list, then one dream"""
+    response = await vu.request("list", "GET", "/api/dreams", params={"limit": 20})
+    if response is None:
+        return
+    vu.dream_ids = [d["id"] for d in response.json()] or vu.dream_ids
+    cursor = response.headers.get("x-next-cursor")
+    for _ in range(vu.rng.randint(0, 2)):
+        if not cursor:
+            break
+        response = await vu.request(
+            "list_next",
+            "GET",
+            "/api/dreams",
+            params={"limit": 20, "cursor": cursor},
+        )
+        if response is None:
+            return
+        cursor = response.headers.get("x-next-cursor")
+    if vu.dream_ids:
+        await vu.request("get", "GET", f"/api/dreams/{vu.rng.choice(vu.dream_ids)}")
+
+
+async def capture(vu):
+    """Writing down a dream, sometimes editing it right after"""
+    dream = next(datasets.iter_dreams(vu.rng, 1))
+    for key in ("created_at", "updated_at"):
+        del dream[key]
+    response = await vu.request("create", "POST", "/api/dreams", json=dream)
+    if response is not None and vu.rng.random() < 0.3:
+        await vu.request(
+            "update",
+            "PUT",
+            f"/api/dreams/{response.json()['id']}",
+            json={"mood": vu.rng.choice(datasets.MOODS)},
+        )
+
+
+async def search(vu):
+    """Full-text search, sometimes narrowed by a tag"""
+    params = {"search": vu.rng.choice(datasets.WORDS)}
+    if vu.rng.random() < 0.3:
+        params["tag"] = vu.rng.choice(datasets.TAGS[:10])
+    await vu.request("search", "GET", "/api/dreams", params=params)
+
+
+async def stats(vu):
+    """The stats dashboard and the calendar heatmap"""
+    await vu.request("stats", "GET", "/api/stats")
+    await vu.request("stats_detailed", "GET", "/api/stats/detailed")
+    year = datasets.START_DATE.year + vu.rng.randrange(3)
+    await vu.request("calendar", "GET", "/api/calendar", params={"year": year})
+
+
+async def backup(vu):
+    """A full JSON export, read to the end"""
+    await vu.request("backup", "GET", "/api/backup")
+
+
+SCENARIOS = {
+    "browse": browse,
+    "capture": capture,
+    "search": search,
+    "stats": stats,
+    "backup": backup,
+}
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(
+                f"Unknown scenario {name!r}; one of {', '.join(SCENARIOS)}"
+            )
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def _run_user(vu, mix, delay, deadline, think):
+    await asyncio.sleep(delay)
+    if not await vu.login():
+        return
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        await SCENARIOS[vu.rng.choices(names, weights)[0]](vu)
+        if think:
+            await asyncio.sleep(min(vu.rng.expovariate(1 / think), think * 5))
+
+
+async def run_load(
+    base_url, accounts, password, vus, duration, ramp_up, mix, think, seed
+):
+    """Drive the server at base_url; returns the Recorder"""
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=vus, max_keepalive_connections=vus)
+    timeout = httpx.Timeout(60.0)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=timeout
+    ) as client:
+        deadline = time.perf_counter() + ramp_up + duration
+        users = [
+            VirtualUser(
+                client,
+                recorder,
+                accounts[i % len(accounts)],
+                password,
+                random.Random(seed * 100_003 + i),
+            )
+            for i in range(vus)
+        ]
+        await asyncio.gather(
+            *(
+                _run_user(vu, mix, ramp_up * i / vus, deadline, think)
+                for i, vu in enumerate(users)
+            )
+        )
+    return recorder
+
+
+def report(recorder, interval):
+    """{"operations": {op: summary}, "timeline": [...], "errors": {kind: n}}"""
+    from benchmarks.runner import summarize
+
+    elapsed = max((s[0] for s in recorder.samples), default=0.0)
+    by_operation, errors = {}, {}
+    for _, operation, seconds, error in recorder.samples:
+        entry = by_operation.setdefault(operation, [[], 0])
+        entry[0].append(seconds)
+        if error:
+            entry[1] += 1
+            key = f"{operation} {error}"
+            errors[key] = errors.get(key, 0) + 1
+    operations = {
+        op: summarize(samples, failed, elapsed)
+        for op, (samples, failed) in sorted(by_operation.items())
+    }
+    operations["all"] = summarize(
+        [s[2] for s in recorder.samples],
+        sum(1 for s in recorder.samples if s[3]),
+        elapsed,
+    )
+
+    buckets = {}
+    for finished, _, seconds, error in recorder.samples:
+        bucket = buckets.setdefault(int(finished // interval), [[], 0])
+        bucket[0].append(seconds)
+        bucket[1] += bool(error)
+    timeline = []
+    for index in range(int(elapsed // interval) + 1):
+        samples, failed = buckets.get(index, [[], 0])
+        summary = summarize(samples, failed, interval)
+        timeline.append(
+            {
+                "t": round(index * interval, 3),
+                "requests": summary["n"],
+                "errors": failed,
+                "throughput_rps": summary["throughput_rps"],
+                "p50_ms": summary["p50_ms"],
+                "p95_ms": summary["p95_ms"],
+            }
+        )
+    return {"operations": operations, "timeline": timeline, "errors": errors}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_path, port, workers):
+    """Launch uvicorn in a child process and wait until it answers"""
+    env = {
+        **os.environ,
+        "DB_PATH": str(db_path),
+        "BCRYPT_ROUNDS": os.environ.get("BCRYPT_ROUNDS", "4"),
+        "AUTH_RATE_LIMIT_ENABLED": os.environ.get("AUTH_RATE_LIMIT_ENABLED", "false"),
+        "SECRET_KEY": os.environ.get("SECRET_KEY", "benchmark"),
+    }
+    if workers > 1:
+        # Each worker would cache on its own and miss the others' writes
+        env.setdefault("RESPONSE_CACHE_MAX_BYTES", "0")
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "backend.main:app",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        "--workers",
+        str(workers),
+        "--log-level",
+        "warning",
+        "--no-access-log",
+    ]
+    server = subprocess.Popen(command, env=env)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with status {server.returncode}")
+        try:
+            httpx.get(url + "/api/auth/me", timeout=1.0)
+            return server, url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("Server did not start within 30 seconds")
+
+
+def _print_report(result):
+    print(
+        f"{'operation':<16}{'n':>8}{'err %':>8}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'max ms':>10}{'req/s':>9}"
+    )
+    for name, r in result["operations"].items():
+        if not r["n"]:
+            continue
+        print(
+            f"{name:<16}{r['n']:>8}{r['errors'] / r['n'] * 100:>8.1f}"
+            f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+            f"{r['max_ms']:>10.1f}{r['throughput_rps']:>9.1f}"
+        )
+    print()
+    print(f"{'t (s)':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    for row in result["timeline"]:
+        print(
+            f"{row['t']:>8.0f}{row['throughput_rps'] or 0:>9.1f}"
+            f"{row['p50_ms'] or 0:>10.1f}{row['p95_ms'] or 0:>10.1f}{row['errors']:>8}"
+        )
+    for kind, count in sorted(result["errors"].items(), key=lambda e: -e[1]):
+        print(f"error {kind}: {count}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vus", type=int, default=20, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--ramp-up", type=float, default=5, help="seconds")
+    parser.add_argument("--think", type=float, default=0.5, help="mean seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario=weight,...")
+    parser.add_argument("--interval", type=float, default=5, help="timeline step")
+    parser.add_argument("--users", type=int, default=10, help="accounts in dataset")
+    parser.add_argument("--dreams", type=int, default=1000, help="dreams per account")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default=".bench-data")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--url", help="load an already running server instead")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    # The dataset's shared password hash uses the same cheap cost as the
+    # server, so logins measure the app rather than bcrypt
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    from benchmarks import runner
+
+    server = None
+    url = args.url
+    if url is None:
+        print(f"Preparing {args.users} users x {args.dreams} dreams", file=sys.stderr)
+        path = runner.build_dataset(args.data_dir, args.users, args.dreams, args.seed)
+        server, url = start_server(path, _free_port(), args.workers)
+    accounts = [f"bench{n}@example.com" for n in range(args.users)]
+
+    print(
+        f"{args.vus} virtual users for {args.duration:g}s against {url}",
+        file=sys.stderr,
+    )
+    try:
+        recorder = asyncio.run(
+            run_load(
+                url,
+                accounts,
+                runner.PASSWORD,
+                args.vus,
+                args.duration,
+                args.ramp_up,
+                mix,
+                args.think,
+                args.seed,
+            )
+        )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    result = report(recorder, args.interval)
+    result["meta"] = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        **{k: v for k, v in vars(args).items() if k not in ("output", "data_dir")},
+    }
+    _print_report(result)
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
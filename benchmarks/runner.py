@@ -0,0 +1,301 @@
+"""
+Endpoint timings over synthetic datasets.
+
+Requests go through the whole ASGI app in-process (FastAPI's TestClient),
+so the numbers cover routing, validation, auth and SQL but not the network.
+"""
+
+import io
+import json
+import random
+import shutil
+import statistics
+import time
+from pathlib import Path
+
+from benchmarks import datasets
+from benchmarks.seed import PASSWORD, populate
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, errors, elapsed):
+    ordered = sorted(samples)
+    ms = lambda v: round(v * 1000, 3) if v is not None else None  # noqa: E731
+    return {
+        "n": len(samples),
+        "errors": errors,
+        "mean_ms": ms(statistics.fmean(samples)) if samples else None,
+        "p50_ms": ms(percentile(ordered, 0.50)),
+        "p95_ms": ms(percentile(ordered, 0.95)),
+        "p99_ms": ms(percentile(ordered, 0.99)),
+        "max_ms": ms(ordered[-1]) if ordered else None,
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else None,
+    }
+
+
+class Session:
+    """Per-dataset state shared by the cases"""
+
+    def __init__(self, client, user_id, email, rng):
+        self.client = client
+        self.user_id = user_id
+        self.email = email
+        self.rng = rng
+        token = client.post(
+            "/api/auth/login", json={"email": email, "password": PASSWORD}
+        ).json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+        ids = client.get("/api/dreams?limit=200", headers=self.headers).json()
+        self.dream_ids = [d["id"] for d in ids]
+        self.cursor = client.get(
+            "/api/dreams?limit=20", headers=self.headers
+        ).headers.get("x-next-cursor")
+        self.counter = 0
+
+    def next(self):
+        self.counter += 1
+        return self.counter
+
+    def any_dream(self):
+        return self.rng.choice(self.dream_ids)
+
+
+def _backup_file(session, count=20):
+    dreams = list(datasets.iter_dreams(random.Random(session.next()), count))
+    for d in dreams:
+        d["created_at"] = f"import-{session.next()}"
+    return {
+        "file": (
+            "backup.json",
+            io.BytesIO(json.dumps({"dreams": dreams}).encode()),
+            "application/json",
+        )
+    }
+
+
+def _register(session):
+    n = session.next()
+    return session.client.post(
+        "/api/auth/register",
+        json={
+            "email": f"new{n}@example.com",
+            "username": f"new{n}",
+            "password": PASSWORD,
+        },
+    )
+
+
+# name -> (setup(session) -> arg or None, run(session, arg) -> response)
+CASES = {
+    # routes/dreams.py
+    "dreams.list": (None, lambda s, _: s.client.get("/api/dreams", headers=s.headers)),
+    "dreams.list_page2": (
+        None,
+        lambda s, _: s.client.get(
+            "/api/dreams", params={"limit": 20, "cursor": s.cursor}, headers=s.headers
+        ),
+    ),
+    "dreams.list_total": (
+        None,
+        lambda s, _: s.client.get(
+            "/api/dreams?limit=20&include_total=true", headers=s.headers
+        ),
+    ),
+    "dreams.search": (
+        None,
+        lambda s, _: s.client.get(
+            "/api/dreams",
+            params={"search": s.rng.choice(["ocean", "train", "childhood", "sky"])},
+            headers=s.headers,
+        ),
+    ),
+    "dreams.filter_tag": (
+        None,
+        lambda s, _: s.client.get(
+            "/api/dreams",
+            params={"tag": s.rng.choice(datasets.TAGS[:10])},
+            headers=s.headers,
+        ),
+    ),
+    "dreams.filter_mood": (
+        None,
+        lambda s, _: s.client.get(
+            "/api/dreams",
+            params={"mood": s.rng.choice(datasets.MOODS)},
+            headers=s.headers,
+        ),
+    ),
+    "dreams.get": (
+        None,
+        lambda s, _: s.client.get(f"/api/dreams/{s.any_dream()}", headers=s.headers),
+    ),
+    "dreams.create": (
+        None,
+        lambda s, _: s.client.post(
+            "/api/dreams",
+            json={
+                "body": "A benchmark dream about the ocean",
+                "mood": "vivid",
+                "lucidity": 3,
+                "tags": ["ocean", "benchmark"],
+                "dream_date": "2024-06-01",
+            },
+            headers=s.headers,
+        ),
+    ),
+    "dreams.update": (
+        None,
+        lambda s, _: s.client.put(
+            f"/api/dreams/{s.any_dream()}",
+            json={"mood": s.rng.choice(datasets.MOODS), "tags": ["edited"]},
+            headers=s.headers,
+        ),
+    ),
+    "dreams.delete": (
+        lambda s: s.client.post(
+            "/api/dreams", json={"body": "To delete"}, headers=s.headers
+        ).json()["id"],
+        lambda s, dream_id: s.client.delete(
+            f"/api/dreams/{dream_id}", headers=s.headers
+        ),
+    ),
+    # routes/auth.py
+    "auth.register": (None, lambda s, _: _register(s)),
+    "auth.login": (
+        None,
+        lambda s, _: s.client.post(
+            "/api/auth/login", json={"email": s.email, "password": PASSWORD}
+        ),
+    ),
+    "auth.me": (None, lambda s, _: s.client.get("/api/auth/me", headers=s.headers)),
+    "auth.change_password": (
+        # On a throwaway user, so the session's token stays valid
+        lambda s: {"Authorization": f"Bearer {_register(s).json()['access_token']}"},
+        lambda s, headers: s.client.put(
+            "/api/auth/change-password",
+            json={"current_password": PASSWORD, "new_password": PASSWORD},
+            headers=headers,
+        ),
+    ),
+    "auth.change_username": (
+        None,
+        lambda s, _: s.client.put(
+            "/api/auth/change-username",
+            json={"username": f"bench_u{s.next()}"},
+            headers=s.headers,
+        ),
+    ),
+    "auth.delete_account": (
+        lambda s: {"Authorization": f"Bearer {_register(s).json()['access_token']}"},
+        lambda s, headers: s.client.delete("/api/auth/delete-account", headers=headers),
+    ),
+    # routes/stats.py
+    "stats.summary": (None, lambda s, _: s.client.get("/api/stats", headers=s.headers)),
+    "stats.detailed": (
+        None,
+        lambda s, _: s.client.get("/api/stats/detailed", headers=s.headers),
+    ),
+    "stats.range": (
+        None,
+        lambda s, _: s.client.get("/api/stats/range", headers=s.headers),
+    ),
+    "stats.range_week": (
+        None,
+        lambda s, _: s.client.get(
+            "/api/stats/range",
+            params={"from": "2023-01-01", "to": "2023-12-31", "granularity": "week"},
+            headers=s.headers,
+        ),
+    ),
+    "stats.tags": (None, lambda s, _: s.client.get("/api/tags", headers=s.headers)),
+    "stats.backup": (None, lambda s, _: s.client.get("/api/backup", headers=s.headers)),
+    "stats.import": (
+        _backup_file,
+        lambda s, files: s.client.post("/api/import", files=files, headers=s.headers),
+    ),
+}
+
+
+def build_dataset(data_dir, users, dreams_per_user, seed):
+    """
+    Path of a fresh working copy of the dataset. The pristine database is
+    generated once and cached in data_dir; runs write to the copy, so every
+    run starts from identical data.
+    """
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    pristine = data_dir / f"journal-{users}x{dreams_per_user}-seed{seed}.db"
+    if not pristine.exists():
+        partial = pristine.with_suffix(".partial")
+        for leftover in data_dir.glob(partial.name + "*"):
+            leftover.unlink()
+        populate(partial, users, dreams_per_user, seed)
+        partial.rename(pristine)
+
+    working = data_dir / "working.db"
+    for leftover in data_dir.glob("working.db*"):
+        leftover.unlink()
+    shutil.copyfile(pristine, working)
+    return working
+
+
+def use_database(path):
+    """Point the app at another database file"""
+    from backend import database
+
+    database.close_pool()
+    database.DB_PATH = str(path)
+
+
+def run_dataset(path, cases, iterations, warmup, seed):
+    """Time each case against one dataset; returns {case: summary}"""
+    from fastapi.testclient import TestClient
+
+    from backend.main import app
+
+    use_database(path)
+    results = {}
+    with TestClient(app) as client:
+        session = Session(client, 1, "bench0@example.com", random.Random(seed))
+        for name in cases:
+            setup, run = CASES[name]
+            samples, errors = [], 0
+            total = 0.0
+            for i in range(warmup + iterations):
+                arg = setup(session) if setup else None
+                start = time.perf_counter()
+                response = run(session, arg)
+                elapsed = time.perf_counter() - start
+                if i < warmup:
+                    continue
+                total += elapsed
+                if response.status_code >= 400:
+                    errors += 1
+                samples.append(elapsed)
+            results[name] = summarize(samples, errors, total)
+    return results
+
+
+def compare(current, baseline, threshold):
+    """
+    Cases whose p50 or p95 got slower than baseline by more than threshold
+    (a fraction). Returns [(size, case, metric, baseline_ms, current_ms)].
+    """
+    regressions = []
+    for size, cases in current["results"].items():
+        for case, summary in cases.items():
+            before = baseline.get("results", {}).get(size, {}).get(case)
+            if not before:
+                continue
+            for metric in ("p50_ms", "p95_ms"):
+                old, new = before.get(metric), summary.get(metric)
+                if old and new and new > old * (1 + threshold):
+                    regressions.append((size, case, metric, old, new))
+    return regressions
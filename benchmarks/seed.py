@@ -0,0 +1,189 @@
+"""
+Bulk-load synthetic users and dreams, straight into the database schema.
+
+    python -m benchmarks.seed data/large.db --users 100 --dreams 5000
+    python -m benchmarks.seed data/large.db --users 3 --dreams 1000 --backup-dir backups
+    python -m benchmarks.seed --backup-dir backups --users 1 --dreams 200000
+
+The database is created with init_db and must not have users yet. While
+loading, secondary indexes and the full-text triggers are dropped, the
+journal is off and syncs are skipped; dreams go in with executemany in
+batches, then the indexes, search index, tags, stats aggregates, activity
+bitmaps and daily rollups are built once at the end. Every user
+bench<n>@example.com shares one password, hashed once.
+
+With --backup-dir, a v1.0 backup file per user (bench<n>.json, the same
+dreams as in the database) is written for exercising /api/import.
+"""
+
+import argparse
+import json
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+
+from benchmarks import datasets
+
+PASSWORD = "benchmark-password"
+BATCH_SIZE = 10_000
+
+# Applied for the duration of the load only; the database is unusable by
+# anything else meanwhile and is not crash-safe until it finishes
+LOAD_PRAGMAS = {
+    "journal_mode": "OFF",
+    "synchronous": "OFF",
+    "locking_mode": "EXCLUSIVE",
+    "cache_size": -256_000,
+    "temp_store": "MEMORY",
+}
+
+_DEFERRED = """SELECT type, name, sql FROM sqlite_master
+               WHERE type IN ('index', 'trigger') AND sql IS NOT NULL
+                 AND tbl_name IN ('users', 'dreams', 'tags', 'dream_tags')"""
+
+_INSERT_DREAM = """INSERT INTO dreams (id, user_id, title, body, mood, lucidity,
+                                       sleep_quality, tags, dream_date,
+                                       created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+def email(n):
+    return f"bench{n}@example.com"
+
+
+def populate(path, users, dreams_per_user, seed=0, password_hash=None, batch_size=None):
+    """
+    Fill a new database at path. Returns [(user_id, email)].
+
+    password_hash defaults to PASSWORD hashed at the configured bcrypt cost.
+    """
+    from backend import activity, aggregates, database, rollups
+    from backend.hashing import hash_password_sync
+    from backend.tags import backfill_tags
+
+    if password_hash is None:
+        password_hash = hash_password_sync(PASSWORD)
+    batch_size = batch_size or BATCH_SIZE
+
+    database.init_db(str(path))
+    conn = database.connect(str(path), pragmas=LOAD_PRAGMAS)
+    try:
+        if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+            raise ValueError(f"{path} already has users")
+
+        deferred = conn.execute(_DEFERRED).fetchall()
+        for kind, name, _ in deferred:
+            conn.execute(f"DROP {kind.upper()} {name}")
+
+        created = [(n + 1, email(n)) for n in range(users)]
+        conn.executemany(
+            "INSERT INTO users (id, email, username, password_hash) VALUES (?, ?, ?, ?)",
+            [
+                (user_id, mail, f"bench{n}", password_hash)
+                for n, (user_id, mail) in enumerate(created)
+            ],
+        )
+
+        next_id = 1
+        for n, (user_id, _) in enumerate(created):
+            dreams = datasets.user_dreams(seed, n, dreams_per_user)
+            while batch := list(islice(dreams, batch_size)):
+                conn.executemany(
+                    _INSERT_DREAM,
+                    [
+                        (
+                            next_id + i,
+                            user_id,
+                            d["title"],
+                            d["body"],
+                            d["mood"],
+                            d["lucidity"],
+                            d["sleep_quality"],
+                            json.dumps(d["tags"]),
+                            d["dream_date"],
+                            d["created_at"],
+                            d["updated_at"],
+                        )
+                        for i, d in enumerate(batch)
+                    ],
+                )
+                next_id += len(batch)
+
+        # Indexes first, so the set-based rebuilds below can use them
+        for kind, _, sql in deferred:
+            if kind == "index":
+                conn.execute(sql)
+        conn.execute("INSERT INTO dreams_fts(dreams_fts) VALUES ('rebuild')")
+        backfill_tags(conn)
+        aggregates.rebuild(conn)
+        activity.rebuild(conn)
+        rollups.rebuild(conn)
+        for kind, _, sql in deferred:
+            if kind == "trigger":
+                conn.execute(sql)
+        conn.commit()
+
+        conn.execute("PRAGMA locking_mode = NORMAL")
+        conn.execute(f"PRAGMA journal_mode = {database.PRAGMAS['journal_mode']}")
+    finally:
+        conn.close()
+    return created
+
+
+def write_backups(directory, users, dreams_per_user, seed=0):
+    """Write bench<n>.json backup files matching populate(); returns their paths"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for n in range(users):
+        path = directory / f"bench{n}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            header = {
+                "export_date": "2025-01-01T00:00:00+00:00",
+                "version": "1.0",
+                "total_dreams": dreams_per_user,
+            }
+            f.write(json.dumps(header)[:-1] + ', "dreams": [')
+            for i, d in enumerate(datasets.user_dreams(seed, n, dreams_per_user)):
+                f.write(("," if i else "") + json.dumps({**d, "is_public": 0}))
+            f.write("]}")
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("db", nargs="?", help="database file to create")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--dreams", type=int, default=1000, help="dreams per user")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--backup-dir", help="also write per-user backup files")
+    args = parser.parse_args(argv)
+    if not args.db and not args.backup_dir:
+        parser.error("give a database path, --backup-dir, or both")
+
+    if args.db:
+        start = time.perf_counter()
+        try:
+            populate(
+                args.db, args.users, args.dreams, args.seed, batch_size=args.batch_size
+            )
+        except ValueError as exc:
+            print(exc, file=sys.stderr)
+            return 1
+        elapsed = time.perf_counter() - start
+        total = args.users * args.dreams
+        print(
+            f"{args.db}: {args.users} users, {total} dreams in {elapsed:.1f}s "
+            f"({total / elapsed:,.0f} dreams/s); password {PASSWORD!r}"
+        )
+    if args.backup_dir:
+        for path in write_backups(args.backup_dir, args.users, args.dreams, args.seed):
+            print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
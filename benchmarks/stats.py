@@ -0,0 +1,368 @@
+"""
+Detailed-stats engine against the implementations before it.
+
+    python -m benchmarks.stats --dreams 1000,10000,100000
+
+All three run on one connection over seeded journals: the original
+scan-per-section code, the eight-query version over the stats aggregates,
+and backend.stats. The engine's JSON must be identical to the eight-query
+version's (the original differs in tie order and rounding) apart from the
+streaks, which the older versions capped at 100 dreams; the median time of
+each is reported.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from backend.stats import average
+
+
+def scan_detailed_stats(conn, user_id):
+    """The original implementation: a separate scan of dreams per section"""
+    # Basic counts
+    total = conn.execute(
+        "SELECT COUNT(*) as c FROM dreams WHERE user_id = ?", (user_id,)
+    ).fetchone()["c"]
+
+    # Dreams by month (last 12 months)
+    dreams_by_month = conn.execute(
+        """
+        SELECT 
+            strftime('%Y-%m', dream_date) as month,
+            COUNT(*) as count,
+            AVG(lucidity) as avg_lucidity
+        FROM dreams 
+        WHERE user_id = ? 
+            AND dream_date >= date('now', '-12 months')
+        GROUP BY month
+        ORDER BY month
+        """,
+        (user_id,),
+    ).fetchall()
+
+    # Dreams by day of week
+    dreams_by_dow = conn.execute(
+        """
+        SELECT 
+            CASE CAST(strftime('%w', dream_date) AS INTEGER)
+                WHEN 0 THEN 'Sunday'
+                WHEN 1 THEN 'Monday'
+                WHEN 2 THEN 'Tuesday'
+                WHEN 3 THEN 'Wednesday'
+                WHEN 4 THEN 'Thursday'
+                WHEN 5 THEN 'Friday'
+                WHEN 6 THEN 'Saturday'
+            END as day_name,
+            COUNT(*) as count
+        FROM dreams 
+        WHERE user_id = ?
+        GROUP BY strftime('%w', dream_date)
+        ORDER BY strftime('%w', dream_date)
+        """,
+        (user_id,),
+    ).fetchall()
+
+    # Mood distribution
+    mood_dist = conn.execute(
+        """
+        SELECT mood, COUNT(*) as count
+        FROM dreams 
+        WHERE user_id = ? AND mood IS NOT NULL
+        GROUP BY mood
+        ORDER BY count DESC
+        """,
+        (user_id,),
+    ).fetchall()
+
+    # Top tags
+    all_tags = conn.execute(
+        "SELECT tags FROM dreams WHERE user_id = ?", (user_id,)
+    ).fetchall()
+    tag_counts = {}
+    for row in all_tags:
+        tags = json.loads(row["tags"] or "[]")
+        for tag in tags:
+            tag_counts[tag] = tag_counts.get(tag, 0) + 1
+    top_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+
+    # Lucidity over time
+    lucidity_trend = conn.execute(
+        """
+        SELECT 
+            strftime('%Y-%m', dream_date) as month,
+            AVG(lucidity) as avg_lucidity
+        FROM dreams 
+        WHERE user_id = ? 
+            AND lucidity IS NOT NULL
+            AND dream_date >= date('now', '-12 months')
+        GROUP BY month
+        ORDER BY month
+        """,
+        (user_id,),
+    ).fetchall()
+
+    # Current streak
+    recent_dreams = conn.execute(
+        """
+        SELECT dream_date 
+        FROM dreams 
+        WHERE user_id = ?
+        ORDER BY dream_date DESC
+        LIMIT 100
+        """,
+        (user_id,),
+    ).fetchall()
+
+    streak = 0
+    if recent_dreams:
+        dates = [datetime.fromisoformat(r["dream_date"]) for r in recent_dreams]
+        dates.sort(reverse=True)
+
+        current_date = datetime.now().date()
+        for i, dream_date in enumerate(dates):
+            expected_date = current_date - timedelta(days=i)
+            if dream_date.date() == expected_date or (
+                i == 0 and dream_date.date() == current_date - timedelta(days=1)
+            ):
+                streak += 1
+            else:
+                break
+
+    return {
+        "total_dreams": total,
+        "dreams_by_month": [
+            {
+                "month": r["month"],
+                "count": r["count"],
+                "avg_lucidity": r["avg_lucidity"],
+            }
+            for r in dreams_by_month
+        ],
+        "dreams_by_day": [
+            {"day": r["day_name"], "count": r["count"]} for r in dreams_by_dow
+        ],
+        "mood_distribution": [
+            {"mood": r["mood"], "count": r["count"]} for r in mood_dist
+        ],
+        "top_tags": [{"tag": tag, "count": count} for tag, count in top_tags],
+        "lucidity_trend": [
+            {
+                "month": r["month"],
+                "avg_lucidity": round(r["avg_lucidity"], 1) if r["avg_lucidity"] else 0,
+            }
+            for r in lucidity_trend
+        ],
+        "current_streak": streak,
+    }
+
+
+def legacy_detailed_stats(conn, user_id):
+    """The aggregate-table version that preceded backend.stats: eight queries"""
+    # Basic counts
+    totals = conn.execute(
+        "SELECT total FROM user_stats WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    total = totals["total"] if totals else 0
+
+    # Dreams by month (last 12 months). Whole months come from the
+    # aggregates; the month the window starts in is only partly inside
+    # it, so that one is counted from the dreams themselves.
+    window = conn.execute(
+        """
+        SELECT
+            date('now', '-12 months') AS start,
+            strftime('%Y-%m', 'now', '-12 months') AS first_month,
+            date('now', '-12 months', 'start of month', '+1 month') AS next_month
+        """
+    ).fetchone()
+    dreams_by_month = []
+    first = conn.execute(
+        """
+        SELECT COUNT(*) AS count,
+               COALESCE(SUM(lucidity), 0) AS lucidity_sum,
+               COUNT(lucidity) AS lucidity_count
+        FROM dreams
+        WHERE user_id = ? AND dream_date >= ? AND dream_date < ?
+        """,
+        (user_id, window["start"], window["next_month"]),
+    ).fetchone()
+    if first["count"]:
+        dreams_by_month.append(
+            {
+                "month": window["first_month"],
+                "count": first["count"],
+                "lucidity_sum": first["lucidity_sum"],
+                "lucidity_count": first["lucidity_count"],
+            }
+        )
+    dreams_by_month.extend(
+        dict(r)
+        for r in conn.execute(
+            """
+            SELECT key AS month, count, lucidity_sum, lucidity_count
+            FROM user_stat_buckets
+            WHERE user_id = ? AND kind = 'month' AND key > ?
+            ORDER BY key
+            """,
+            (user_id, window["first_month"]),
+        )
+    )
+
+    # Dreams by day of week
+    day_names = [
+        "Sunday",
+        "Monday",
+        "Tuesday",
+        "Wednesday",
+        "Thursday",
+        "Friday",
+        "Saturday",
+    ]
+    dreams_by_dow = conn.execute(
+        """
+        SELECT key, count
+        FROM user_stat_buckets
+        WHERE user_id = ? AND kind = 'weekday'
+        ORDER BY key
+        """,
+        (user_id,),
+    ).fetchall()
+
+    # Mood distribution
+    mood_dist = conn.execute(
+        """
+        SELECT key AS mood, count
+        FROM user_stat_buckets
+        WHERE user_id = ? AND kind = 'mood'
+        ORDER BY count DESC, key
+        """,
+        (user_id,),
+    ).fetchall()
+
+    # Top tags
+    top_tags = conn.execute(
+        """
+        SELECT key AS tag, count
+        FROM user_stat_buckets
+        WHERE user_id = ? AND kind = 'tag'
+        ORDER BY count DESC, key
+        LIMIT 10
+        """,
+        (user_id,),
+    ).fetchall()
+
+    # Current streak
+    recent_dreams = conn.execute(
+        """
+        SELECT dream_date 
+        FROM dreams 
+        WHERE user_id = ?
+        ORDER BY dream_date DESC
+        LIMIT 100
+        """,
+        (user_id,),
+    ).fetchall()
+
+    streak = 0
+    if recent_dreams:
+        dates = [datetime.fromisoformat(r["dream_date"]) for r in recent_dreams]
+        dates.sort(reverse=True)
+
+        current_date = datetime.now().date()
+        for i, dream_date in enumerate(dates):
+            expected_date = current_date - timedelta(days=i)
+            if dream_date.date() == expected_date or (
+                i == 0 and dream_date.date() == current_date - timedelta(days=1)
+            ):
+                streak += 1
+            else:
+                break
+
+    return {
+        "total_dreams": total,
+        "dreams_by_month": [
+            {
+                "month": r["month"],
+                "count": r["count"],
+                "avg_lucidity": average(r["lucidity_sum"], r["lucidity_count"]),
+            }
+            for r in dreams_by_month
+        ],
+        "dreams_by_day": [
+            {"day": day_names[int(r["key"])] if r["key"] else None, "count": r["count"]}
+            for r in dreams_by_dow
+        ],
+        "mood_distribution": [
+            {"mood": r["mood"], "count": r["count"]} for r in mood_dist
+        ],
+        "top_tags": [{"tag": r["tag"], "count": r["count"]} for r in top_tags],
+        "lucidity_trend": [
+            {
+                "month": r["month"],
+                "avg_lucidity": round(
+                    average(r["lucidity_sum"], r["lucidity_count"]), 1
+                )
+                or 0,
+            }
+            for r in dreams_by_month
+            if r["lucidity_count"]
+        ],
+        "current_streak": streak,
+    }
+
+
+def _time(fn, conn, user_id, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = fn(conn, user_id)
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples)
+
+
+def _without_streaks(stats):
+    return {k: v for k, v in stats.items() if not k.endswith("_streak")}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dreams", default="1000,10000,100000", help="per user")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default=".bench-data")
+    args = parser.parse_args(argv)
+
+    from backend.database import connect
+    from backend.stats import detailed_stats
+    from benchmarks.runner import build_dataset
+
+    print(
+        f"{'dreams':>8}{'scans ms':>11}{'8 queries ms':>14}{'engine ms':>11}"
+        f"{'vs scans':>10}{'vs 8 queries':>14}"
+    )
+    for size in [int(s) for s in args.dreams.split(",")]:
+        conn = connect(str(build_dataset(args.data_dir, 1, size, args.seed)))
+        try:
+            _, scans = _time(scan_detailed_stats, conn, 1, args.iterations)
+            expected, queries = _time(legacy_detailed_stats, conn, 1, args.iterations)
+            actual, engine = _time(detailed_stats, conn, 1, args.iterations)
+        finally:
+            conn.close()
+        if json.dumps(_without_streaks(actual)) != json.dumps(
+            _without_streaks(expected)
+        ):
+            print(f"{size}: responses differ", file=sys.stderr)
+            return 1
+        print(
+            f"{size:>8}{scans * 1000:>11.2f}{queries * 1000:>14.2f}"
+            f"{engine * 1000:>11.2f}{scans / engine:>9.0f}x{queries / engine:>13.1f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,14 @@
-import type { AuthResponse, DetailedStats, Dream, DreamCreate, Stats, User } from '../types'
+import type {
+  AuthResponse,
+  CalendarData,
+  DetailedStats,
+  Dream,
+  DreamCreate,
+  RangeStats,
+  Stats,
+  StatsGranularity,
+  User,
+} from '../types'
 
 const BASE = '/api'
 
@@ -36,6 +46,7 @@ interface ListParams {
   search?: string | null
   mood?: string | null
   tag?: string | null
+  dream_date?: string | null
   limit?: number
   offset?: number
 }
@@ -54,7 +65,7 @@ export const api = {
       }),
     me: () => request<User>('/auth/me'),
     changePassword: (currentPassword: string, newPassword: string) =>
-      request<{ success: boolean; message: string }>('/auth/change-password', {
+      request<{ success: boolean; message: string; access_token: string }>('/auth/change-password', {
         method: 'PUT',
         body: { current_password: currentPassword, new_password: newPassword } as any,
       }),
@@ -86,9 +97,19 @@ export const api = {
   tags: {
     list: () => request<string[]>('/tags'),
   },
+  calendar: {
+    get: (start: string, end: string) =>
+      request<CalendarData>(`/calendar?${new URLSearchParams({ start, end })}`),
+  },
   stats: {
     get: () => request<Stats>('/stats'),
     getDetailed: () => request<DetailedStats>('/stats/detailed'),
+    getRange: (granularity: StatsGranularity, from?: string, to?: string) => {
+      const params = new URLSearchParams({ granularity })
+      if (from) params.set('from', from)
+      if (to) params.set('to', to)
+      return request<RangeStats>(`/stats/range?${params}`)
+    },
   },
   import: async (file: File) => {
     const formData = new FormData()
@@ -1,7 +1,7 @@
 import dayjs from 'dayjs'
 import { useEffect, useState } from 'react'
 import { api } from '../../api/client'
-import type { Dream } from '../../types'
+import type { CalendarDay, Dream } from '../../types'
 import { getMood } from '../ui/MoodPicker'
 import './CalendarView.css'
 
@@ -10,53 +10,60 @@ interface CalendarViewProps {
   onRecordDream: (date: string) => void
 }
 
-interface DayData {
-  dreams: Dream[]
-  maxLucidity: number
-}
-
 const DAYS_OF_WEEK = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'] as const
 const MAX_LUCIDITY = 5
 const PREVIEW_LENGTH = 80
 
 export function CalendarView({ onSelectDream, onRecordDream }: CalendarViewProps) {
-  const [dreams, setDreams] = useState<Dream[]>([])
+  const [days, setDays] = useState<Record<string, CalendarDay>>({})
+  const [daysRecorded, setDaysRecorded] = useState(0)
   const [loading, setLoading] = useState(true)
   const [currentMonth, setCurrentMonth] = useState(dayjs())
   const [selectedDate, setSelectedDate] = useState<string | null>(null)
+  const [selectedDreams, setSelectedDreams] = useState<Dream[]>([])
   const [isClosing, setIsClosing] = useState(false)
 
+  // Generate calendar grid for current month
+  const startOfMonth = currentMonth.startOf('month')
+  const endOfMonth = currentMonth.endOf('month')
+  const startDate = startOfMonth.startOf('week')
+  const endDate = endOfMonth.endOf('week')
+  const rangeStart = startDate.format('YYYY-MM-DD')
+  const rangeEnd = endDate.format('YYYY-MM-DD')
+
+  // Per-day aggregates for the visible grid: "YYYY-MM-DD" -> CalendarDay
   useEffect(() => {
+    let cancelled = false
     const load = async () => {
-      setLoading(true)
       try {
-        const data = await api.dreams.list({ limit: 10000 })
-        setDreams(data)
+        const data = await api.calendar.get(rangeStart, rangeEnd)
+        if (cancelled) return
+        setDays(Object.fromEntries(data.days.map((d) => [d.date, d])))
+        setDaysRecorded(data.days_recorded)
       } finally {
-        setLoading(false)
+        if (!cancelled) setLoading(false)
       }
     }
     load()
-  }, [])
+    return () => {
+      cancelled = true
+    }
+  }, [rangeStart, rangeEnd])
 
-  // Build a map: "YYYY-MM-DD" -> { dreams: [...], maxLucidity: N }
-  const dreamsByDate: Record<string, DayData> = {}
-  dreams.forEach((dream) => {
-    const dateKey = (dream.dream_date || dream.created_at).slice(0, 10)
-    if (!dreamsByDate[dateKey]) {
-      dreamsByDate[dateKey] = { dreams: [], maxLucidity: 0 }
+  // Full dreams are only fetched for the day opened in the panel
+  useEffect(() => {
+    if (!selectedDate) {
+      setSelectedDreams([])
+      return
     }
-    dreamsByDate[dateKey].dreams.push(dream)
-    if (dream.lucidity && dream.lucidity > dreamsByDate[dateKey].maxLucidity) {
-      dreamsByDate[dateKey].maxLucidity = dream.lucidity
+    let cancelled = false
+    api.dreams.list({ dream_date: selectedDate }).then((data) => {
+      if (!cancelled) setSelectedDreams(data)
+    })
+    return () => {
+      cancelled = true
     }
-  })
-
-  // Generate calendar grid for current month
-  const startOfMonth = currentMonth.startOf('month')
-  const endOfMonth = currentMonth.endOf('month')
-  const startDate = startOfMonth.startOf('week')
-  const endDate = endOfMonth.endOf('week')
+  }, [selectedDate])
 
   const calendar: dayjs.Dayjs[] = []
   let day = startDate
@@ -96,8 +103,6 @@ export function CalendarView({ onSelectDream, onRecordDream }: CalendarViewProps
     }
   }
 
-  const selectedDreams = selectedDate ? dreamsByDate[selectedDate]?.dreams || [] : []
-
   if (loading) {
     return (
       <div className="fade-in">
@@ -119,7 +124,7 @@ export function CalendarView({ onSelectDream, onRecordDream }: CalendarViewProps
           Dream <em>Calendar</em>
         </h1>
         <p className="page-subtitle">
-          {Object.keys(dreamsByDate).length} days recorded
+          {daysRecorded} days recorded
         </p>
       </div>
 
@@ -158,11 +163,11 @@ export function CalendarView({ onSelectDream, onRecordDream }: CalendarViewProps
             <div key={weekIndex} className="calendar-week">
               {week.map((day) => {
                 const key = day.format('YYYY-MM-DD')
-                const data = dreamsByDate[key]
+                const data = days[key]
                 const isToday = day.isSame(dayjs(), 'day')
                 const isCurrentMonth = day.month() === currentMonth.month()
                 const isSelected = selectedDate === key
-                const dreamCount = data?.dreams.length || 0
+                const dreamCount = data?.count || 0
 
                 const classNames = [
                   'calendar-day',
@@ -187,8 +192,8 @@ export function CalendarView({ onSelectDream, onRecordDream }: CalendarViewProps
                           <div
                             className="calendar-day__dot"
                             style={{
-                              opacity: data.maxLucidity
-                                ? 0.4 + (data.maxLucidity / MAX_LUCIDITY) * 0.6
+                              opacity: data.max_lucidity
+                                ? 0.4 + (data.max_lucidity / MAX_LUCIDITY) * 0.6
                                 : 0.6,
                             }}
                           />
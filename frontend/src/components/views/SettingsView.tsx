@@ -117,6 +117,8 @@ export function SettingsView() {
         setLoading(true)
         try {
             const result = await api.auth.changePassword(currentPassword, newPassword)
+            // Older tokens are revoked by the password change
+            localStorage.setItem('auth_token', result.access_token)
             setSuccess(result.message)
             setCurrentPassword('')
             setNewPassword('')
@@ -87,6 +87,10 @@ export function StatsView() {
                     <div className="stat-card__value">{stats.current_streak}</div>
                     <div className="stat-card__label">Day Streak</div>
                 </div>
+                <div className="stat-card">
+                    <div className="stat-card__value">{stats.longest_streak}</div>
+                    <div className="stat-card__label">Longest Streak</div>
+                </div>
                 <div className="stat-card">
                     <div className="stat-card__value">
                         {stats.lucidity_trend.length > 0
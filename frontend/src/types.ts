@@ -12,6 +12,8 @@ export interface Dream {
   share_token: string | null
   created_at: string
   updated_at: string
+  /** Highlighted excerpt, only present on search results */
+  snippet?: string
 }
 
 export interface DreamCreate {
@@ -51,4 +53,38 @@ export interface DetailedStats {
   top_tags: { tag: string; count: number }[]
   lucidity_trend: { month: string; avg_lucidity: number }[]
   current_streak: number
-}
\ No newline at end of file
+  longest_streak: number
+}
+
+export interface CalendarDay {
+  date: string
+  count: number
+  avg_lucidity: number | null
+  max_lucidity: number | null
+  avg_sleep_quality: number | null
+}
+
+export interface CalendarData {
+  start: string
+  end: string
+  days_recorded: number
+  days: CalendarDay[]
+}
+
+export type StatsGranularity = 'day' | 'week' | 'month' | 'year'
+
+export interface RangeStatsBucket {
+  start: string
+  count: number
+  avg_lucidity: number | null
+  avg_sleep_quality: number | null
+  moods: Record<string, number>
+}
+
+export interface RangeStats {
+  from: string | null
+  to: string | null
+  granularity: StatsGranularity
+  total: Omit<RangeStatsBucket, 'start'>
+  buckets: RangeStatsBucket[]
+}